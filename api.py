@@ -0,0 +1,316 @@
+import argparse
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import engine
+from detectors import DETECTORS
+from export import CODECS, build_manifest, create_pdf, iter_zip
+from jobqueue import open_queue, open_store, scan_kwargs
+
+# --- LOCAL JOB API ---
+# Headless front door to the same scan engine the wizard uses. Scans take a slot from
+# engine.SCAN_SLOTS, so when this server runs inside the Streamlit process (API_PORT) the UI and
+# API share one concurrency cap. Binds to localhost by default.
+#
+#   POST /jobs                      {"source": url-or-path, ...scan options} -> 202 {"id", ...}
+#                                   optional "cookies": the text of a cookies.txt export
+#   GET  /jobs                      all jobs
+#   GET  /jobs/<id>                 status
+#   GET  /jobs/<id>/events          progress stream (text/event-stream) until the job ends
+#   GET  /jobs/<id>/result.pdf      combined PDF
+#   GET  /jobs/<id>/result.zip      slides + manifest.json / index.html / index.md
+#   GET  /jobs/<id>/manifest.json   slide index only
+#
+# With JOB_QUEUE / RESULT_STORE set (see jobqueue.py) jobs go to the shared queue instead of this
+# process's pool, and results are read back from the store: the API becomes a thin front-end.
+# Otherwise finished jobs (slides included) stay in memory for JOB_TTL seconds, and only the
+# JOB_KEEP most recent ones are kept.
+
+OPTION_TYPES = {
+    'start': float, 'end': float, 'sensitivity': float, 'strictness': float,
+    'min_skip': float, 'max_skip': float, 'settle': float, 'auto_mask': bool, 'keep_final': bool, 'adaptive': bool,
+    'engine': str, 'detector': str, 'quality_format': str, 'codec': str, 'quality': int, 'max_side': int,
+    'budget_s': float, 'budget_samples': int, 'auto_calibrate': bool, 'decoder': str, 'library': bool,
+}
+# Only the PROGRESSIVE engine can stop early and still cover the whole window
+BUDGET_OPTIONS = ('budget_s', 'budget_samples')
+
+JOB_TTL = float(os.environ.get('JOB_TTL', '3600'))
+JOB_KEEP = int(os.environ.get('JOB_KEEP', '50'))
+TRUE, FALSE = ("true", "1", "yes", "on"), ("false", "0", "no", "off")
+
+JOBS = {}
+JOBS_LOCK = threading.Lock()
+RUNNER = ThreadPoolExecutor(max_workers=int(os.environ.get('API_WORKERS', '8')), thread_name_prefix="api-job")
+QUEUE, STORE = open_queue(), open_store()
+if QUEUE and not STORE: raise RuntimeError("JOB_QUEUE needs a RESULT_STORE the workers publish to")
+
+
+def coerce(key, kind, v):
+    # JSON values -> option type; anything that would only convert by accident is a 400.
+    # bool("false") is True and int(2.7) is 2, so neither constructor is used as-is.
+    if kind is bool:
+        if isinstance(v, bool): return v
+        if isinstance(v, int) and v in (0, 1): return bool(v)
+        if isinstance(v, str) and v.strip().lower() in TRUE + FALSE: return v.strip().lower() in TRUE
+        raise ValueError(f"'{key}' must be true or false")
+    if kind is str:
+        if isinstance(v, str): return v
+        raise ValueError(f"'{key}' must be a string")
+    if isinstance(v, bool) or not isinstance(v, (int, float, str)):
+        raise ValueError(f"'{key}' must be a number")
+    x = float(v)
+    if not math.isfinite(x): raise ValueError(f"'{key}' must be a finite number")
+    if kind is int:
+        if x != int(x): raise ValueError(f"'{key}' must be a whole number")
+        return int(x)
+    return x
+
+
+def parse_options(body):
+    if not isinstance(body, dict) or not body.get('source'):
+        raise ValueError("'source' (URL or local path) is required")
+    if not isinstance(body['source'], str): raise ValueError("'source' must be a string")
+    # The contents, never a path: the server must not read (or let yt_dlp write back to) its own files
+    if body.get('cookies') is not None and not isinstance(body['cookies'], str):
+        raise ValueError("'cookies' must be the text of a cookies.txt file")
+    opts = {}
+    for k, v in body.items():
+        if k in ('source', 'cookies', 'roi'): continue
+        if k not in OPTION_TYPES: raise ValueError(f"unknown option '{k}'")
+        opts[k] = coerce(k, OPTION_TYPES[k], v)
+    if opts.get('engine', "OPENCV_DIFF") not in engine.ENGINES: raise ValueError("unknown engine")
+    if opts.get('detector', "CASCADE") not in DETECTORS: raise ValueError("unknown detector")
+    if opts.get('decoder', "OPENCV") not in engine.DECODERS: raise ValueError("unknown decoder")
+    if opts.get('codec', "JPEG") not in CODECS: raise ValueError("unknown codec")
+    if any(k in opts for k in BUDGET_OPTIONS) and opts.get('engine') != "PROGRESSIVE":
+        raise ValueError("budgets need \"engine\": \"PROGRESSIVE\"")
+    roi = body.get('roi')
+    if roi is not None:
+        if not isinstance(roi, (list, tuple)): raise ValueError("'roi' must be [x0, y0, x1, y1] fractions")
+        roi = tuple(coerce('roi', float, x) for x in roi)
+        if len(roi) != 4 or not (0 <= roi[0] < roi[2] <= 1 and 0 <= roi[1] < roi[3] <= 1):
+            raise ValueError("'roi' must be [x0, y0, x1, y1] fractions, 0 <= x0 < x1 <= 1 and 0 <= y0 < y1 <= 1")
+    opts['roi'] = roi
+    return opts
+
+
+def public(job):
+    keys = ('id', 'source', 'state', 'progress', 'position', 'slides', 'error', 'created', 'started', 'finished', 'title')
+    return {k: job.get(k) for k in keys}
+
+
+def run_job(job):
+    o = job['options']
+    cookies = engine.cookie_file(job['cookies']) if job.get('cookies') else None
+
+    def on_progress(p, t):
+        if job['state'] == 'QUEUED':
+            job['state'], job['started'] = 'SCANNING', time.time()
+        job['progress'], job['position'] = round(p, 4), round(t, 2)
+
+    def on_capture(t, b):
+        job['slides'] += 1
+
+    try:
+        meta, captures = engine.scan_source(
+            job['source'], o.get('quality_format', "bestvideo/best"), cookies=cookies,
+            on_progress=on_progress, on_capture=on_capture, **scan_kwargs(o)
+        )
+        job['meta'], job['captures'] = meta, captures
+        job['title'] = meta.get('title')
+        job['slides'] = len(captures)
+        job['progress'] = 1.0
+        job['state'] = 'DONE'
+    except Exception as e:
+        job['error'] = str(e)
+        job['state'] = 'FAILED'
+    finally:
+        if cookies: os.remove(cookies)
+    job['finished'] = time.time()
+
+
+def submit(body):
+    opts = parse_options(body)
+    if QUEUE:
+        return QUEUE.get(QUEUE.submit(body['source'], opts, body.get('cookies')))
+    job = {
+        'id': uuid.uuid4().hex[:12], 'source': body['source'], 'cookies': body.get('cookies'),
+        'options': opts, 'state': 'QUEUED', 'progress': 0.0, 'position': None, 'slides': 0,
+        'error': None, 'created': time.time(), 'started': None, 'finished': None, 'title': None,
+        'meta': None, 'captures': [],
+    }
+    with JOBS_LOCK:
+        prune()
+        JOBS[job['id']] = job
+    RUNNER.submit(run_job, job)
+    return public(job)
+
+
+def prune(now=None):
+    # Caller holds JOBS_LOCK. Running jobs are never dropped; finished ones go after JOB_TTL, or
+    # oldest first once more than JOB_KEEP are held.
+    now = now or time.time()
+    done = sorted((j for j in JOBS.values() if j['finished']), key=lambda j: j['finished'])
+    for i, j in enumerate(done):
+        if j['finished'] < now - JOB_TTL or i < len(done) - JOB_KEEP:
+            del JOBS[j['id']]
+
+
+def find(job_id):
+    # -> public status dict, or None
+    if QUEUE: return QUEUE.get(job_id)
+    with JOBS_LOCK:
+        prune()
+        job = JOBS.get(job_id)
+    return public(job) if job else None
+
+
+def list_jobs():
+    if QUEUE: return QUEUE.list()
+    with JOBS_LOCK:
+        prune()
+        return [public(j) for j in JOBS.values()]
+
+
+def results(job_id):
+    # -> (meta, times, buffers, codec) of a DONE job, None once it has been pruned
+    if QUEUE: return STORE.get(job_id)
+    job = JOBS.get(job_id)
+    if job is None: return None
+    return job['meta'], [t for t, _ in job['captures']], [b for _, b in job['captures']], job['options'].get('codec', "JPEG")
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "LectureNotesAPI/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        if os.environ.get('API_QUIET'): return
+        super().log_message(fmt, *args)
+
+    def send_json(self, code, obj):
+        body = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_chunk(self, data):
+        # A zero-length chunk would end the response early
+        if not data: return
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+
+    def begin_stream(self, ctype, filename=None):
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-cache")
+        if filename: self.send_header("Content-Disposition", f'attachment; filename="{filename}"')
+        self.end_headers()
+
+    def end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip('/') != '/jobs':
+            return self.send_json(404, {'error': 'not found'})
+        try:
+            n = int(self.headers.get('Content-Length') or 0)
+            job = submit(json.loads(self.rfile.read(n) or b"{}"))
+        except (ValueError, TypeError) as e:
+            return self.send_json(400, {'error': str(e)})
+        self.send_json(202, dict(job, status_url=f"/jobs/{job['id']}"))
+
+    def do_GET(self):
+        parts = [p for p in urlparse(self.path).path.split('/') if p]
+        if parts == ['jobs']:
+            return self.send_json(200, list_jobs())
+        job = find(parts[1]) if len(parts) >= 2 and parts[0] == 'jobs' else None
+        if job is None:
+            return self.send_json(404, {'error': 'not found'})
+        tail = parts[2] if len(parts) > 2 else None
+
+        if tail is None:
+            return self.send_json(200, job)
+        if tail == 'events':
+            return self.stream_events(job['id'])
+        if tail in ('result.pdf', 'result.zip', 'manifest.json'):
+            if job['state'] != 'DONE':
+                return self.send_json(409, {'error': f"job is {job['state']}", 'state': job['state']})
+            return self.send_result(job['id'], tail)
+        return self.send_json(404, {'error': 'not found'})
+
+    def stream_events(self, job_id):
+        # Server-sent events: one status snapshot per change, closing when the job ends
+        self.begin_stream("text/event-stream")
+        last = None
+        while True:
+            snap = find(job_id)
+            if snap is None:
+                # Pruned while we were streaming: say so instead of leaving the client waiting
+                self.send_chunk(f"data: {json.dumps({'id': job_id, 'state': 'EXPIRED'})}\n\n".encode())
+                break
+            if snap != last:
+                self.send_chunk(f"data: {json.dumps(snap)}\n\n".encode())
+                self.wfile.flush()
+                last = snap
+            if snap['state'] in ('DONE', 'FAILED'): break
+            time.sleep(0.5)
+        self.end_stream()
+
+    def send_result(self, job_id, name):
+        found = results(job_id)
+        if found is None:
+            return self.send_json(404, {'error': 'result not published'})
+        meta, times, bufs, codec = found
+        if name == 'manifest.json':
+            return self.send_json(200, build_manifest(times, bufs, meta, codec))
+        if name == 'result.zip':
+            self.begin_stream("application/zip", f"{job_id}.zip")
+            for chunk in iter_zip(times, bufs, meta, codec):
+                self.send_chunk(chunk)
+            return self.end_stream()
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        os.close(fd)
+        try:
+            if not create_pdf(bufs, path=path):
+                return self.send_json(409, {'error': 'no slides captured'})
+            self.begin_stream("application/pdf", f"{job_id}.pdf")
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(256 * 1024), b""):
+                    self.send_chunk(chunk)
+            self.end_stream()
+        finally:
+            os.remove(path)
+
+
+def serve(host="127.0.0.1", port=8765):
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    httpd.daemon_threads = True
+    return httpd
+
+
+def start_background(host="127.0.0.1", port=8765):
+    # Used by app.py so the API shares the Streamlit process (and its SCAN_SLOTS)
+    httpd = serve(host, port)
+    threading.Thread(target=httpd.serve_forever, name="job-api", daemon=True).start()
+    return httpd
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Local scan job API")
+    ap.add_argument("--host", default=os.environ.get('API_HOST', "127.0.0.1"))
+    ap.add_argument("--port", type=int, default=int(os.environ.get('API_PORT', '8765')))
+    args = ap.parse_args()
+    print(f"Job API on http://{args.host}:{args.port}")
+    serve(args.host, args.port).serve_forever()
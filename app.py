@@ -1,12 +1,16 @@
 import streamlit as st
-import cv2
-import yt_dlp
-import numpy as np
 import os
+import re
 import tempfile
-import shutil
 import time
-from PIL import Image
+from export import create_pdf, fmt, iter_zip
+
+# NOTE: cv2 / yt_dlp / numpy / PIL are heavy. They are imported lazily (engine, create_pdf)
+# so a plain page view or wizard step never pays for them.
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+VIDEO_EXTS = ['mp4', 'mkv', 'webm', 'mov', 'avi', 'm4v', 'ts', 'flv']
+GALLERY_PAGE = 24
 
 # 1. PAGE CONFIGURATION
 st.set_page_config(page_title="LectureNotes Pro", page_icon="⚡", layout="wide")
@@ -22,6 +26,8 @@ if 'url_input' not in st.session_state:
     st.session_state['url_input'] = ""
 if 'captured_images' not in st.session_state:
     st.session_state['captured_images'] = []
+if 'captured_times' not in st.session_state:
+    st.session_state['captured_times'] = []
 if 'cookies_path' not in st.session_state:
     st.session_state['cookies_path'] = None
 if 'scan_complete' not in st.session_state:
@@ -32,6 +38,32 @@ if 'sensitivity' not in st.session_state: st.session_state['sensitivity'] = 35
 if 'strictness' not in st.session_state: st.session_state['strictness'] = 1.0
 if 'min_skip' not in st.session_state: st.session_state['min_skip'] = 2
 if 'max_skip' not in st.session_state: st.session_state['max_skip'] = 10
+if 'auto_mask' not in st.session_state: st.session_state['auto_mask'] = True
+if 'engine' not in st.session_state: st.session_state['engine'] = "OPENCV_DIFF"
+if 'settle' not in st.session_state: st.session_state['settle'] = 0.0
+if 'keep_final' not in st.session_state: st.session_state['keep_final'] = False
+if 'adaptive' not in st.session_state: st.session_state['adaptive'] = False
+if 'budget_s' not in st.session_state: st.session_state['budget_s'] = 0
+if 'auto_calibrate' not in st.session_state: st.session_state['auto_calibrate'] = False
+if 'calibration' not in st.session_state: st.session_state['calibration'] = None
+if 'codec' not in st.session_state: st.session_state['codec'] = "JPEG"
+if 'quality' not in st.session_state: st.session_state['quality'] = 95
+if 'max_side' not in st.session_state: st.session_state['max_side'] = "ORIGINAL"
+if 'detector' not in st.session_state: st.session_state['detector'] = "CASCADE"
+if 'decoder' not in st.session_state: st.session_state['decoder'] = "OPENCV"
+if 'library' not in st.session_state: st.session_state['library'] = False
+if 'scan_stats' not in st.session_state: st.session_state['scan_stats'] = None
+if 'playlist_mode' not in st.session_state: st.session_state['playlist_mode'] = False
+if 'playlist_workers' not in st.session_state: st.session_state['playlist_workers'] = 2
+if 'playlist_results' not in st.session_state: st.session_state['playlist_results'] = None
+if 'live_minutes' not in st.session_state: st.session_state['live_minutes'] = 90
+if 'index_key' not in st.session_state: st.session_state['index_key'] = None
+if 'stream_link' not in st.session_state: st.session_state['stream_link'] = None
+if 'roi_x' not in st.session_state: st.session_state['roi_x'] = (0, 100)
+if 'roi_y' not in st.session_state: st.session_state['roi_y'] = (0, 100)
+# Bumped whenever the captured set is replaced; keys cached exports and index previews
+if 'results_rev' not in st.session_state: st.session_state['results_rev'] = 0
+if 'export_cache' not in st.session_state: st.session_state['export_cache'] = {}
 
 # Ensure step is within valid range if phase count changes
 if st.session_state['setup_step'] > 6:
@@ -43,754 +75,478 @@ if "setup" in st.query_params:
     st.session_state['setup_active'] = True
     st.query_params.clear()
 
-# --- ULTRA MODERN DARK THEME CSS ---
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;800&family=JetBrains+Mono:wght@400;500;800&family=Oswald:wght@500;700&display=swap');
-
-    :root {
-        --bg-depth: #0f1117;
-        --bg-surface: #1e293b;
-        --bg-card: #161b22;
-        --text-primary: #f8fafc;
-        --text-secondary: #94a3b8;
-        --accent-primary: #6366f1; /* Indigo */
-        --accent-glow: rgba(99, 102, 241, 0.5);
-        --border: #334155;
-        --success: #10b981;
-        --yt-red: #FF0000;
-        --radius-sm: 0.375rem; /* 6px */
-        --radius-md: 0.75rem;  /* 12px */
-    }
-
-    /* GLOBAL RESET */
-    html, body, [class*="css"] {
-        font-family: 'Inter', -apple-system, sans-serif;
-        color: var(--text-primary);
-        background-color: var(--bg-depth);
-        font-size: 1rem; /* Base relative size */
-        -webkit-font-smoothing: antialiased;
-    }
-    
-    /* Force Dark Background on Main Container with Grid */
-    .stApp {
-        background-color: #0b0d11;
-        background-image: 
-            linear-gradient(rgba(99, 102, 241, 0.05) 0.0625rem, transparent 0.0625rem),
-            linear-gradient(90deg, rgba(99, 102, 241, 0.05) 0.0625rem, transparent 0.0625rem);
-        background-size: 2.5rem 2.5rem; /* 40px */
-        background-attachment: fixed;
-    }
-
-    /* HIDE STREAMLIT CHROME */
-    header {visibility: hidden;}
-    footer {visibility: hidden;}
-    .block-container {
-        padding-top: 1rem;
-        max-width: 95rem; /* Increased width for wider layout */
-    }
-
-    /* --- TECHY HERO SECTION (ANIMATED) --- */
-    .hero-container {
-        position: relative;
-        text-align: center;
-        margin-bottom: 2rem; 
-        padding: 8rem 3rem 6rem 3rem; /* Increased Size Proportionally */
-        background-color: transparent; /* Transparent Background */
-        background-image: none;
-        border: 1px solid var(--border);
-        border-radius: var(--radius-md);
-        box-shadow: none;
-        overflow: hidden;
-        transition: all 0.3s ease;
-    }
-
-    /* Scanning Line Animation */
-    .scan-line {
-        position: absolute;
-        top: 0;
-        left: 0;
-        width: 100%;
-        height: 0.125rem; /* 2px */
-        background: linear-gradient(90deg, transparent, #6366f1, transparent);
-        opacity: 0.5;
-        animation: scan 3s ease-in-out infinite;
-        box-shadow: 0 0 0.9375rem rgba(99, 102, 241, 0.8);
-        pointer-events: none;
-    }
-
-    @keyframes scan {
-        0% { top: -10%; }
-        100% { top: 110%; }
-    }
-
-    /* Glitch Title Effect */
-    .hero-title {
-        font-family: 'JetBrains Mono', monospace;
-        font-size: 4rem;
-        font-weight: 800;
-        color: #fff;
-        text-transform: uppercase;
-        letter-spacing: -0.05em;
-        position: relative;
-        display: inline-block;
-        margin-bottom: 1rem;
-        text-shadow: 0.1875rem 0.1875rem 0rem rgba(99, 102, 241, 0.8), -0.125rem -0.125rem 0rem rgba(6, 182, 212, 0.8);
-    }
-    
-    .hero-title::before {
-        content: attr(data-text);
-        position: absolute;
-        top: 0;
-        left: 0;
-        width: 100%;
-        height: 100%;
-        background: #0b0d11;
-        opacity: 0.8;
-        clip-path: polygon(0 0, 100% 0, 100% 45%, 0 45%);
-        transform: translate(-0.1875rem, 0);
-        animation: glitch-anim-1 2.5s infinite linear alternate-reverse;
-    }
-    
-    .hero-title::after {
-        content: attr(data-text);
-        position: absolute;
-        top: 0;
-        left: 0;
-        width: 100%;
-        height: 100%;
-        background: #0b0d11;
-        opacity: 0.8;
-        clip-path: polygon(0 55%, 100% 55%, 100% 100%, 0 100%);
-        transform: translate(0.1875rem, 0);
-        animation: glitch-anim-2 3s infinite linear alternate-reverse;
-    }
-
-    @keyframes glitch-anim-1 {
-        0% { clip-path: inset(20% 0 80% 0); transform: translate(-0.125rem, 0.0625rem); }
-        20% { clip-path: inset(60% 0 10% 0); transform: translate(0.125rem, -0.0625rem); }
-        40% { clip-path: inset(40% 0 50% 0); transform: translate(-0.125rem, 0.125rem); }
-        60% { clip-path: inset(80% 0 5% 0); transform: translate(0.0625rem, -0.125rem); }
-        80% { clip-path: inset(10% 0 70% 0); transform: translate(-0.0625rem, 0.0625rem); }
-        100% { clip-path: inset(30% 0 20% 0); transform: translate(0.125rem, -0.0625rem); }
-    }
-
-    @keyframes glitch-anim-2 {
-        0% { clip-path: inset(10% 0 60% 0); transform: translate(0.125rem, -0.0625rem); }
-        20% { clip-path: inset(80% 0 5% 0); transform: translate(-0.125rem, 0.125rem); }
-        40% { clip-path: inset(30% 0 20% 0); transform: translate(0.0625rem, -0.125rem); }
-        60% { clip-path: inset(10% 0 80% 0); transform: translate(-0.0625rem, 0.0625rem); }
-        80% { clip-path: inset(50% 0 30% 0); transform: translate(0.125rem, -0.125rem); }
-        100% { clip-path: inset(20% 0 70% 0); transform: translate(-0.125rem, 0.0625rem); }
-    }
-
-    /* Robot Text Animation */
-    @keyframes robot-glitch-text {
-        0% { opacity: 1; transform: translateX(0); text-shadow: 0 0 0.3125rem rgba(99, 102, 241, 0.8); }
-        1% { opacity: 0.8; transform: translateX(0.125rem); text-shadow: 0.125rem 0 0 red; }
-        2% { opacity: 1; transform: translateX(-0.125rem); text-shadow: -0.125rem 0 0 blue; }
-        3% { opacity: 1; transform: translateX(0); text-shadow: 0 0 0.3125rem rgba(99, 102, 241, 0.8); }
-        50% { opacity: 1; }
-        51% { opacity: 0.5; transform: skewX(10deg); }
-        52% { opacity: 1; transform: skewX(0deg); }
-        100% { opacity: 1; }
-    }
-
-    /* --- TEXT ROTATOR FOR SUBTITLE --- */
-    .hero-subtitle-container {
-        position: relative;
-        height: 1.875rem; /* Fixed height ~30px */
-        width: 100%;
-        display: flex;
-        justify-content: center;
-        overflow: hidden;
-        margin-bottom: 2rem;
-    }
-
-    .hero-subtitle {
-        font-family: 'JetBrains Mono', monospace;
-        color: var(--text-secondary);
-        font-size: 0.95rem;
-        letter-spacing: 0.05em;
-        position: absolute;
-        width: 100%;
-        text-align: center;
-        opacity: 0;
-        animation: rotate-text 16s infinite; 
-    }
-    
-    .hero-subtitle:nth-child(1) { animation-delay: 0s; }
-    .hero-subtitle:nth-child(2) { animation-delay: 4s; }
-    .hero-subtitle:nth-child(3) { animation-delay: 8s; }
-    .hero-subtitle:nth-child(4) { animation-delay: 12s; }
-
-    @keyframes rotate-text {
-        0% { opacity: 0; transform: translateY(1.25rem); }
-        5% { opacity: 1; transform: translateY(0); }
-        25% { opacity: 1; transform: translateY(0); }
-        30% { opacity: 0; transform: translateY(-1.25rem); }
-        100% { opacity: 0; transform: translateY(-1.25rem); }
-    }
-    
-    .robot-text {
-        display: inline-block;
-        font-weight: 700;
-        color: #fff;
-        animation: robot-glitch-text 4s infinite linear;
-    }
-
-    /* --- HERO CTA BUTTON (Robotic/YouTube) --- */
-    .hero-btn-wrapper {
-        display: flex;
-        justify-content: center;
-        margin-top: 1rem;
-        z-index: 10;
-        position: relative;
-    }
-
-    .hero-scan-btn {
-        display: inline-flex;
-        align-items: center;
-        gap: 0.75rem;
-        background-color: #FF0000; /* FIXED: Red Background */
-        color: #ffffff !important; /* FIXED: White Text */
-        text-decoration: none;
-        padding: 0.8rem 2rem;
-        border-radius: 0.25rem; /* Slightly rounded like YT */
-        font-family: 'Oswald', sans-serif;
-        font-size: 1.1rem;
-        font-weight: 700;
-        letter-spacing: 0.05em;
-        border: 1px solid #FF0000;
-        box-shadow: 0 0 1.5rem rgba(255, 0, 0, 0.2);
-        transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
-        text-transform: uppercase;
-    }
-
-    .hero-scan-btn:hover {
-        background-color: #CC0000; /* HOVER: Darker Red */
-        color: #ffffff !important; /* HOVER: White Text */
-        box-shadow: 0 0 2.5rem rgba(255, 0, 0, 0.7);
-        transform: scale(1.05);
-        border-color: #CC0000;
-    }
-    
-    /* Active State to appear clicked */
-    .hero-scan-btn:active {
-        transform: scale(0.98);
-    }
-
-    .btn-icon {
-        font-size: 1.2rem;
-        display: flex;
-        align-items: center;
-    }
-
-    /* --- TECH CARDS (OVERVIEW) --- */
-    .tech-card-container {
-        display: grid;
-        grid-template-columns: repeat(auto-fit, minmax(15.625rem, 1fr));
-        gap: 1.25rem;
-        margin-bottom: 2rem;
-        position: relative;
-        z-index: 1; /* Sit above the faded text */
-    }
-    
-    .tech-card {
-        background-color: #0b0d11;
-        background-image: 
-            linear-gradient(rgba(255, 255, 255, 0.03) 0.0625rem, transparent 0.0625rem),
-            linear-gradient(90deg, rgba(255, 255, 255, 0.03) 0.0625rem, transparent 0.0625rem);
-        background-size: 1.25rem 1.25rem; /* 20px */
-        border: 0.0625rem solid var(--border);
-        border-radius: 0.5rem;
-        padding: 1.5rem;
-        position: relative;
-        overflow: hidden;
-        transition: all 0.3s ease;
-        box-shadow: 0 0.25rem 1.25rem rgba(0,0,0,0.4);
-    }
-    
-    /* YOUTUBE CARD SPECIAL STYLING */
-    .card-yt {
-        border-color: #333;
-        border-left: 0.25rem solid var(--yt-red);
-        background: linear-gradient(180deg, rgba(255, 0, 0, 0.05) 0%, #0f0f0f 100%);
-    }
-    
-    .card-yt:hover {
-        box-shadow: 0 0 1.875rem rgba(255, 0, 0, 0.15) inset;
-        transform: translateY(-0.1875rem);
-    }
-    
-    /* YouTube Logo Construction in Pure CSS */
-    .yt-logo-css {
-        display: inline-flex;
-        align-items: center;
-        justify-content: center;
-        width: 2.25rem;
-        height: 1.5rem;
-        background-color: var(--yt-red);
-        border-radius: 0.375rem;
-        margin-right: 0.625rem;
-        box-shadow: 0 0 0.625rem var(--yt-red);
-        position: relative;
-    }
-    
-    .yt-play-icon {
-        width: 0; 
-        height: 0; 
-        border-top: 0.3125rem solid transparent;
-        border-bottom: 0.3125rem solid transparent;
-        border-left: 0.5rem solid white;
-        margin-left: 0.125rem;
-    }
-
-    /* Other Cards */
-    .card-cv:hover { border-color: #22d3ee; box-shadow: 0 0 1.25rem rgba(34, 211, 238, 0.15) inset; transform: translateY(-0.1875rem); }
-    .card-dl:hover { border-color: #10b981; box-shadow: 0 0 1.25rem rgba(16, 185, 129, 0.15) inset; transform: translateY(-0.1875rem); }
-
-    .card-title {
-        font-family: 'Oswald', sans-serif;
-        font-size: 1.1rem;
-        font-weight: 700;
-        margin-bottom: 0.8rem;
-        display: flex;
-        align-items: center;
-        letter-spacing: 0.03125rem;
-    }
-    
-    .card-desc {
-        font-family: 'Inter', sans-serif;
-        font-size: 0.85rem;
-        color: var(--text-secondary);
-        line-height: 1.6;
-    }
-    
-    .card-scan-overlay {
-        position: absolute;
-        top: 0; left: 0; width: 100%; height: 100%;
-        background: repeating-linear-gradient(0deg, rgba(0,0,0,0.2) 0px, rgba(0,0,0,0.2) 0.0625rem, transparent 0.0625rem, transparent 0.125rem);
-        pointer-events: none;
-    }
-
-    /* Highlighted Text */
-    .highlight-yt {
-        color: #fff;
-        background: rgba(255, 0, 0, 0.2);
-        padding: 0.1rem 0.3rem;
-        border-radius: 0.2rem;
-        border: 1px solid rgba(255, 0, 0, 0.4);
-        font-weight: 600;
-    }
-    
-    .highlight-exam {
-        color: #fff;
-        background: rgba(16, 185, 129, 0.2);
-        padding: 0.1rem 0.3rem;
-        border-radius: 0.2rem;
-        border: 1px solid rgba(16, 185, 129, 0.4);
-        font-weight: 600;
-    }
-
-    /* --- DEMO VISUALIZER --- */
-    .demo-container {
-        margin: 2rem 0;
-        padding: 2rem;
-        background: #080a0f;
-        border: 1px solid #334155;
-        border-radius: 12px;
-        position: relative;
-        overflow: hidden;
-    }
-    
-    .demo-header {
-        font-family: 'JetBrains Mono', monospace;
-        color: #64748b;
-        font-size: 0.8rem;
-        margin-bottom: 2rem;
-        border-bottom: 1px solid #1e293b;
-        padding-bottom: 0.5rem;
-    }
-    
-    .demo-stage {
-        display: flex;
-        justify-content: space-between;
-        align-items: center;
-        margin-bottom: 2rem;
-        position: relative;
-        z-index: 2;
-    }
-    
-    .demo-node {
-        display: flex;
-        flex-direction: column;
-        align-items: center;
-        z-index: 2;
-        width: 100px;
-    }
-    
-    .node-icon {
-        width: 60px;
-        height: 60px;
-        border-radius: 12px;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        font-size: 1.5rem;
-        background: #1e293b;
-        border: 1px solid #475569;
-        margin-bottom: 10px;
-        box-shadow: 0 0 15px rgba(0,0,0,0.5);
-    }
-    
-    .yt-icon { color: #ff0000; border-color: rgba(255,0,0,0.3); animation: pulse-red 2s infinite; }
-    .ai-icon { color: #22d3ee; border-color: rgba(34,211,238,0.3); animation: pulse-cyan 2s infinite; }
-    
-    .node-label {
-        font-family: 'Oswald', sans-serif;
-        color: #f8fafc;
-        font-size: 0.9rem;
-        letter-spacing: 1px;
-    }
-    
-    .node-status {
-        font-family: 'JetBrains Mono', monospace;
-        font-size: 0.6rem;
-        color: #64748b;
-        margin-top: 4px;
-    }
-    
-    .demo-link {
-        flex: 1;
-        height: 2px;
-        background: #1e293b;
-        position: relative;
-        margin: 0 20px;
-        top: -25px; /* Adjust based on icon height */
-    }
-    
-    .data-packet {
-        position: absolute;
-        width: 20px;
-        height: 4px;
-        background: #6366f1;
-        top: -1px;
-        border-radius: 2px;
-        box-shadow: 0 0 10px #6366f1;
-        animation: flow 1.5s infinite linear;
-        opacity: 0;
-    }
-    
-    .packet-green {
-        background: #10b981;
-        box-shadow: 0 0 10px #10b981;
-    }
-    
-    @keyframes flow {
-        0% { left: 0%; opacity: 0; }
-        10% { opacity: 1; }
-        90% { opacity: 1; }
-        100% { left: 100%; opacity: 0; }
-    }
-    
-    @keyframes pulse-red { 0%, 100% { box-shadow: 0 0 0 rgba(255,0,0,0); } 50% { box-shadow: 0 0 15px rgba(255,0,0,0.3); } }
-    @keyframes pulse-cyan { 0%, 100% { box-shadow: 0 0 0 rgba(34,211,238,0); } 50% { box-shadow: 0 0 15px rgba(34,211,238,0.3); } }
-    
-    /* Slide Stack Animation */
-    .slide-stack { position: relative; width: 60px; height: 60px; margin-bottom: 10px; }
-    .slide {
-        position: absolute;
-        width: 40px;
-        height: 28px;
-        background: #1e293b;
-        border: 1px solid #10b981;
-        border-radius: 4px;
-        left: 10px;
-        top: 16px;
-        opacity: 0;
-    }
-    
-    .s1 { animation: slide-pop 3s infinite; animation-delay: 0s; z-index: 1; }
-    .s2 { animation: slide-pop 3s infinite; animation-delay: 1s; z-index: 2; transform: translate(5px, -5px); background: #0f1117; }
-    .s3 { animation: slide-pop 3s infinite; animation-delay: 2s; z-index: 3; transform: translate(10px, -10px); background: #0f1117; }
-    
-    @keyframes slide-pop {
-        0% { opacity: 0; transform: translateY(10px) scale(0.9); }
-        20% { opacity: 1; transform: translateY(0) scale(1); }
-        80% { opacity: 1; }
-        100% { opacity: 0; }
-    }
-    
-    .demo-terminal {
-        background: #000;
-        padding: 1rem;
-        border-radius: 6px;
-        border-left: 2px solid #6366f1;
-        font-family: 'JetBrains Mono', monospace;
-        font-size: 0.7rem;
-        color: #4ade80;
-        display: flex;
-        flex-direction: column;
-        gap: 5px;
-    }
-    .term-line { opacity: 0.8; }
-
-    /* --- INPUTS --- */
-    .stTextInput input {
-        background-color: var(--bg-card) !important;
-        border: 0.0625rem solid var(--border) !important;
-        color: var(--text-primary) !important;
-        border-radius: var(--radius-md);
-        padding: 0.75rem 1rem;
-        font-size: 0.9375rem;
-        transition: all 0.2s ease;
-    }
-    
-    .stTextInput input:focus {
-        border-color: var(--accent-primary) !important;
-        box-shadow: 0 0 0 0.0625rem var(--accent-primary), 0 0 0.9375rem var(--accent-glow) !important;
-    }
-
-    /* --- BUTTONS --- */
-    div.stButton > button {
-        background-color: var(--bg-surface);
-        border: 0.0625rem solid var(--border);
-        color: var(--text-primary);
-        border-radius: var(--radius-sm);
-        padding: 0.6rem 1.2rem;
-        font-weight: 500;
-        transition: all 0.2s ease;
-    }
-    
-    div.stButton > button:hover {
-        background-color: var(--border);
-        border-color: var(--text-secondary);
-    }
-    
-    button[kind="primary"] {
-        background: linear-gradient(135deg, #6366f1 0%, #4f46e5 100%);
-        border: none !important;
-        color: white !important;
-        font-weight: 600;
-        box-shadow: 0 0.25rem 0.75rem rgba(99, 102, 241, 0.3);
-    }
-    
-    button[kind="primary"]:hover {
-        box-shadow: 0 0.375rem 1.25rem rgba(99, 102, 241, 0.5);
-        transform: translateY(-0.0625rem);
-    }
-    
-    /* SPECIAL SCAN BUTTON STYLE */
-    button[kind="secondary"] {
-        background-color: #000 !important;
-        border: 1px solid var(--yt-red) !important;
-        color: var(--yt-red) !important;
-        font-family: 'JetBrains Mono', monospace;
-        letter-spacing: 1px;
-        text-transform: uppercase;
-        box-shadow: 0 0 10px rgba(255, 0, 0, 0.2) !important;
-    }
-    button[kind="secondary"]:hover {
-        background-color: var(--yt-red) !important;
-        color: #fff !important;
-        box-shadow: 0 0 20px rgba(255, 0, 0, 0.5) !important;
-    }
-
-    /* --- CONSOLE OUTPUT --- */
-    .console-box {
-        font-family: 'JetBrains Mono', monospace;
-        font-size: 0.8125rem;
-        background: #000000;
-        border: 0.0625rem solid #333;
-        border-left: 0.1875rem solid var(--success);
-        border-radius: var(--radius-sm);
-        padding: 0.875rem;
-        color: #4ade80; /* Terminal Green */
-        display: flex;
-        align-items: center;
-        gap: 0.75rem;
-        box-shadow: inset 0 0 1.25rem rgba(0,0,0,0.5);
-    }
-    
-    .blink { animation: blinker 1s step-end infinite; }
-    @keyframes blinker { 50% { opacity: 0; } }
-
-    /* --- GENERAL UI --- */
-    .section-header {
-        font-family: 'JetBrains Mono', monospace;
-        font-size: 0.75rem;
-        text-transform: uppercase;
-        letter-spacing: 0.1em;
-        color: var(--text-secondary);
-        margin-bottom: 1rem;
-        display: flex;
-        align-items: center;
-        gap: 0.75rem;
-    }
-    
-    .section-header::after {
-        content: ""; flex: 1; height: 0.0625rem;
-        background: linear-gradient(90deg, var(--border), transparent);
-    }
-    
-    /* UNIVERSAL IMAGE STYLING (Applies to all st.image calls) */
-    div[data-testid="stImage"] {
-        border-radius: var(--radius-md);
-        overflow: hidden;
-    }
-    
-    div[data-testid="stImage"] img {
-        border-radius: var(--radius-md);
-        transition: transform 0.3s ease;
-    }
-    
-    div[data-testid="stImage"]:hover img {
-        transform: scale(1.02);
-    }
-    
-    div[data-testid="stImageCaption"] {
-        font-family: 'JetBrains Mono', monospace;
-        font-size: 0.6875rem;
-        color: var(--text-secondary);
-        background: transparent;
-        padding-top: 0.5rem;
-    }
-    
-    /* --- EXPANDER CUSTOMIZATION --- */
-    .streamlit-expanderHeader {
-        background-color: var(--bg-card) !important;
-        color: var(--text-secondary) !important;
-        font-family: 'JetBrains Mono', monospace;
-        font-size: 0.8rem !important;
-        border: 0.0625rem solid var(--border) !important;
-        border-radius: var(--radius-sm) !important;
-    }
-    .streamlit-expanderContent {
-        border: 0.0625rem solid var(--border);
-        border-top: none;
-        border-bottom-left-radius: var(--radius-sm);
-        border-bottom-right-radius: var(--radius-sm);
-        background-color: var(--bg-depth);
-        padding: 1.25rem;
-    }
-    
-    /* --- SETUP PROTOCOL STYLING (TARGETED CONTAINER) --- */
-    div[data-testid="stVerticalBlock"]:has(div.setup-wizard-marker) {
-        background-color: transparent; /* Clean background */
-        border: none; /* Border removed */
-        box-shadow: 0 0 3.125rem rgba(0,0,0,0.5) inset;
-        border-radius: var(--radius-md);
-        padding: 2rem;
-        margin-top: 1.5rem; /* Distinct separation from Hero */
-        position: relative;
-        overflow: hidden;
-        animation: slideDown 0.6s cubic-bezier(0.2, 0.8, 0.2, 1);
-    }
-    
-    /* SETUP WIZARD IMAGE SPECIFICS */
-    div[data-testid="stVerticalBlock"]:has(div.setup-wizard-marker) div[data-testid="stImage"] {
-        border: 0.125rem solid var(--border);
-        box-shadow: 0 0.25rem 1rem rgba(0,0,0,0.5);
-    }
-    
-    div[data-testid="stVerticalBlock"]:has(div.setup-wizard-marker) div[data-testid="stImage"]:hover {
-        border-color: var(--accent-primary);
-        box-shadow: 0 0 1.25rem rgba(99, 102, 241, 0.4);
-    }
-
-    div[data-testid="stVerticalBlock"]:has(div.setup-wizard-marker) div[data-testid="stImage"]:hover img {
-        transform: scale(1.15) !important;
-    }
-    
-    /* Hide markers */
-    .setup-wizard-marker, .input-console-marker { display: none; }
-    
-    /* INPUT CONSOLE STYLING */
-    div[data-testid="stVerticalBlock"]:has(div.input-console-marker) {
-        background-color: transparent;
-        border: 1px solid var(--border);
-        border-left: 4px solid var(--yt-red); /* Robotic accent */
-        border-radius: 4px; /* Sharper corners */
-        padding: 1.5rem;
-        box-shadow: 0 0 20px rgba(0,0,0,0.5) inset;
-        margin-bottom: 2rem;
-        position: relative;
-    }
-    
-    .step-header {
-        font-family: 'JetBrains Mono', monospace;
-        color: var(--yt-red);
-        border-bottom: 1px solid var(--border);
-        padding-bottom: 10px;
-        margin-bottom: 20px;
-        font-size: 0.9rem;
-        display: flex;
-        justify-content: space-between;
-        align-items: center;
-    }
-    
-    .stepper-dots {
-        display: flex;
-        justify-content: center;
-        gap: 12px;
-        margin-top: 20px;
-        padding-top: 15px;
-        border-top: 1px solid var(--border);
-    }
-    
-    .dot {
-        width: 10px;
-        height: 10px;
-        border-radius: 50%;
-        background: var(--border);
-        transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
-    }
-    
-    .dot.active {
-        background: var(--yt-red);
-        box-shadow: 0 0 10px var(--yt-red);
-        transform: scale(1.3);
-    }
-    
-    @keyframes slideDown { 
-        from { opacity: 0; transform: translateY(-10px); } 
-        to { opacity: 1; transform: translateY(0); } 
-    }
-</style>
-""", unsafe_allow_html=True)
-
 # --- HELPERS ---
-def get_video_info(url, cookies=None, proxy=None):
-    opts = {
-        'quiet': True, 
-        'nocheckcertificate': True, 
-        'user_agent': 'Mozilla/5.0',
-        'noplaylist': True # Prevent playlist processing
-    }
-    if cookies: opts['cookiefile'] = cookies
+@st.cache_resource
+def load_css():
+    # Read + minify once per server; every rerun then re-sends a much smaller block
+    with open(os.path.join(APP_DIR, "style.css"), encoding="utf-8") as f:
+        css = f.read()
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    return f"<style>{css.strip()}</style>"
+
+@st.cache_resource
+def get_step_image(step_num):
+    # Guide images are static; keep the bytes in memory instead of hitting disk per step view
+    path = os.path.join(APP_DIR, f"step_0{step_num}.jpg")
+    if not os.path.exists(path): return None
+    with open(path, "rb") as f:
+        return f.read()
+
+@st.cache_resource
+def start_job_api(port):
+    # Optional headless API in this process, so its scans share the UI's SCAN_SLOTS cap
+    import api
+    return api.start_background(os.environ.get('API_HOST', "127.0.0.1"), port)
+
+if os.environ.get('API_PORT'):
+    start_job_api(int(os.environ['API_PORT']))
+
+def current_roi():
+    (rx0, rx1), (ry0, ry1) = st.session_state['roi_x'], st.session_state['roi_y']
+    if (rx0, ry0, rx1, ry1) == (0, 0, 100, 100): return None
+    return (rx0 / 100, ry0 / 100, rx1 / 100, ry1 / 100)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def index_preview(key, sensitivity, strictness, min_skip, max_skip, rev):
+    # Slide count a replay of the stored index would give; rev changes whenever a scan rewrites it
+    from sigindex import open_index, replay
+    idx = open_index(key)
+    if idx is None: return None
+    return len(replay(idx, sensitivity, strictness, min_skip, max_skip))
+
+# --- STEP 6 FRAGMENTS ---
+# The config panel and the scan console rerun on their own (st.fragment): dragging a slider only
+# re-executes the panel, a scan or re-apply only the console. They talk through session_state keys.
+def rerun_fragment():
+    # Fragment scope is only valid during that fragment's own rerun; otherwise rerun the page
     try:
-        with yt_dlp.YoutubeDL(opts) as ydl:
-            return ydl.extract_info(url, download=False), None
+        st.rerun(scope="fragment")
+    except st.errors.StreamlitAPIException:
+        st.rerun()
+
+def scan_window(meta):
+    # -> (start_t, end_t); playlists and live streams always take the whole thing
+    if meta.get('is_playlist') or meta.get('is_live'): return 0, None
+    duration = meta.get('duration') or 0
+    if duration <= 0: duration = 100
+    return st.session_state.get('window') or (0, duration)
+
+def selected_format(q_map):
+    return q_map.get(st.session_state.get('quality_label')) or next(iter(q_map.values()))
+
+def run_calibration(meta):
+    # Button callback: runs before the panel renders again, so it may move the Pixel Delta slider
+    from engine import calibrate, quality_map, resolve_stream
+    start_t, end_t = scan_window(meta)
+    try:
+        link = resolve_stream(st.session_state['url_input'], selected_format(quality_map(meta)), cookies=st.session_state.get('cookies_path'))
+        if not link: raise IOError("STREAM RESOLUTION FAILED")
+        cal = calibrate(link, start_t, end_t, min_skip=st.session_state['min_skip'], roi=current_roi(), auto_mask=st.session_state['auto_mask'],
+                        sensitivity=st.session_state['sensitivity'], strictness=st.session_state['strictness'])
     except Exception as e:
-        return None, str(e)
-
-def create_pdf(buffers):
-    if not buffers: return None
-    path = os.path.join(tempfile.gettempdir(), "lecture_export.pdf")
-    imgs = []
-    for b in buffers:
-        i = cv2.imdecode(b, cv2.IMREAD_COLOR)
-        if i is not None: imgs.append(Image.fromarray(cv2.cvtColor(i, cv2.COLOR_BGR2RGB)))
-    if imgs:
-        imgs[0].save(path, "PDF", resolution=100.0, save_all=True, append_images=imgs[1:])
-        return path
-    return None
-
-def fmt(s):
-    m, s = divmod(s, 60)
-    h, m = divmod(m, 60)
-    return f"{int(h):02}:{int(m):02}:{int(s):02}"
+        st.session_state['calibration'] = {'error': str(e)}
+        return
+    st.session_state['sensitivity'] = cal['sensitivity']
+    st.session_state['strictness'] = cal['strictness']
+    st.session_state['calibration'] = cal
+
+@st.fragment
+def scan_config(meta):
+    from detectors import DETECTORS
+    from engine import DECODERS, ENGINES, index_key, quality_map
+    from export import CODECS
+    with st.expander("SCAN CONFIGURATION", expanded=True):
+        # Quality & Time
+        c_conf1, c_conf2 = st.columns(2)
+        with c_conf1:
+            st.markdown("**STREAM PARAMETERS**")
+            # Format Logic
+            q_map = quality_map(meta)
+            st.selectbox("QUALITY STREAM", list(q_map.keys()), key='quality_label', label_visibility="collapsed")
+
+        with c_conf2:
+            if meta.get('is_playlist'):
+                st.markdown(f"**PLAYLIST: {len(meta['entries'])} LECTURES (full length each)**")
+                st.slider("PARALLEL SCANS", 1, 8, key='playlist_workers')
+            elif meta.get('is_live'):
+                st.markdown("**LIVE BROADCAST: tail from the live edge**")
+                st.slider("STOP AFTER (min)", 5, 240, key='live_minutes')
+            else:
+                st.markdown("**TEMPORAL WINDOW**")
+                duration = meta.get('duration') or 0
+                if duration <= 0: duration = 100
+                if 'window' not in st.session_state: st.session_state['window'] = (0, duration)
+                st.slider("PROCESS WINDOW", 0, duration, key='window', label_visibility="collapsed")
+
+        st.markdown("---")
+        c_adv1, c_adv2 = st.columns(2)
+        with c_adv1:
+            st.caption("VISUAL THRESHOLDS")
+            st.slider("Pixel Delta", 10, 100, key='sensitivity')
+            if meta.get('is_playlist'):
+                st.checkbox("Auto-calibrate each lecture before its scan", key='auto_calibrate')
+            elif not meta.get('is_live'):
+                st.button("AUTO-CALIBRATE FROM VIDEO", on_click=run_calibration, args=(meta,), use_container_width=True)
+                cal = st.session_state.get('calibration')
+                if cal and cal.get('error'):
+                    st.caption(f"CALIBRATION FAILED: {cal['error']}")
+                elif cal:
+                    line = f"CALIBRATED: PIXEL DELTA {cal['sensitivity']} · STRICTNESS {cal['strictness']}% · NOISE ≤{cal['noise_area']}% OF FRAME"
+                    if cal['separated']:
+                        line += f" · SLIDE CHANGES ≥{cal['change_area']}% ({cal['transitions']}/{cal['pairs']} SAMPLE PAIRS)"
+                    else:
+                        line += " · NO CLEAR SLIDE CHANGE IN THE SAMPLE, SETTINGS KEPT"
+                    st.caption(line)
+        with c_adv2:
+            st.caption("SKIP RATE (Sec)")
+            st.slider("Max Skip", 5, 60, key='max_skip')
+            st.checkbox("Adaptive stride (widen on static stretches, look back on changes)", key='adaptive')
+            st.caption("TIME BUDGET (PROGRESSIVE engine, Sec, 0 = until refined)")
+            st.slider("Budget", 0, 600, step=10, key='budget_s', label_visibility="collapsed")
+            st.caption("BUILD SETTLE (Sec, 0 = capture immediately)")
+            st.slider("Settle", 0.0, 5.0, step=0.5, key='settle')
+            st.checkbox("Keep only the final state of slide builds", key='keep_final')
+
+        st.markdown("---")
+        c_roi1, c_roi2 = st.columns(2)
+        with c_roi1:
+            st.caption("SLIDE REGION (% of frame)")
+            st.slider("Horizontal", 0, 100, key='roi_x')
+            st.slider("Vertical", 0, 100, key='roi_y')
+        with c_roi2:
+            st.caption("OVERLAY FILTER")
+            st.checkbox("Auto-exclude webcam / captions motion", key='auto_mask')
+            st.caption("DETECTION ENGINE")
+            st.selectbox("Engine", list(ENGINES.keys()), key='engine', label_visibility="collapsed")
+            st.caption("CHANGE METRIC (OPENCV_DIFF)")
+            st.selectbox("Detector", list(DETECTORS.keys()), key='detector', label_visibility="collapsed")
+            st.caption("FRAME DECODER (OPENCV_DIFF)")
+            st.selectbox("Decoder", DECODERS, key='decoder', label_visibility="collapsed")
+            if not meta.get('is_live'):
+                st.caption("SLIDE LIBRARY")
+                st.checkbox("Reuse known videos and share known slides (re-uploads, reused decks)", key='library')
+
+        st.markdown("---")
+        c_enc1, c_enc2, c_enc3 = st.columns(3)
+        with c_enc1:
+            st.caption("OUTPUT CODEC")
+            st.selectbox("Codec", list(CODECS.keys()), key='codec', label_visibility="collapsed")
+        with c_enc2:
+            st.caption("QUALITY")
+            st.slider("Quality", 40, 100, key='quality', label_visibility="collapsed")
+        with c_enc3:
+            st.caption("MAX RESOLUTION (long side)")
+            st.selectbox("Max side", ["ORIGINAL", 1920, 1280, 960], key='max_side', label_visibility="collapsed")
+
+        # Live preview from the signature index of a previous scan of this exact window
+        start_t, end_t = scan_window(meta)
+        if end_t is not None:
+            key = index_key(st.session_state['url_input'], start_t, end_t, current_roi(), st.session_state['min_skip'])
+            n_prev = index_preview(key, st.session_state['sensitivity'], st.session_state['strictness'], st.session_state['min_skip'], st.session_state['max_skip'], st.session_state['results_rev'])
+            if n_prev is not None:
+                st.caption(f"⚡ INDEX PREVIEW: ≈{n_prev} SLIDES AT PIXEL DELTA {st.session_state['sensitivity']} / MAX SKIP {st.session_state['max_skip']}s (no re-decode)")
+
+@st.fragment
+def scan_console(meta):
+    from engine import ENGINES, capture_at, index_key, library_key, library_scan, make_detector, replay, storyboard_format, quality_map, resolve_stream, scan_live, scan_playlist, SCAN_SLOTS
+    from sigindex import open_index
+    q_map = quality_map(meta)
+    fmt_sel = selected_format(q_map)
+    start_t, end_t = scan_window(meta)
+
+    if st.button("INITIATE EXTRACTION SEQUENCE", type="secondary", use_container_width=True):
+        # --- SCANNIN LOGIC LIVES IN engine.py ---
+        st.session_state['captured_images'] = []
+        st.session_state['captured_times'] = []
+        st.session_state['playlist_results'] = None
+        st.session_state['results_rev'] += 1
+
+        console_ph = st.empty()
+        console_ph.markdown('<div class="console-box"><span class="blink">_</span> ALLOCATING BUFFER...</div>', unsafe_allow_html=True)
+        prog_bar = st.progress(0)
+
+        def on_progress(p, t):
+            prog_bar.progress(p)
+            console_ph.markdown(f'<div class="console-box"><span class="blink">●</span> PROCESSING: {fmt(t)} | BUFFER: OK</div>', unsafe_allow_html=True)
+
+        def on_capture(t, b):
+            st.session_state['captured_images'].append(b)
+            st.session_state['captured_times'].append(t)
+            st.toast(f"Event Logged: {fmt(t)}")
+
+        roi = current_roi()
+        scan_opts = dict(
+            sensitivity=st.session_state['sensitivity'],
+            strictness=st.session_state['strictness'],
+            min_skip=st.session_state['min_skip'],
+            max_skip=st.session_state['max_skip'],
+            roi=roi,
+            auto_mask=st.session_state['auto_mask'],
+            settle=st.session_state['settle'],
+            keep_final=st.session_state['keep_final'],
+            adaptive=st.session_state['adaptive'],
+            decoder=st.session_state['decoder'],
+            encode={
+                'codec': st.session_state['codec'],
+                'quality': st.session_state['quality'],
+                'max_side': None if st.session_state['max_side'] == "ORIGINAL" else st.session_state['max_side'],
+            },
+        )
+        if st.session_state['engine'] == "PROGRESSIVE":
+            # Coarse pass over the whole window first, so a budget-capped scan still covers all of it
+            scan_opts['budget_s'] = st.session_state['budget_s'] or None
+
+        try:
+            source = st.session_state['url_input']
+            t0 = time.time()
+
+            if meta.get('is_playlist'):
+                # --- PLAYLIST: per-video scans on a worker pool, one progress bar each ---
+                entries = meta['entries']
+                console_ph.markdown(f'<div class="console-box"><span class="blink">●</span> PLAYLIST LOCKED. {len(entries)} TARGETS QUEUED</div>', unsafe_allow_html=True)
+                bars = [st.progress(0.0, text=f"QUEUED · {e['title'][:70]}") for e in entries]
+
+                def on_update(status):
+                    finished = sum(j['state'] in ('DONE', 'FAILED') for j in status)
+                    prog_bar.progress(min(1.0, sum(1.0 if j['state'] in ('DONE', 'FAILED') else j['progress'] for j in status) / len(status)))
+                    for bar, j in zip(bars, status):
+                        bar.progress(1.0 if j['state'] == 'DONE' else j['progress'], text=f"{j['state']} · {len(j['captures'])} SLIDES · {j['title'][:70]}")
+                    console_ph.markdown(f'<div class="console-box"><span class="blink">●</span> PLAYLIST: {finished}/{len(status)} COMPLETE</div>', unsafe_allow_html=True)
+
+                status = scan_playlist(
+                    entries, fmt_sel, cookies=st.session_state.get('cookies_path'),
+                    workers=st.session_state['playlist_workers'], on_update=on_update,
+                    engine=st.session_state['engine'], detector=st.session_state['detector'],
+                    auto_calibrate=st.session_state['auto_calibrate'], library=st.session_state['library'], **scan_opts
+                )
+                results = []
+                for j in status:
+                    caps = j['captures'] or []
+                    results.append({
+                        'title': j['title'],
+                        'url': j['url'],
+                        'meta': j['meta'] or {'title': j['title'], 'webpage_url': j['url']},
+                        'times': [t for t, _ in caps],
+                        'images': [b for _, b in caps],
+                        'error': j['error'],
+                    })
+                    st.session_state['captured_times'] += [t for t, _ in caps]
+                    st.session_state['captured_images'] += [b for _, b in caps]
+                st.session_state['playlist_results'] = results
+                st.session_state['scan_stats'] = {
+                    'engine': st.session_state['engine'],
+                    'codec': st.session_state['codec'],
+                    'elapsed': time.time() - t0,
+                    'videos': len(results),
+                    'failed': sum(1 for r in results if r['error']),
+                }
+                st.session_state['scan_complete'] = True # MARK COMPLETED
+                rerun_fragment()
+
+            stream_link = resolve_stream(source, fmt_sel, cookies=st.session_state.get('cookies_path'))
+
+            if stream_link and meta.get('is_live'):
+                # --- LIVE: forward-only tailing, each slide shown as soon as it's encoded ---
+                console_ph.markdown('<div class="console-box"><span class="blink">●</span> LIVE EDGE LOCKED. TAILING...</div>', unsafe_allow_html=True)
+                latest_ph = st.empty()
+
+                def on_live_capture(t, b):
+                    on_capture(t, b)
+                    latest_ph.image(bytes(b), caption=f"LATEST // ID_{len(st.session_state['captured_images']) - 1:03d} @ +{fmt(t)}", use_container_width=True)
+
+                det = make_detector(st.session_state['detector'], st.session_state['sensitivity'], st.session_state['strictness'])
+                live_opts = {k: v for k, v in scan_opts.items() if k not in ('auto_mask', 'settle', 'keep_final', 'adaptive')}
+                with SCAN_SLOTS:
+                    scan_live(
+                        stream_link, detector=det, max_duration=st.session_state['live_minutes'] * 60,
+                        on_progress=on_progress, on_capture=on_live_capture, **live_opts
+                    )
+                st.session_state['scan_stats'] = {
+                    'engine': "LIVE_TAIL",
+                    'codec': st.session_state['codec'],
+                    'elapsed': time.time() - t0,
+                    'detector': det.name if det.calls else None,
+                    'samples': det.calls,
+                    'cost_ms': det.cost_ms,
+                }
+                st.session_state['scan_complete'] = True # MARK COMPLETED
+                rerun_fragment()
+
+            if stream_link:
+                console_ph.markdown(f'<div class="console-box"><span class="blink">●</span> STREAM LOCKED. SEEKING: {fmt(start_t)}</div>', unsafe_allow_html=True)
+                scan_fn = ENGINES[st.session_state['engine']]
+                det = make_detector(st.session_state['detector'], st.session_state['sensitivity'], st.session_state['strictness'])
+                # OpenCV / progressive scans also leave a signature index behind for instant re-thresholding
+                key = index_key(source, start_t, end_t, roi, st.session_state['min_skip']) if st.session_state['engine'] in ("OPENCV_DIFF", "PROGRESSIVE") else None
+                extra = {'index_key': key} if key else {}
+                if st.session_state['engine'] == "STORYBOARD":
+                    # Tiles pick the intervals to decode; no storyboard (local file, ...) means a full scan
+                    extra['storyboard'] = storyboard_format(meta)
+                def run():
+                    return scan_fn(
+                        stream_link, start_t, end_t,
+                        detector=det,
+                        **extra,
+                        on_progress=on_progress,
+                        on_capture=on_capture,
+                        **scan_opts
+                    )
+
+                used = None
+                with SCAN_SLOTS:
+                    if st.session_state['library']:
+                        # Same video (by fingerprint) scanned with the same settings before: no scan at all
+                        console_ph.markdown('<div class="console-box"><span class="blink">●</span> FINGERPRINTING AGAINST SLIDE LIBRARY...</div>', unsafe_allow_html=True)
+                        lib_key = library_key(st.session_state['engine'], start_t, end_t, meta.get('duration'), dict(scan_opts, detector=st.session_state['detector'], auto_calibrate=False))
+                        captures, used = library_scan(stream_link, source, meta, lib_key, run, scan_opts['encode'], on_capture, on_progress, end_t)
+                        # Stored slides shared with known ones hand out the library's copy
+                        st.session_state['captured_images'] = [b for _, b in captures]
+                    else:
+                        run()
+                known = used is not None and used['reused']
+                st.session_state['scan_stats'] = {
+                    'engine': "SLIDE_LIBRARY" if known else st.session_state['engine'],
+                    'codec': st.session_state['codec'],
+                    'elapsed': time.time() - t0,
+                    'detector': det.name if det.calls else None,
+                    'samples': det.calls,
+                    'cost_ms': det.cost_ms,
+                    'escalated': getattr(det, 'escalated', None) if det.calls else None,
+                }
+                if known and not (key and open_index(key)):
+                    key = None
+                st.session_state['index_key'] = key
+                st.session_state['stream_link'] = stream_link
+                st.session_state['scan_complete'] = True # MARK COMPLETED
+                console_ph.markdown('<div class="console-box" style="color:#10b981; border-color:#10b981;">✓ SEQUENCE COMPLETE</div>', unsafe_allow_html=True)
+                rerun_fragment() # Refresh the console to show results button
+        except IOError as e:
+            st.error(str(e))
+        except Exception as e:
+            st.error(f"Error during scan: {str(e)}")
+
+    # RESULT ACTION
+    if st.session_state.get('scan_complete') and st.session_state['captured_images']:
+        st.success(f"SCAN SUCCESSFUL. {len(st.session_state['captured_images'])} Slides Captured.")
+        stats = st.session_state.get('scan_stats')
+        if stats:
+            line = f"ENGINE: {stats['engine']} | ELAPSED: {stats['elapsed']:.1f}s"
+            if stats.get('videos'):
+                line += f" | LECTURES: {stats['videos']} ({stats['failed']} FAILED)"
+            if stats.get('detector'):
+                line += f" | DETECTOR: {stats['detector']} | {stats['samples']} SAMPLES @ {stats['cost_ms']:.2f} ms"
+            if stats.get('escalated') is not None:
+                line += f" | FULL-RES CHECKS: {stats['escalated']}"
+            st.caption(line)
+        if st.session_state.get('index_key') and st.session_state.get('stream_link'):
+            if st.button("RE-APPLY CURRENT THRESHOLDS FROM INDEX (decode captures only)", use_container_width=True):
+                idx = open_index(st.session_state['index_key'])
+                if idx is None:
+                    st.warning("Signature index expired. Run the scan again.")
+                else:
+                    t0 = time.time()
+                    times = replay(idx, st.session_state['sensitivity'], st.session_state['strictness'], st.session_state['min_skip'], st.session_state['max_skip'])
+                    caps = capture_at(st.session_state['stream_link'], times, encode={
+                        'codec': st.session_state['codec'],
+                        'quality': st.session_state['quality'],
+                        'max_side': None if st.session_state['max_side'] == "ORIGINAL" else st.session_state['max_side'],
+                    })
+                    st.session_state['captured_times'] = [t for t, _ in caps]
+                    st.session_state['captured_images'] = [b for _, b in caps]
+                    st.session_state['scan_stats'] = dict(st.session_state['scan_stats'] or {}, engine="INDEX_REPLAY", elapsed=time.time() - t0, detector=None, escalated=None, codec=st.session_state['codec'])
+                    st.session_state['results_rev'] += 1
+                    rerun_fragment()
+        if st.button("FINISH & VIEW GALLERY >>", type="primary", use_container_width=True):
+            st.session_state['setup_active'] = False
+            st.rerun()
+
+
+# --- GALLERY FRAGMENTS ---
+# Exports are built only when their button is clicked (deferred data, on_click="ignore": no rerun),
+# and the grid is paged so a rerun ships at most GALLERY_PAGE images however long the lecture was.
+@st.fragment
+def gallery_actions():
+    # Actions Row
+    c_act1, c_act2, c_act3 = st.columns([1, 2, 2])
+    with c_act1:
+        # New Scan Button
+        if st.button("NEW SCAN", type="secondary", use_container_width=True):
+            st.session_state['setup_active'] = True
+            st.session_state['setup_step'] = 1
+            st.session_state['scan_complete'] = False
+            st.session_state['captured_images'] = []
+            st.session_state['captured_times'] = []
+            st.session_state['playlist_results'] = None
+            st.session_state['results_rev'] += 1
+            st.rerun()
+
+    images = st.session_state['captured_images']
+    times = st.session_state.get('captured_times') or [0.0] * len(images)
+    meta = st.session_state.get('video_info')
+    codec = (st.session_state.get('scan_stats') or {}).get('codec', "JPEG")
+    playlist = st.session_state.get('playlist_results')
+    # Deferred builders run outside the script thread, so they close over plain objects only
+    cache, rev = st.session_state['export_cache'], st.session_state['results_rev']
+
+    def build_pdf():
+        # One PDF per result set; repeated clicks re-send the cached file
+        if cache.get('pdf_rev') != rev or not os.path.exists(cache.get('pdf') or ""):
+            fd, path = tempfile.mkstemp(suffix=".pdf")
+            os.close(fd)
+            if playlist:
+                create_pdf(None, sections=[(f"{i + 1:02d}. {r['title']}", r['images']) for i, r in enumerate(playlist)], path=path)
+            else:
+                create_pdf(images, path=path)
+            if cache.get('pdf') and os.path.exists(cache['pdf']): os.remove(cache['pdf'])
+            cache.update(pdf=path, pdf_rev=rev)
+        with open(cache['pdf'], "rb") as f:
+            return f.read()
+
+    def build_zip(times=times, images=images, meta=meta):
+        # Built in memory on click: no temp file or open handle left behind per download
+        return b"".join(iter_zip(times, images, meta, codec))
+
+    with c_act2:
+        st.download_button("DOWNLOAD FULL PDF REPORT", build_pdf, "lecture_notes.pdf", "application/pdf", on_click="ignore", type="primary", use_container_width=True)
+    with c_act3:
+        # ZIP of original slide bytes + manifest.json / index.html / index.md, built on click
+        st.download_button("DOWNLOAD SLIDES ZIP + INDEX", build_zip, "lecture_slides.zip", "application/zip", on_click="ignore", use_container_width=True)
+
+    if playlist:
+        with st.expander("PER-LECTURE EXPORTS", expanded=False):
+            for i, r in enumerate(playlist):
+                c_pl1, c_pl2 = st.columns([3, 1])
+                with c_pl1:
+                    status = f"FAILED: {r['error']}" if r['error'] else f"{len(r['images'])} slides"
+                    st.markdown(f"**{i + 1:02d}. {r['title']}** — {status}")
+                with c_pl2:
+                    if r['images']:
+                        st.download_button(
+                            "ZIP", lambda r=r: build_zip(r['times'], r['images'], r['meta']),
+                            f"lecture_{i + 1:02d}.zip", "application/zip", key=f"pl_zip_{i}", on_click="ignore", use_container_width=True
+                        )
+
+@st.fragment
+def gallery_grid():
+    images = st.session_state['captured_images']
+    st.write("")
+    pages = max(1, -(-len(images) // GALLERY_PAGE))
+    st.markdown(f'<div class="section-header">CAPTURED ARTIFACTS ({len(images)}{f" // {pages} PAGES" if pages > 1 else ""})</div>', unsafe_allow_html=True)
+
+    if st.session_state.get('gallery_page', 1) > pages: st.session_state['gallery_page'] = 1
+    page = st.number_input("PAGE", 1, pages, key='gallery_page') if pages > 1 else 1
+    first = (page - 1) * GALLERY_PAGE
+
+    cols = st.columns(3)
+    for i, buf in enumerate(images[first:first + GALLERY_PAGE], start=first):
+        with cols[i % 3]:
+            # JPEG bytes go straight to the browser, no decode round-trip
+            st.image(bytes(buf), caption=f"ID_{i:03d}", use_container_width=True)
+
+# --- ULTRA MODERN DARK THEME CSS ---
+st.markdown(load_css(), unsafe_allow_html=True)
 
 # --- HEADER ---
 st.markdown("""
@@ -822,12 +578,6 @@ if st.session_state.get('setup_active', False):
     
     step = st.session_state.setup_step
     
-    # Placeholder Logic for Images
-    def get_step_image(step_num):
-        fname = f"step_0{step_num}.jpg"
-        if os.path.exists(fname): return fname
-        return None
-
     # Distinct Container Targeted by CSS
     with st.container():
         st.markdown('<div class="setup-wizard-marker"></div>', unsafe_allow_html=True)
@@ -911,16 +661,17 @@ if st.session_state.get('setup_active', False):
                         st.rerun()
 
             with c_img:
-                img_path = get_step_image(step)
+                img_bytes = get_step_image(step)
                 st.markdown('<div class="step-image-container">', unsafe_allow_html=True)
-                if img_path:
-                    st.image(img_path, use_container_width=True)
+                if img_bytes:
+                    st.image(img_bytes, use_container_width=True)
                 else:
                     st.code(f"[SYSTEM_ERR: VISUAL_GUIDE_MISSING]\nLoading: step_0{step}.jpg...", language="bash")
                 st.markdown('</div>', unsafe_allow_html=True)
         
         else:
             # --- STEP 6: INTEGRATED SCANNING (REPLACES BOTTOM LOGIC) ---
+            from engine import SpilledUpload, get_playlist_entries, get_video_info
             st.info("🎯 **TARGET ACQUISITION & EXECUTION**")
             st.markdown("Enter URL, Resolve Metadata, and **Execute Extraction Sequence** immediately.")
             
@@ -930,17 +681,35 @@ if st.session_state.get('setup_active', False):
             # Input Row
             col_in, col_btn = st.columns([3, 1])
             with col_in:
-                url_wiz = st.text_input("INPUT SOURCE", value=st.session_state['url_input'], placeholder="https://youtube.com/watch?v=...", label_visibility="collapsed", key="wiz_url")
+                url_wiz = st.text_input("INPUT SOURCE", value=st.session_state['url_input'], placeholder="https://youtube.com/watch?v=... or /path/to/lecture.mp4", label_visibility="collapsed", key="wiz_url")
+                uploaded_vid = st.file_uploader("OR UPLOAD VIDEO FILE", type=VIDEO_EXTS, key="wiz_upload")
+                st.checkbox("PLAYLIST / CHANNEL MODE (scan every lecture in the list)", key='playlist_mode')
             with col_btn:
                 if st.button("ANALYZE SOURCE", type="primary", use_container_width=True):
+                    if uploaded_vid:
+                        # Spill the upload to disk once; the scan then decodes it like any local path.
+                        # file_id changes with every upload, even one reusing the previous file name.
+                        spill = st.session_state.get('upload_spill')
+                        if spill is None or spill.file_id != uploaded_vid.file_id:
+                            if spill: spill.discard()
+                            st.session_state['upload_spill'] = spill = SpilledUpload(uploaded_vid)
+                        url_wiz = spill.path
                     if not url_wiz:
-                        st.warning("Target URL required.")
+                        st.warning("Target URL or video file required.")
                     else:
                         st.session_state['url_input'] = url_wiz
                         st.session_state['scan_complete'] = False # Reset scan status
-                        info, err = get_video_info(url_wiz, cookies=st.session_state.get('cookies_path'))
+                        if st.session_state['playlist_mode'] and not uploaded_vid:
+                            info, err = get_playlist_entries(url_wiz, cookies=st.session_state.get('cookies_path'))
+                        else:
+                            info, err = get_video_info(url_wiz, cookies=st.session_state.get('cookies_path'))
                         if info:
                             st.session_state['video_info'] = info
+                            # Window / quality widgets and measured thresholds are per-source
+                            st.session_state.pop('window', None)
+                            st.session_state.pop('quality_label', None)
+                            st.session_state['strictness'] = 1.0
+                            st.session_state['calibration'] = None
                         else:
                             st.error(f"TARGET LOCK FAILED: {err}")
 
@@ -949,125 +718,8 @@ if st.session_state.get('setup_active', False):
                 meta = st.session_state['video_info']
                 st.success(f"LOCKED: {meta.get('title')[:60]}...")
                 
-                # Configuration Area (Sliders)
-                with st.expander("SCAN CONFIGURATION", expanded=True):
-                    # Quality & Time
-                    c_conf1, c_conf2 = st.columns(2)
-                    with c_conf1:
-                        st.markdown("**STREAM PARAMETERS**")
-                        # Format Logic
-                        fmts = [f for f in meta.get('formats', []) if f.get('height')]
-                        heights = sorted(list(set(f['height'] for f in fmts)), reverse=True)
-                        q_map = {f"{h}p RAW": f"bestvideo[height<={h}]/best[height<={h}]" for h in heights}
-                        q_map["AUTO_NEGOTIATE"] = "bestvideo/best"
-                        qual = st.selectbox("QUALITY STREAM", list(q_map.keys()), label_visibility="collapsed")
-                    
-                    with c_conf2:
-                        st.markdown("**TEMPORAL WINDOW**")
-                        duration = meta.get('duration') or 0
-                        if duration <= 0: duration = 100
-                        start_t, end_t = st.slider("PROCESS WINDOW", 0, duration, (0, duration), label_visibility="collapsed")
-
-                    st.markdown("---")
-                    c_adv1, c_adv2 = st.columns(2)
-                    with c_adv1:
-                        st.caption("VISUAL THRESHOLDS")
-                        st.slider("Pixel Delta", 10, 100, key='sensitivity')
-                    with c_adv2:
-                        st.caption("SKIP RATE (Sec)")
-                        st.slider("Max Skip", 5, 60, key='max_skip')
-
-                # EXECUTION BUTTON
-                if st.button("INITIATE EXTRACTION SEQUENCE", type="secondary", use_container_width=True):
-                    # --- SCANNIN LOGIC MOVED HERE ---
-                    st.session_state['captured_images'] = []
-                    
-                    console_ph = st.empty()
-                    console_ph.markdown('<div class="console-box"><span class="blink">_</span> ALLOCATING BUFFER...</div>', unsafe_allow_html=True)
-                    prog_bar = st.progress(0)
-                    
-                    ydl_opts = {
-                        'format': q_map[qual], 
-                        'quiet': True, 
-                        'nocheckcertificate': True,
-                        'noplaylist': True,
-                        'cookiefile': st.session_state.get('cookies_path') 
-                    }
-                    
-                    try:
-                        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                            stream_link = ydl.extract_info(url_wiz, download=False).get('url')
-                            
-                        if stream_link:
-                            console_ph.markdown(f'<div class="console-box"><span class="blink">●</span> STREAM LOCKED. SEEKING: {fmt(start_t)}</div>', unsafe_allow_html=True)
-                            
-                            cap = cv2.VideoCapture(stream_link, cv2.CAP_FFMPEG)
-                            if cap.isOpened():
-                                fps = cap.get(cv2.CAP_PROP_FPS) or 30
-                                cap.set(cv2.CAP_PROP_POS_MSEC, start_t * 1000)
-                                
-                                last = None
-                                curr = int(start_t * fps)
-                                end = int(end_t * fps)
-                                total = max(1, end - curr)
-                                origin = curr
-                                
-                                sensitivity = st.session_state['sensitivity']
-                                strictness = st.session_state['strictness']
-                                min_skip = st.session_state['min_skip']
-                                max_skip = st.session_state['max_skip']
-                                
-                                while curr < end:
-                                    cap.set(cv2.CAP_PROP_POS_FRAMES, curr)
-                                    ret, frame = cap.read()
-                                    if not ret: break
-                                    
-                                    # Update metrics
-                                    p = (curr - origin) / total
-                                    prog_bar.progress(min(max(p, 0.0), 1.0))
-                                    ts = fmt(curr / fps)
-                                    console_ph.markdown(f'<div class="console-box"><span class="blink">●</span> PROCESSING: {ts} | BUFFER: OK</div>', unsafe_allow_html=True)
-                                    
-                                    # CV Logic
-                                    small = cv2.resize(frame, (640, 360))
-                                    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
-                                    gray = cv2.GaussianBlur(gray, (21, 21), 0)
-                                    
-                                    is_diff = False
-                                    if last is None:
-                                        is_diff = True
-                                        last = gray
-                                    else:
-                                        d = cv2.absdiff(last, gray)
-                                        _, th = cv2.threshold(d, sensitivity, 255, cv2.THRESH_BINARY)
-                                        if np.sum(th) > (640 * 360 * (strictness/100) * 255):
-                                            is_diff = True
-                                            last = gray
-                                    
-                                    if is_diff:
-                                        _, b = cv2.imencode('.jpg', frame)
-                                        st.session_state['captured_images'].append(b)
-                                        st.toast(f"Event Logged: {ts}")
-                                        curr += int(fps * max_skip)
-                                    else:
-                                        curr += int(fps * min_skip)
-                                
-                                cap.release()
-                                prog_bar.progress(1.0)
-                                st.session_state['scan_complete'] = True # MARK COMPLETED
-                                console_ph.markdown('<div class="console-box" style="color:#10b981; border-color:#10b981;">✓ SEQUENCE COMPLETE</div>', unsafe_allow_html=True)
-                                st.rerun() # Refresh to show results button
-                            else:
-                                st.error("STREAM HANDSHAKE FAILED")
-                    except Exception as e:
-                        st.error(f"Error during scan: {str(e)}")
-
-            # RESULT ACTION
-            if st.session_state.get('scan_complete') and st.session_state['captured_images']:
-                st.success(f"SCAN SUCCESSFUL. {len(st.session_state['captured_images'])} Slides Captured.")
-                if st.button("FINISH & VIEW GALLERY >>", type="primary", use_container_width=True):
-                    st.session_state['setup_active'] = False
-                    st.rerun()
+                scan_config(meta)
+                scan_console(meta)
 
         # Navigation Footer
         st.write("")
@@ -1197,32 +849,9 @@ if not st.session_state['setup_active']:
     if st.session_state['captured_images']:
         st.markdown('<div class="section-header">SLIDE GALLERY</div>', unsafe_allow_html=True)
         
-        # Actions Row
-        c_act1, c_act2 = st.columns([1, 4])
-        with c_act1:
-            # New Scan Button
-            if st.button("NEW SCAN", type="secondary", use_container_width=True):
-                st.session_state['setup_active'] = True
-                st.session_state['setup_step'] = 1
-                st.session_state['scan_complete'] = False
-                st.session_state['captured_images'] = []
-                st.rerun()
-        with c_act2:
-             # PDF Download
-            pdf = create_pdf(st.session_state['captured_images'])
-            if pdf and os.path.exists(pdf):
-                with open(pdf, "rb") as f:
-                    st.download_button("DOWNLOAD FULL PDF REPORT", f.read(), "lecture_notes.pdf", "application/pdf", type="primary", use_container_width=True)
+        gallery_actions()
+        gallery_grid()
 
-        st.write("")
-        st.markdown(f'<div class="section-header">CAPTURED ARTIFACTS ({len(st.session_state["captured_images"])})</div>', unsafe_allow_html=True)
-        
-        cols = st.columns(3)
-        for i, buf in enumerate(st.session_state['captured_images']):
-            im = cv2.imdecode(buf, cv2.IMREAD_COLOR)
-            with cols[i % 3]:
-                st.image(cv2.cvtColor(im, cv2.COLOR_BGR2RGB), caption=f"ID_{i:03d}", use_container_width=True)
-    
     else:
         # Fallback if user somehow exits wizard without scanning
         st.info("No artifacts available. Initialize a scan to begin.")
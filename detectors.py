@@ -0,0 +1,216 @@
+import time
+import cv2
+import numpy as np
+
+# --- CHANGE DETECTORS ---
+# A detector turns the gray ROI crop (640x360 basis, see engine.prep_gray) into a signature and
+# scores two signatures; score > threshold means "new slide". Every detector times its own work
+# so scans can report the per-sample cost next to the result.
+
+
+class Detector:
+    name = "BASE"
+
+    def __init__(self, sensitivity=35, strictness=1.0, mask=None):
+        self.sensitivity = sensitivity
+        self.strictness = strictness
+        self.calls = 0
+        self.elapsed = 0.0
+        self.set_mask(mask)
+
+    @property
+    def threshold(self):
+        return self.strictness / 100
+
+    @property
+    def cost_ms(self):
+        return 1000 * self.elapsed / self.calls if self.calls else 0.0
+
+    def set_mask(self, mask):
+        # mask is 0/255 on the ROI crop (255 = keep); each detector resizes it to its own scale
+        self.mask = mask
+        self._masks = {}
+
+    def mask_for(self, shape):
+        if self.mask is None: return None
+        if shape not in self._masks:
+            self._masks[shape] = cv2.resize(self.mask, (shape[1], shape[0]), interpolation=cv2.INTER_NEAREST) > 0
+        return self._masks[shape]
+
+    def signature(self, gray):
+        raise NotImplementedError
+
+    def score(self, a, b):
+        raise NotImplementedError
+
+    def measure(self, gray, last=None):
+        # -> (signature, score); score is None for the first sample
+        t0 = time.perf_counter()
+        sig = self.signature(gray)
+        s = None if last is None else self.score(last, sig)
+        self.elapsed += time.perf_counter() - t0
+        self.calls += 1
+        return sig, s
+
+    def changed(self, score):
+        return score is None or score > self.threshold
+
+
+class AbsDiffDetector(Detector):
+    # The original metric: share of blurred pixels moving by more than "Pixel Delta"
+    name = "ABSDIFF"
+
+    def signature(self, gray):
+        return cv2.GaussianBlur(gray, (21, 21), 0)
+
+    def score(self, a, b):
+        th = cv2.absdiff(a, b) > self.sensitivity
+        m = self.mask_for(th.shape)
+        if m is None: return float(np.count_nonzero(th) / th.size)
+        return float(np.count_nonzero(th & m) / max(1, np.count_nonzero(m)))
+
+
+class BlockHistDetector(Detector):
+    # Per-block gray histograms: tolerant of noise and brightness drift, sensitive to layout changes.
+    # Blocks are 20x12 at 320x192, small enough that a changed line of text shifts their histograms.
+    name = "BLOCK_HIST"
+    grid = (16, 16)
+    bins = 16
+
+    def signature(self, gray):
+        small = cv2.resize(gray, (320, 192), interpolation=cv2.INTER_AREA)
+        # Re-centre brightness on the median (the slide background) so fades / exposure drift don't
+        # move every histogram; the mean would also follow a webcam tile and shift every block
+        small = cv2.convertScaleAbs(small, beta=128 - float(np.median(small)))
+        gy, gx = self.grid
+        bh, bw = small.shape[0] // gy, small.shape[1] // gx
+        blocks = small[:bh * gy, :bw * gx].reshape(gy, bh, gx, bw).swapaxes(1, 2).reshape(gy * gx, bh * bw)
+        q = (blocks.astype(np.int32) * self.bins) >> 8
+        q += (np.arange(gy * gx, dtype=np.int32) * self.bins)[:, None]
+        hist = np.bincount(q.ravel(), minlength=gy * gx * self.bins).reshape(gy * gx, self.bins)
+        # Cumulative form: comparing CDFs gives the earth-mover distance, which doesn't jump when
+        # noise pushes a flat block across a bin edge
+        return np.cumsum(hist, axis=1).astype(np.float32) / (bh * bw)
+
+    def block_mask(self):
+        # Only blocks entirely outside the excluded overlay take part
+        if self.mask is None: return None
+        if 'blocks' not in self._masks:
+            cover = cv2.resize(self.mask.astype(np.float32) / 255, (self.grid[1], self.grid[0]), interpolation=cv2.INTER_AREA)
+            self._masks['blocks'] = (cover > 0.99).ravel()
+        return self._masks['blocks']
+
+    def score(self, a, b):
+        # Earth-mover distance per block in gray levels; a block changes above Pixel Delta / 4
+        # (sensor noise moves a block's histogram by a few levels, a changed text line well past that)
+        emd = np.abs(a - b).sum(axis=1) * (256 / self.bins)
+        hit = emd > self.sensitivity / 4
+        m = self.block_mask()
+        if m is not None:
+            return float(np.count_nonzero(hit & m) / max(1, np.count_nonzero(m)))
+        return float(np.count_nonzero(hit) / hit.size)
+
+    @property
+    def threshold(self):
+        # A changed text line touches every block it crosses, ~3x the area ABSDIFF counts for it
+        return max(3 * self.strictness / 100, 1.5 / (self.grid[0] * self.grid[1]))
+
+
+class EdgeDetector(Detector):
+    # Edge maps ignore gradual brightness/colour animation and compression shimmer
+    name = "EDGE"
+
+    def signature(self, gray):
+        small = cv2.resize(gray, (320, 180), interpolation=cv2.INTER_AREA)
+        lo = max(10, self.sensitivity)
+        edges = cv2.Canny(small, lo, lo * 3)
+        return cv2.dilate(edges, np.ones((3, 3), np.uint8)) > 0
+
+    def score(self, a, b):
+        diff = a ^ b
+        m = self.mask_for(diff.shape)
+        if m is None: return float(np.count_nonzero(diff) / diff.size)
+        return float(np.count_nonzero(diff & m) / max(1, np.count_nonzero(m)))
+
+    @property
+    def threshold(self):
+        # Dilated edges flicker on ~0.7% of pixels under compression noise
+        return 2 * self.strictness / 100
+
+
+class SSIMDetector(Detector):
+    # Structural similarity on a 160x90 copy; score is the share of pixels whose local SSIM drops
+    # below 1 - Pixel Delta / 50. The mean SSIM a text slide change leaves is within sensor noise.
+    name = "SSIM"
+    C1 = (0.01 * 255) ** 2
+    C2 = (0.03 * 255) ** 2
+
+    def signature(self, gray):
+        small = cv2.resize(gray, (160, 90), interpolation=cv2.INTER_AREA).astype(np.float32)
+        mu = cv2.GaussianBlur(small, (7, 7), 1.5)
+        var = cv2.GaussianBlur(small * small, (7, 7), 1.5) - mu * mu
+        return small, mu, var
+
+    def score(self, a, b):
+        (x, mx, vx), (y, my, vy) = a, b
+        cov = cv2.GaussianBlur(x * y, (7, 7), 1.5) - mx * my
+        ssim = ((2 * mx * my + self.C1) * (2 * cov + self.C2)) / ((mx * mx + my * my + self.C1) * (vx + vy + self.C2))
+        hit = (1 - ssim) > min(self.sensitivity / 50, 0.9)
+        m = self.mask_for(hit.shape)
+        if m is None: return float(np.count_nonzero(hit) / hit.size)
+        return float(np.count_nonzero(hit & m) / max(1, np.count_nonzero(m)))
+
+    @property
+    def threshold(self):
+        # The 7x7 SSIM window spreads a change over its neighbourhood: a text slide change covers
+        # ~5-10% of pixels here where ABSDIFF counts ~1.5% (noise-only pairs stay near 0)
+        return 4 * self.strictness / 100
+
+
+class CascadeDetector(Detector):
+    # Coarse-to-fine: an 80x45 area-averaged signature settles the common "nothing changed" case,
+    # and only samples where some tiny pixel moves by more than Pixel Delta / 2 reach the full
+    # detector. Each tiny pixel averages an 8x8 block, so a change big enough to pass the full
+    # absdiff threshold shows up above that bound and decisions stay those of the wrapped detector.
+    name = "CASCADE"
+    tiny = (80, 45)
+
+    def __init__(self, sensitivity=35, strictness=1.0, mask=None, inner="ABSDIFF"):
+        self.inner = make_detector(inner, sensitivity, strictness, mask)
+        self.escalated = 0
+        super().__init__(sensitivity, strictness, mask)
+
+    @property
+    def threshold(self):
+        return self.inner.threshold
+
+    def set_mask(self, mask):
+        super().set_mask(mask)
+        if hasattr(self, 'inner'): self.inner.set_mask(mask)
+
+    def measure(self, gray, last=None):
+        t0 = time.perf_counter()
+        small = cv2.resize(gray, self.tiny, interpolation=cv2.INTER_AREA)
+        s = None
+        if last is not None:
+            d = cv2.absdiff(last[0], small) > self.sensitivity / 2
+            m = self.mask_for(d.shape)
+            if m is not None: d &= m
+            if not d.any(): s = 0.0
+        full = None
+        if s is None:
+            self.escalated += 1
+            full = self.inner.signature(gray)
+            if last is not None: s = self.inner.score(last[1], full)
+        self.elapsed += time.perf_counter() - t0
+        self.calls += 1
+        return (small, full), s
+
+
+DETECTORS = {d.name: d for d in (AbsDiffDetector, BlockHistDetector, EdgeDetector, SSIMDetector, CascadeDetector)}
+
+
+def make_detector(kind="ABSDIFF", sensitivity=35, strictness=1.0, mask=None):
+    if isinstance(kind, Detector):
+        return kind
+    return DETECTORS[kind](sensitivity, strictness, mask)
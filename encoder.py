@@ -0,0 +1,71 @@
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from export import CODECS
+
+# --- CAPTURE ENCODING ---
+# cv2.imencode releases the GIL, so full-resolution captures are encoded on a small pool while the
+# scan keeps decoding. Results are handed back on the caller's thread, in submission order
+# (i.e. timestamp order), so Streamlit callbacks stay on the script thread.
+
+
+def encode_params(codec, quality):
+    if codec == "JPEG": return [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    if codec == "WEBP": return [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+    # PNG is lossless; map quality onto zlib effort instead (100 -> fastest)
+    return [cv2.IMWRITE_PNG_COMPRESSION, min(9, max(0, round((100 - quality) / 11)))]
+
+
+def encode_frame(frame, codec="JPEG", quality=95, max_side=None):
+    if max_side:
+        h, w = frame.shape[:2]
+        if max(h, w) > max_side:
+            k = max_side / max(h, w)
+            frame = cv2.resize(frame, (int(w * k), int(h * k)), interpolation=cv2.INTER_AREA)
+    ok, b = cv2.imencode(CODECS[codec][0], frame, encode_params(codec, quality))
+    if not ok:
+        raise ValueError(f"{codec} encode failed")
+    return b
+
+
+class EncodePool:
+    def __init__(self, codec="JPEG", quality=95, max_side=None, workers=2, max_pending=8, on_done=None):
+        self.codec = codec
+        self.quality = quality
+        self.max_side = max_side
+        self.max_pending = max(1, max_pending)
+        self.on_done = on_done
+        self.results = []
+        self._inflight = collections.deque()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="encode")
+
+    def submit(self, t, frame):
+        # Bounded: once max_pending frames are queued, wait for the oldest (caps held frames in memory)
+        while len(self._inflight) >= self.max_pending:
+            self._deliver(block=True)
+        fut = self._pool.submit(encode_frame, frame, self.codec, self.quality, self.max_side)
+        self._inflight.append((t, fut))
+        self._deliver(block=False)
+
+    def poll(self):
+        # Hand back whatever has finished without waiting (long-running callers, e.g. live mode)
+        self._deliver(block=False)
+
+    def _deliver(self, block):
+        while self._inflight and (block or self._inflight[0][1].done()):
+            t, fut = self._inflight.popleft()
+            b = fut.result()
+            self.results.append((t, b))
+            if self.on_done: self.on_done(t, b)
+            block = False
+
+    def close(self):
+        while self._inflight:
+            self._deliver(block=True)
+        self._pool.shutdown(wait=True)
+        return self.results
+
+    def abort(self):
+        for _, fut in self._inflight: fut.cancel()
+        self._inflight.clear()
+        self._pool.shutdown(wait=False)
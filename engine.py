@@ -0,0 +1,1456 @@
+import collections
+import heapq
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import queue
+import weakref
+from concurrent.futures import ThreadPoolExecutor, wait
+import cv2
+import yt_dlp
+import numpy as np
+from detectors import make_detector
+from encoder import EncodePool
+from library import open_library, scan_key as library_key
+from sigindex import SIG_H, SIG_W, IndexWriter, index_key, replay, signature
+from storyboard import iter_tiles, storyboard_format
+
+# --- SCAN ENGINE ---
+# Everything that touches video lives here so app.py (and anything else) can
+# drive a scan without going through the Streamlit wizard.
+
+LOCAL_FORMAT = "SOURCE FILE"
+
+
+def is_local_source(src):
+    return bool(src) and os.path.isfile(os.path.expanduser(src))
+
+
+def save_upload(uploaded):
+    # Streamlit uploads live in memory; spill to disk once so OpenCV can decode the file directly
+    suffix = os.path.splitext(uploaded.name)[1] or '.mp4'
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, mode='wb') as fp:
+        uploaded.seek(0)
+        shutil.copyfileobj(uploaded, fp, 1024 * 1024)
+        return fp.name
+
+
+def cookie_file(text):
+    # cookies.txt contents sent with an API/queue job -> a private temp file for yt_dlp (which writes
+    # refreshed cookies back to it); the job removes it when it ends
+    fd, path = tempfile.mkstemp(prefix="cookies-", suffix=".txt")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    return path
+
+
+def _remove_quietly(path):
+    if os.path.exists(path): os.remove(path)
+
+
+class SpilledUpload:
+    # save_upload's temp copy, tied to this object: the file goes when it is discarded (a new upload
+    # replaces it) or garbage-collected with the session that held it, at the latest on exit
+    def __init__(self, uploaded):
+        self.file_id = uploaded.file_id
+        self.path = save_upload(uploaded)
+        self._remove = weakref.finalize(self, _remove_quietly, self.path)
+
+    def discard(self):
+        self._remove()
+
+
+def probe_local(path):
+    path = os.path.expanduser(path)
+    cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        return None, f"cannot open {path}"
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    frames = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+    w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    # Shaped like a yt_dlp info dict so the UI can treat both sources the same
+    return {
+        'title': os.path.basename(path),
+        'duration': int(frames / fps) if frames > 0 else 0,
+        'fps': fps,
+        'width': w,
+        'height': h,
+        'webpage_url': path,
+        'is_local': True,
+        'formats': [],
+    }, None
+
+
+def get_video_info(url, cookies=None, proxy=None):
+    if is_local_source(url):
+        return probe_local(url)
+    opts = {
+        'quiet': True,
+        'nocheckcertificate': True,
+        'user_agent': 'Mozilla/5.0',
+        'noplaylist': True # Prevent playlist processing
+    }
+    if cookies: opts['cookiefile'] = cookies
+    if proxy: opts['proxy'] = proxy
+    try:
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            return ydl.extract_info(url, download=False), None
+    except Exception as e:
+        return None, str(e)
+
+
+def flat_entries(ydl, info, depth=2):
+    # A channel URL lists its tabs (Videos, Shorts, Live) as nested playlists rather than videos:
+    # walk those (already inlined, or re-extracted from their URL) down to the videos themselves
+    entries, seen = [], set()
+    for e in info.get('entries') or []:
+        if not e: continue
+        if e.get('_type') == 'playlist' or (e.get('_type') == 'url' and e.get('ie_key') == 'YoutubeTab'):
+            if depth <= 0: continue
+            if e.get('entries') is None:
+                src = e.get('url') or e.get('webpage_url')
+                if not src: continue
+                try:
+                    e = ydl.extract_info(src, download=False)
+                except Exception:
+                    continue # a tab the channel doesn't have (no Shorts, no Live)
+            sub = flat_entries(ydl, e, depth - 1)
+        else:
+            link = e.get('url') or e.get('webpage_url') or e.get('id')
+            if link and not link.startswith(('http://', 'https://')):
+                link = f"https://www.youtube.com/watch?v={link}"
+            sub = [{'title': e.get('title') or link, 'url': link, 'duration': e.get('duration')}]
+        for x in sub:
+            # The same video can sit in several tabs (Videos and Live)
+            if x['url'] in seen: continue
+            seen.add(x['url'])
+            entries.append(x)
+    return entries
+
+
+def get_playlist_entries(url, cookies=None):
+    # Flat extraction: one request for the listing, no per-video format negotiation
+    opts = {
+        'quiet': True,
+        'nocheckcertificate': True,
+        'extract_flat': 'in_playlist',
+        'noplaylist': False,
+    }
+    if cookies: opts['cookiefile'] = cookies
+    try:
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+            entries = flat_entries(ydl, info)
+    except Exception as e:
+        return None, str(e)
+    if not entries:
+        return None, "no playlist entries found"
+    return {
+        'title': info.get('title') or "Playlist",
+        'webpage_url': info.get('webpage_url') or url,
+        'is_playlist': True,
+        'entries': entries,
+        'duration': sum(e['duration'] or 0 for e in entries),
+        'formats': [],
+    }, None
+
+
+def quality_map(meta):
+    if meta.get('is_local'):
+        return {LOCAL_FORMAT: None}
+    if meta.get('is_playlist'):
+        # Entries aren't resolved yet, so offer the usual ladder and let each video negotiate
+        q_map = {f"{h}p RAW": f"bestvideo[height<={h}]/best[height<={h}]" for h in (1080, 720, 480, 360)}
+        q_map["AUTO_NEGOTIATE"] = "bestvideo/best"
+        return q_map
+    # Storyboards carry a height too, but they are thumbnail mosaics, not video
+    fmts = [f for f in meta.get('formats', []) if f.get('height') and f.get('format_note') != 'storyboard']
+    heights = sorted(list(set(f['height'] for f in fmts)), reverse=True)
+    q_map = {f"{h}p RAW": f"bestvideo[height<={h}]/best[height<={h}]" for h in heights}
+    q_map["AUTO_NEGOTIATE"] = "bestvideo/best"
+    return q_map
+
+
+def resolve_stream(src, fmt_sel, cookies=None):
+    # Local files are decoded straight from disk, no extractor round-trip
+    if is_local_source(src):
+        return os.path.expanduser(src)
+    ydl_opts = {
+        'format': fmt_sel,
+        'quiet': True,
+        'nocheckcertificate': True,
+        'noplaylist': True,
+        'cookiefile': cookies
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        return ydl.extract_info(src, download=False).get('url')
+
+
+# --- REGION OF INTEREST ---
+DETECT_W, DETECT_H = 640, 360
+
+
+def roi_box(roi):
+    # roi = (x0, y0, x1, y1) as fractions of the frame -> pixel box on the detect frame
+    if not roi: return 0, 0, DETECT_W, DETECT_H
+    # Clamped to the frame, and never less than one pixel
+    x0, y0, x1, y1 = (min(max(float(v), 0.0), 1.0) for v in roi)
+    x0, y0 = min(int(x0 * DETECT_W), DETECT_W - 1), min(int(y0 * DETECT_H), DETECT_H - 1)
+    return x0, y0, max(int(x1 * DETECT_W), x0 + 1), max(int(y1 * DETECT_H), y0 + 1)
+
+
+def prep_gray(frame, roi=None):
+    # Area averaging, which ffmpeg's flags=area reproduces (PipeReader); the default bilinear only
+    # averages at exactly 2x and point-samples 1080p, dropping thin text strokes
+    small = cv2.resize(frame, (DETECT_W, DETECT_H), interpolation=cv2.INTER_AREA)
+    x0, y0, x1, y1 = roi_box(roi)
+    return cv2.cvtColor(small[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+
+
+def prep_frame(frame, roi=None):
+    return cv2.GaussianBlur(prep_gray(frame, roi), (21, 21), 0)
+
+
+def find_motion_mask(cap, fps, start_t, end_t, sensitivity, roi=None, samples=8, stride=2, persist=0.6):
+    # Pixels that change between most neighbouring samples are a webcam / captions band, not slides.
+    # Returns a 0/255 mask on the ROI crop (255 = keep), or None if nothing persistent was found.
+    grays = []
+    curr = int(start_t * fps)
+    end = int(end_t * fps)
+    step = max(1, int(fps * stride))
+    while curr < end and len(grays) < samples:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, curr)
+        ret, frame = cap.read()
+        if not ret: break
+        grays.append(prep_frame(frame, roi))
+        curr += step
+    if len(grays) < 3: return None
+
+    hits = np.zeros(grays[0].shape, np.uint16)
+    for a, b in zip(grays, grays[1:]):
+        hits += cv2.absdiff(a, b) > sensitivity
+    moving = (hits >= persist * (len(grays) - 1)).astype(np.uint8) * 255
+    if not moving.any(): return None
+
+    # Grow the blobs so the overlay edges don't leak through
+    moving = cv2.dilate(moving, np.ones((31, 31), np.uint8))
+    mask = cv2.bitwise_not(moving)
+    # A mostly-moving frame is real video, not an overlay; masking it would hide everything
+    if np.count_nonzero(mask) < 0.5 * mask.size: return None
+    return mask
+
+
+# --- THRESHOLD CALIBRATION ---
+# Pixel Delta / strictness measured on the video instead of guessed. Neighbouring samples of an even
+# spread over the window give a per-pixel noise amplitude (most pairs show an unchanged slide) and a
+# changed-area score per pair. Each candidate Pixel Delta above the noise amplitude splits the pair
+# scores into a noise cluster (grain, flicker, shake, an unmasked webcam) and slide transitions; the
+# candidate with the widest split wins and strictness goes between the two. ABSDIFF / CASCADE terms.
+# Without a clear split (changes moving at least CALIBRATE_SEPARATION x the noise area) the caller's
+# own values stay.
+CALIBRATE_PAIRS = 24
+CALIBRATE_SEPARATION = 2.0
+CALIBRATE_DELTAS = (20, 25, 30, 35, 45, 60, 80, 100) # Pixel Delta candidates, same range as the UI slider
+
+
+def calibrate(stream_link, start_t, end_t, min_skip=2, roi=None, mask=None, auto_mask=False, sensitivity=35,
+              strictness=1.0, pairs=CALIBRATE_PAIRS):
+    cap = cv2.VideoCapture(stream_link, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        raise IOError("STREAM HANDSHAKE FAILED")
+    grays = []
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        if mask is None and auto_mask:
+            mask = find_motion_mask(cap, fps, start_t, end_t, sensitivity, roi=roi, stride=min_skip)
+        # Neighbouring points of an even spread over the whole window: pairs a few seconds apart
+        # straddle the slide changes in between, where pairs min_skip apart almost never would
+        step = (end_t - start_t) / (pairs + 1)
+        for i in range(pairs + 1):
+            f = grab_frame(cap, start_t + (i + 0.5) * step)
+            grays.append(prep_frame(f, roi) if f is not None else None)
+    finally:
+        cap.release()
+    diffs = [cv2.absdiff(a, b) for a, b in zip(grays, grays[1:]) if a is not None and b is not None]
+    if len(diffs) < 4: raise IOError("CALIBRATION FAILED: too few frames decoded")
+
+    # Pixels moving in most pairs (webcam, ticker) are an overlay, not noise: they stay in the area
+    # scores below but would otherwise push the amplitude estimate up to "anything goes"
+    keep = mask > 0 if mask is not None else np.ones(diffs[0].shape, bool)
+    steady = keep & (np.mean([d > 10 for d in diffs], axis=0) < 0.6)
+    if not steady.any(): steady = keep
+    # Noise amplitude: 95th-percentile pixel delta of the median pair (transitions are the minority)
+    noise = float(np.median([np.percentile(d[steady], 95) for d in diffs]))
+    # tails[i, s] = pixels of pair i moving by more than s, for every candidate Pixel Delta at once
+    hists = np.array([np.bincount(d[keep], minlength=256) for d in diffs])
+    tails = np.cumsum(hists[:, ::-1], axis=1)[:, ::-1]
+    area = max(1, int(np.count_nonzero(keep)))
+
+    def split(sens):
+        # Most pairs show an unchanged slide: split where the noise cluster holds at least half of
+        # them, at the widest ratio between neighbouring scores -> (ratio, sens, sorted scores, k)
+        fracs = np.sort(100 * tails[:, sens + 1] / area)
+        half = len(fracs) // 2 - 1
+        ratios = (fracs[half + 1:] + 0.1) / (fracs[half:-1] + 0.1)
+        k = half + int(np.argmax(ratios))
+        return float(ratios[k - half]), sens, fracs, k
+
+    # Deltas clear of the noise amplitude first; all of them when none of those separates (shake
+    # and overlays are loud but small). Near-ties go to the more sensitive setting.
+    splits = [split(s) for s in CALIBRATE_DELTAS]
+    quiet = [sp for sp in splits if sp[1] >= 2 * noise + 10 and sp[0] >= CALIBRATE_SEPARATION]
+    pool = quiet or splits
+    top = max(sp[0] for sp in pool)
+    best = next(sp for sp in pool if sp[0] >= 0.9 * top)
+    ratio, sens, fracs, k = best
+    separated = ratio >= CALIBRATE_SEPARATION and k < len(fracs) - 1
+    if separated:
+        low, high = float(fracs[k]), float(fracs[k + 1])
+        strict = min(max(float(np.sqrt(max(low, 0.1) * high)), 0.2), 40.0)
+    else:
+        # One cluster (nothing but noise, or change everywhere) or a split too narrow to trust:
+        # report what was seen and keep the caller's settings
+        low, high = float(fracs[-1]), None
+        sens, strict = sensitivity, strictness
+    return {
+        'sensitivity': int(sens),
+        'strictness': round(strict, 2),
+        'noise_delta': round(noise, 1),
+        'noise_area': round(low, 2),
+        'change_area': round(high, 2) if high is not None else None,
+        'pairs': len(diffs),
+        'transitions': len(fracs) - 1 - k if separated else 0,
+        'separated': bool(separated),
+    }
+
+
+# --- SETTLE / BUILD HANDLING ---
+TINY_W, TINY_H = 80, 45
+BUILD_W, BUILD_H = 160, 90
+
+
+def tiny_moved(a, b, sensitivity, mask=None, strictness=1.0):
+    # Movement over more than strictness % of the (unmasked) picture, the detector's own area bar:
+    # a cursor, a speaker's hand or compression shimmer moves a few tiny pixels without end
+    d = cv2.absdiff(a, b) > sensitivity / 2
+    area = d.size
+    if mask is not None:
+        d &= mask
+        area = np.count_nonzero(mask)
+    return np.count_nonzero(d) > area * strictness / 100
+
+
+def settle_frame(cap, fps, pos, end, frame, gray, roi, sensitivity, settle, max_wait, step=0.5, mask=None,
+                 strictness=1.0):
+    # Walk forward from a detected change until the picture has been still for `settle` seconds.
+    # The ring holds the samples seen since the last movement; the oldest one is the settled state.
+    # Gives up after max_wait seconds (talking-head video never settles) and keeps the newest sample.
+    ring = collections.deque([(pos, frame, gray)], maxlen=max(2, int(settle / step) + 2))
+    prev = cv2.resize(gray, (TINY_W, TINY_H), interpolation=cv2.INTER_AREA)
+    stride = max(1, int(fps * step))
+    limit = min(end, pos + int(fps * max_wait))
+    while pos + stride < limit:
+        pos += stride
+        cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
+        ret, f = cap.read()
+        if not ret: break
+        g = prep_gray(f, roi)
+        tiny = cv2.resize(g, (TINY_W, TINY_H), interpolation=cv2.INTER_AREA)
+        if tiny_moved(prev, tiny, sensitivity, mask, strictness):
+            ring.clear()
+        ring.append((pos, f, g))
+        prev = tiny
+        if ring[-1][0] - ring[0][0] >= settle * fps:
+            return ring[0], pos
+    return ring[-1], pos
+
+
+def is_build_step(prev, new, sensitivity, mask=None):
+    # A bullet reveal only paints over background; a new slide overwrites existing content
+    d = cv2.absdiff(prev, new) > sensitivity / 2
+    if mask is not None: d &= mask
+    if not d.any(): return True
+    bg = np.median(prev if mask is None else prev[mask])
+    was_bg = np.abs(prev[d].astype(np.int16) - bg) <= sensitivity / 2
+    return was_bg.mean() >= 0.9
+
+
+# --- ADAPTIVE STRIDE ---
+# Instead of a fixed min_skip / max_skip walk: the stride doubles while scores stay far below the
+# threshold (static slide, talking head off-ROI) and drops back to min_skip as scores approach it.
+# A capture holds detection for max_skip exactly as the fixed walk does, also for the captures
+# scan() finds walking back over a wide stride that ended on a change.
+
+class StrideController:
+    def __init__(self, min_skip=2, max_skip=10, max_stride=None, calm=0.25, near=0.6, growth=2.0):
+        self.min_skip = min_skip
+        self.max_skip = max_skip
+        # A slide shown and taken back down inside one stride is the only thing a wide stride misses
+        self.max_stride = max_stride or 3 * max_skip
+        self.calm = calm
+        self.near = near
+        self.growth = growth
+        self.stride = min_skip
+        self.last_capture = None
+
+    def sampled(self, score, threshold):
+        # No change at this sample -> seconds to the next one
+        ratio = (score or 0.0) / max(threshold, 1e-9)
+        if ratio < self.calm:
+            self.stride = min(self.stride * self.growth, self.max_stride)
+        elif ratio >= self.near:
+            self.stride = self.min_skip
+        else:
+            self.stride = max(self.min_skip, self.stride / self.growth)
+        return self.stride
+
+    def captured(self, t):
+        # Change captured at t -> seconds detection holds for (the next sample is the first after it)
+        self.last_capture = t
+        self.stride = self.min_skip
+        return max(self.min_skip, self.max_skip)
+
+
+# --- DECODE PIPELINE ---
+# Seeking + decoding (network I/O for remote streams) and preprocessing run on a reader thread that
+# stays a few samples ahead of detection. The queue is bounded, so a slow consumer blocks the reader
+# instead of piling up full-resolution frames. The consumer steers the walk with skip_to() and
+# stride; either one can invalidate what was read ahead at the old plan, so every sample carries the
+# generation of the plan it was read for, a change bumps it, and stale samples are dropped on the
+# way out. The reader then restarts where an inline read would be: one stride past the last sample
+# handed out, or at the skip target. With or without read-ahead, the same samples come out.
+
+PREFETCH = 4 if (os.cpu_count() or 1) > 1 else 0
+
+
+class FrameReader:
+    def __init__(self, cap, start, end, stride, roi=None, prefetch=PREFETCH):
+        self.cap = cap
+        self.start = start
+        self.end = end
+        self._stride = max(1, stride)
+        self.roi = roi
+        self.frames = queue.Queue(maxsize=max(1, prefetch))
+        self.stop = threading.Event()
+        self.next_pos = start
+        self.taken = None # last sample handed to the consumer
+        self.gen = 0
+        self.changed = threading.Condition()
+        self.tail = False
+        self._thread = threading.Thread(target=self._run, name="frame-reader", daemon=True) if prefetch > 0 else None
+
+    def _plan(self):
+        # Where the walk continues (caller holds `changed`)
+        return max(self.next_pos, self.taken + self._stride if self.taken is not None else self.start)
+
+    def _moved(self):
+        self.gen += 1
+        self.changed.notify_all()
+
+    @property
+    def stride(self):
+        return self._stride
+
+    @stride.setter
+    def stride(self, stride):
+        with self.changed:
+            if max(1, stride) == self._stride: return
+            self._stride = max(1, stride)
+            self._moved()
+
+    def skip_to(self, pos):
+        with self.changed:
+            before = self._plan()
+            self.next_pos = max(self.next_pos, pos)
+            if self._plan() != before: self._moved()
+
+    def _restart(self, gen):
+        # -> (generation, position to read from, last sample handed out), once the plan has moved
+        # on from `gen` (None: right away)
+        with self.changed:
+            if gen is not None:
+                self.changed.wait_for(lambda: self.gen != gen or self.stop.is_set())
+            return self.gen, self._plan(), self.taken
+
+    def _put(self, item):
+        while not self.stop.is_set():
+            # Nothing waits for a sample read at an older plan
+            if isinstance(item, tuple) and item[0] != self.gen: return True
+            try:
+                self.frames.put(item, timeout=0.25)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self):
+        # -> (generation, pos, frame, gray); pos None marks the end of the walk as planned
+        gen, curr, last = self._restart(None)
+        while not self.stop.is_set():
+            if gen != self.gen: gen, curr, last = self._restart(None)
+            stride = self._stride
+            if curr >= self.end and self.tail and last is not None and last < self.end - 1:
+                # tail: a stride that jumps past the end still looks at the last frame once
+                curr = self.end - 1
+            ret = False
+            if curr < self.end:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, curr)
+                ret, frame = self.cap.read()
+            if not ret:
+                # Nothing more on this plan; a later one may still want earlier samples
+                yield gen, None, None, None
+                gen, curr, last = self._restart(gen)
+                continue
+            last = curr
+            yield gen, curr, frame, prep_gray(frame, self.roi)
+            curr += stride
+
+    def _run(self):
+        try:
+            for item in self._read():
+                if not self._put(item): return
+        except Exception as e:
+            self._put(e)
+
+    def _take(self, item):
+        # -> sample for the consumer, None to drop a stale one, or StopIteration at the end
+        with self.changed:
+            gen, pos, frame, gray = item
+            if gen != self.gen: return None
+            if pos is None: raise StopIteration
+            self.taken = pos
+            return pos, frame, gray
+
+    def __iter__(self):
+        if self._thread is None:
+            # prefetch=0 (single core): nothing to overlap with, so read inline without read-ahead
+            items = self._read()
+        else:
+            self._thread.start()
+            items = iter(self.frames.get, object())
+        for item in items:
+            if isinstance(item, Exception): raise item
+            try:
+                sample = self._take(item)
+            except StopIteration:
+                return
+            if sample is not None: yield sample
+
+    def close(self):
+        with self.changed:
+            self.stop.set()
+            self.changed.notify_all()
+        try: self.frames.get_nowait()
+        except queue.Empty: pass
+        if self._thread is not None and self._thread.is_alive(): self._thread.join(timeout=5)
+
+
+# --- FFMPEG PIPE DECODER ---
+# Drop-in for FrameReader: one ffmpeg process decodes the window and does the sampling (fps=),
+# downscale and gray conversion itself, writing detect-size rawvideo to a pipe that is read straight
+# into a small ring of reused buffers. No full-resolution BGR frame reaches Python; it yields
+# frame=None and scan() decodes the full frame with OpenCV only for captures. Skips shorter than
+# PIPE_RESEEK are read through, longer ones restart ffmpeg at the new position.
+DECODERS = ("OPENCV", "FFMPEG_PIPE")
+PIPE_RESEEK = 30 # seconds
+
+
+class PipeReader(FrameReader):
+    def __init__(self, stream_link, fps, start, end, stride, roi=None, prefetch=PREFETCH):
+        super().__init__(None, start, end, stride, roi=roi, prefetch=prefetch)
+        self.stream_link = stream_link
+        self.fps = fps
+        self.step = self.stride
+        x0, y0, x1, y1 = roi_box(roi)
+        self.box = (x1 - x0, y1 - y0, x0, y0)
+        # Queued samples + the one being filled + the one the consumer holds
+        self.bufs = [np.empty((y1 - y0, x1 - x0), np.uint8) for _ in range(max(1, prefetch) + 2)]
+        self.proc = None
+
+    def _spawn(self, pos):
+        # Accurate seeking trims full-size frames ahead of the graph (about twice the decode time), so
+        # seek to the keyframe and let fps= drop what comes before pos; the reader stops at the end.
+        # Deblocking is skipped too, the downscale hides it.
+        w, h, x, y = self.box
+        t = pos / self.fps
+        # fps= lays its grid on multiples of the stride, so shift pos to 0 first; round=up makes each
+        # slot emit the frame at its own timestamp rather than the last one before the next slot.
+        # Then prep_gray's steps in its order: area downscale of the colour frame, gray, ROI crop.
+        vf = (f"setpts=PTS-{t:.6f}/TB,fps={self.fps / self.step:.6f}:start_time=0:round=up,"
+              f"scale={DETECT_W}:{DETECT_H}:flags=area,format=gray,crop={w}:{h}:{x}:{y}")
+        cmd = [
+            FFMPEG_BIN, '-nostdin', '-hide_banner', '-loglevel', 'error',
+            '-copyts', '-noaccurate_seek', '-skip_loop_filter', 'all', '-ss', f"{t:.3f}", '-i', self.stream_link,
+            '-an', '-sn', '-vf', vf, '-f', 'rawvideo', '-pix_fmt', 'gray', 'pipe:1'
+        ]
+        self._kill()
+        # Unbuffered, so readinto() lands in the NumPy buffer without an intermediate copy
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+
+    def _kill(self):
+        if self.proc is None: return
+        self.proc.kill()
+        self.proc.stdout.close()
+        self.proc.wait()
+        self.proc = None
+
+    def _fill(self, buf):
+        view = memoryview(buf).cast('B')
+        got = 0
+        while got < len(view):
+            n = self.proc.stdout.readinto(view[got:])
+            if not n: return False
+            got += n
+        return True
+
+    def _rejoin(self, curr, want, kept):
+        # The plan moved: carry on as an inline read would from the last sample handed out. A long
+        # skip restarts ffmpeg at the target; otherwise the next sample sits on that sample's grid,
+        # and ffmpeg only restarts there if this reader had read past it (or is on another grid).
+        anchor = kept if kept is not None else self.start
+        at = kept + self.step if kept is not None else self.start
+        if want - at > PIPE_RESEEK * self.fps:
+            self._spawn(want)
+            return want
+        grid = anchor + -(-(want - anchor) // self.step) * self.step
+        if curr > grid or (curr - anchor) % self.step:
+            self._spawn(grid)
+            return grid
+        return curr
+
+    def _read(self):
+        gen, want, kept = self._restart(None)
+        curr = want
+        self._spawn(curr)
+        seen = None
+        k = 0
+        try:
+            while not self.stop.is_set():
+                if gen != self.gen:
+                    gen, want, kept = self._restart(None)
+                    curr = self._rejoin(curr, want, kept)
+                if want - curr > PIPE_RESEEK * self.fps:
+                    curr = want
+                    self._spawn(curr)
+                buf = self.bufs[k % len(self.bufs)]
+                if curr >= self.end or not self._fill(buf):
+                    if curr < self.end and k == 0: raise IOError("STREAM HANDSHAKE FAILED")
+                    # tail: a stride that jumps past the end still looks at the last sample once
+                    if self.tail and seen and kept != seen[0]:
+                        kept = seen[0]
+                        yield gen, seen[0], None, seen[1]
+                    yield gen, None, None, None
+                    gen, want, kept = self._restart(gen)
+                    curr = self._rejoin(curr, want, kept)
+                    continue
+                k += 1
+                seen = (curr, buf)
+                if curr >= want:
+                    kept = curr
+                    yield gen, curr, None, buf
+                    want = curr + self._stride
+                curr += self.step
+        finally:
+            self._kill()
+
+    def close(self):
+        # Killing ffmpeg first unblocks a reader thread waiting on the pipe
+        self.stop.set()
+        if self.proc is not None: self.proc.kill()
+        super().close()
+        if self._thread is None or not self._thread.is_alive(): self._kill()
+
+
+def scan(stream_link, start_t, end_t, sensitivity=35, strictness=1.0, min_skip=2, max_skip=10,
+         roi=None, mask=None, auto_mask=False, detector="ABSDIFF", settle=0, keep_final=False,
+         adaptive=False, max_stride=None, encode=None, index_key=None, prefetch=PREFETCH, decoder="OPENCV",
+         on_progress=None, on_capture=None):
+    det = make_detector(detector, sensitivity, strictness)
+    cap = cv2.VideoCapture(stream_link, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        raise IOError("STREAM HANDSHAKE FAILED")
+
+    # encode = {'codec', 'quality', 'max_side', 'workers'}; captures leave the decode loop here
+    enc = EncodePool(on_done=on_capture, **(encode or {}))
+    # The fixed walk stays on the min_skip grid: a capture pauses detection for max_skip, and the
+    # first grid sample after the hold is the next one looked at. An index also keeps the samples
+    # inside holds, so replays walk the same grid and are exact. Adaptive scans index whatever they
+    # sampled, and replays snap to it.
+    index = None
+    ctl = StrideController(min_skip, max_skip, max_stride) if adaptive else None
+    hold_until = -1
+    pending = None # keep_final: (t, frame, build_gray) held back until the build is over
+    reader = probe = None
+
+    def emit(t, frame):
+        # Hand-off only; the pool encodes while the loop seeks to the next sample
+        enc.submit(t, frame)
+
+    def take(pos, frame, gray, sig):
+        # Record a detected change at frame `pos`; returns the frame position the walk resumes from
+        nonlocal last, pending, probe
+        t_cap = pos / fps
+        if frame is None:
+            # Pipe samples are detect-size gray only; the pipe decoder leaves cap free for this
+            cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
+            ret, frame = cap.read()
+            if not ret: raise IOError("STREAM HANDSHAKE FAILED")
+        if settle > 0:
+            # Hold off until the build/transition has come to rest, then re-sign the settled frame.
+            # The look-ahead seeks on its own capture; the reader's belongs to its thread.
+            if probe is None: probe = cv2.VideoCapture(stream_link, cv2.CAP_FFMPEG)
+            (pos, frame, gray), _ = settle_frame(probe, fps, pos, end, frame, gray, roi, sensitivity,
+                                                 settle, max_skip, mask=tiny_mask, strictness=strictness)
+            t_cap = pos / fps
+            sig, _ = det.measure(gray)
+        last = sig
+
+        if keep_final:
+            bgray = cv2.resize(gray, (BUILD_W, BUILD_H), interpolation=cv2.INTER_AREA)
+            if pending and is_build_step(pending[2], bgray, sensitivity, build_mask):
+                # Same slide, more bullets: keep the first timestamp, swap in the fuller frame
+                pending = (pending[0], frame, bgray)
+            else:
+                if pending: emit(pending[0], pending[1])
+                pending = (t_cap, frame, bgray)
+        else:
+            emit(t_cap, frame)
+        return pos
+
+    def look_back(prev, curr):
+        # A wide stride ended on a change: bisect the skipped stretch (min_skip grid) for the first
+        # sample that already differs, so the timestamp is right and slides shown in between
+        # aren't lost. None means the change lies between the last grid sample and curr.
+        nonlocal probe
+        if probe is None: probe = cv2.VideoCapture(stream_link, cv2.CAP_FFMPEG)
+        lo, hi = 0, (curr - prev - 1) // step + 1
+        found = None
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            pos = prev + mid * step
+            probe.set(cv2.CAP_PROP_POS_FRAMES, pos)
+            ret, f = probe.read()
+            if not ret: break
+            g = prep_gray(f, roi)
+            if index: index.add(pos / fps, g)
+            s, score = det.measure(g, last)
+            if det.changed(score):
+                hi, found = mid, (pos, f, g, s)
+            else:
+                lo = mid
+        return found
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        if mask is None and auto_mask:
+            mask = find_motion_mask(cap, fps, start_t, end_t, sensitivity, roi=roi, stride=min_skip)
+        if mask is not None: det.set_mask(mask)
+        if index_key:
+            index = IndexWriter(index_key, start_t, end_t, min_skip, fps, {'roi': roi, 'adaptive': adaptive})
+        tiny_mask = det.mask_for((TINY_H, TINY_W))
+        build_mask = det.mask_for((BUILD_H, BUILD_W))
+        last = None
+        curr = int(start_t * fps)
+        end = int(end_t * fps)
+        total = max(1, end - curr)
+        origin = curr
+        prev = None
+        step = max(1, int(fps * min_skip))
+
+        def on_grid(pos):
+            # First min_skip grid sample at or after pos; every walk below stays on this grid
+            return origin + -(-(pos - origin) // step) * step
+
+        if decoder == "FFMPEG_PIPE":
+            reader = PipeReader(stream_link, fps, curr, end, step, roi=roi, prefetch=prefetch)
+        else:
+            reader = FrameReader(cap, curr, end, step, roi=roi, prefetch=prefetch)
+        reader.tail = bool(ctl)
+
+        for curr, frame, gray in reader:
+            # Update metrics
+            if on_progress:
+                on_progress(min(max((curr - origin) / total, 0.0), 1.0), curr / fps)
+
+            # CV Logic
+            if ctl:
+                sig, score = det.measure(gray, last)
+                resume = None # frame position after the latest capture made at this sample
+                # Grid samples inside a post-capture hold can't be captures, so look-backs start past it
+                lo = max(prev, hold_until - step) if prev is not None else None
+                if det.changed(score) and lo is not None and curr - lo > step:
+                    # The stride may have hidden several changes: take each one in the skipped stretch
+                    # (each holding detection for max_skip, as the fixed walk does), then re-check
+                    # this sample against the newest slide
+                    while lo < curr - step:
+                        earlier = look_back(lo, curr)
+                        if not earlier: break
+                        resume = take(*earlier)
+                        hold_until = on_grid(resume + int(fps * ctl.captured(resume / fps)))
+                        lo = hold_until - step
+                    if resume is not None and resume < curr: sig, score = det.measure(gray, last)
+                if resume is None or resume < curr:
+                    if index: index.add(curr / fps, gray)
+                    if curr >= hold_until and det.changed(score):
+                        resume = take(curr, frame, gray, sig)
+                        hold_until = on_grid(resume + int(fps * ctl.captured(resume / fps)))
+                prev = max(curr, resume or 0)
+                if hold_until > prev:
+                    nxt = hold_until
+                else:
+                    # Strides are whole grid steps, never longer than the controller asked for
+                    nxt = on_grid(prev) + max(1, int(fps * ctl.sampled(score, det.threshold)) // step) * step
+                reader.stride = max(1, int(fps * ctl.stride) // step) * step
+                reader.skip_to(min(nxt, end - 1) if prev < end - 1 else nxt)
+                continue
+
+            if index: index.add(curr / fps, gray)
+            if curr < hold_until: continue
+            sig, score = det.measure(gray, last)
+
+            is_diff = det.changed(score)
+            if not is_diff: continue
+
+            curr = take(curr, frame, gray, sig)
+
+            # The hold runs from the captured (settled) frame; the picture was still from there to
+            # the end of the look-ahead. Unless they are indexed, held samples aren't even decoded.
+            hold_until = curr + int(fps * max_skip)
+            if not index: reader.skip_to(on_grid(hold_until))
+        if pending: emit(pending[0], pending[1])
+        captures = enc.close()
+        if index: index.close(mask)
+    except BaseException:
+        enc.abort()
+        if index: index.abort()
+        raise
+    finally:
+        if reader: reader.close()
+        if probe is not None: probe.release()
+        cap.release()
+
+    if on_progress: on_progress(1.0, end / fps)
+    return captures
+
+
+# --- FFMPEG SCENE ENGINE ---
+# ffmpeg scores every frame itself (select='gt(scene,T)') on a downscaled copy and we only
+# decode full frames at the timestamps it reports. Needs the ffmpeg binary (packages.txt).
+FFMPEG_BIN = os.environ.get('FFMPEG_BIN', 'ffmpeg')
+PTS_RE = re.compile(r"pts_time:\s*([0-9.]+)")
+OUT_TIME_RE = re.compile(r"out_time_us=(\d+)")
+
+
+def scene_threshold(sensitivity, strictness):
+    # ffmpeg's scene score is ~ the mean abs pixel change / 100, counted on the frame where it jumps.
+    # "strictness % of pixels moving by more than sensitivity" is at least a mean change of
+    # sensitivity * strictness / 100, but the bar only has to keep real changes: check() confirms each
+    # candidate with the detector. 1.5x that clears most steady grain / webcam jitter (up to ~0.006)
+    # and stays under a small text change (~0.008 at 1080p, ~0.02 at 720p).
+    return min(max(1.5 * sensitivity * strictness / 10000, 0.001), 1.0)
+
+
+def grab_frame(cap, t):
+    cap.set(cv2.CAP_PROP_POS_MSEC, t * 1000)
+    ret, frame = cap.read()
+    return frame if ret else None
+
+
+def capture_at(stream_link, times, encode=None, on_capture=None):
+    # Full-resolution decode at known timestamps only (index replays, scene candidates, ...)
+    cap = cv2.VideoCapture(stream_link, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        raise IOError("STREAM HANDSHAKE FAILED")
+    enc = EncodePool(on_done=on_capture, **(encode or {}))
+    try:
+        for t in times:
+            frame = grab_frame(cap, t)
+            if frame is not None: enc.submit(t, frame)
+        return enc.close()
+    except BaseException:
+        enc.abort()
+        raise
+    finally:
+        cap.release()
+
+
+def scene_candidates(stream_link, start_t, end_t, threshold, roi=None, scale_w=160, on_progress=None):
+    filters = []
+    if roi:
+        x0, y0, x1, y1 = roi
+        filters.append(f"crop=iw*{x1 - x0}:ih*{y1 - y0}:iw*{x0}:ih*{y0}")
+    filters += [f"scale={scale_w}:-2", f"select='gt(scene,{threshold:.4f})'", "showinfo"]
+    cmd = [
+        FFMPEG_BIN, '-hide_banner', '-nostats', '-loglevel', 'info',
+        '-ss', str(start_t), '-to', str(end_t), '-i', stream_link,
+        '-an', '-sn', '-vf', ','.join(filters),
+        '-progress', 'pipe:2', '-f', 'null', '-'
+    ]
+    span = max(1e-6, end_t - start_t)
+    times = []
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors='replace')
+    try:
+        for line in proc.stderr:
+            if 'showinfo' in line:
+                m = PTS_RE.search(line)
+                # Input seeking resets timestamps, so pts_time is relative to start_t
+                if m: times.append(start_t + float(m.group(1)))
+            elif on_progress:
+                m = OUT_TIME_RE.match(line)
+                if m:
+                    t = int(m.group(1)) / 1e6
+                    on_progress(min(max(t / span, 0.0), 1.0), start_t + t)
+    finally:
+        rc = proc.wait()
+    if rc != 0 and not times:
+        raise IOError(f"ffmpeg scene pass failed (exit {rc})")
+    return times
+
+
+def scan_ffmpeg(stream_link, start_t, end_t, sensitivity=35, strictness=1.0, roi=None, on_progress=None, **opts):
+    threshold = scene_threshold(sensitivity, strictness)
+    pass_progress = (lambda p, t: on_progress(0.5 * p, t)) if on_progress else None
+    candidates = scene_candidates(stream_link, start_t, end_t, threshold, roi=roi, on_progress=pass_progress)
+
+    def walk(check, mask):
+        for n, t in enumerate(candidates):
+            if on_progress: on_progress(0.5 + 0.5 * n / len(candidates), t)
+            check(t)
+
+    return scan_candidates(stream_link, start_t, end_t, walk, sensitivity=sensitivity, strictness=strictness,
+                           roi=roi, on_progress=on_progress, **opts)
+
+
+# --- CANDIDATE SCANS ---
+# Engines that pick candidate times without decoding (scene scores, storyboard tiles, packet sizes)
+# and then decode just those. scan_candidates does the rest the way scan() would: mask, the opening
+# frame as the first slide, detector confirmation and a max_skip hold after every capture. A
+# candidate inside the hold is checked when the hold ends instead, where the fixed walk would look
+# next. walk(check, mask) calls check(t) for its candidates in time order; check -> True (captured),
+# False (no change) or None (no frame). Without a walk (nothing to pick candidates from) it is a
+# plain scan.
+
+def scan_candidates(stream_link, start_t, end_t, walk=None, sensitivity=35, strictness=1.0, min_skip=2, max_skip=10,
+                    roi=None, mask=None, auto_mask=False, detector="ABSDIFF", encode=None,
+                    on_progress=None, on_capture=None, **opts):
+    if walk is None:
+        return scan(stream_link, start_t, end_t, sensitivity=sensitivity, strictness=strictness, min_skip=min_skip,
+                    max_skip=max_skip, roi=roi, mask=mask, auto_mask=auto_mask, detector=detector, encode=encode,
+                    on_progress=on_progress, on_capture=on_capture, **opts)
+
+    det = make_detector(detector, sensitivity, strictness)
+    cap = cv2.VideoCapture(stream_link, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        raise IOError("STREAM HANDSHAKE FAILED")
+    enc = EncodePool(on_done=on_capture, **(encode or {}))
+    last, hold_until, checked = None, start_t + max_skip, None
+
+    def check(t):
+        nonlocal last, hold_until, checked
+        t = max(t, hold_until)
+        if t > end_t or t == checked: return False
+        checked = t
+        frame = grab_frame(cap, t)
+        if frame is None: return None
+        sig, score = det.measure(prep_gray(frame, roi), last)
+        if not det.changed(score): return False
+        last, hold_until = sig, t + max_skip
+        enc.submit(t, frame)
+        return True
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        if mask is None and auto_mask:
+            mask = find_motion_mask(cap, fps, start_t, end_t, sensitivity, roi=roi, stride=min_skip)
+        if mask is not None: det.set_mask(mask)
+        # The opening frame is always a slide, exactly as in a full scan
+        frame = grab_frame(cap, start_t)
+        if frame is None: raise IOError("STREAM HANDSHAKE FAILED")
+        last, _ = det.measure(prep_gray(frame, roi))
+        enc.submit(float(start_t), frame)
+        walk(check, mask)
+        captures = enc.close()
+    except BaseException:
+        enc.abort()
+        raise
+    finally:
+        cap.release()
+
+    if on_progress: on_progress(1.0, end_t)
+    return captures
+
+
+# --- STORYBOARD ENGINE ---
+# Change detection runs on the storyboard tiles first (see storyboard.py); real frames are only
+# decoded inside the intervals where neighbouring tiles differ, walked like engine.scan does.
+# Tiles are small and JPEG-soft, so the tile pass uses half the thresholds: a false candidate
+# costs a few decodes, a missed one costs a slide. Sources without a storyboard get a full scan.
+TILE_RECALL = 0.5
+
+
+def storyboard_windows(board, start_t, end_t, sensitivity=35, strictness=1.0, min_skip=2, roi=None, mask=None):
+    # -> (merged [(t0, t1), ...] intervals worth decoding, number of tiles looked at)
+    tiles = [(t, prep_frame(tile, roi)) for t, tile in iter_tiles(board, start_t, end_t)]
+    keep = mask > 0 if mask is not None else None
+    area = np.count_nonzero(keep) if keep is not None else DETECT_W * DETECT_H
+    if tiles and keep is None: area = tiles[0][1].size
+    limit = area * strictness / 100 * TILE_RECALL
+
+    windows = []
+    for (ta, a), (tb, b) in zip(tiles, tiles[1:]):
+        hit = cv2.absdiff(a, b) > sensitivity * TILE_RECALL
+        if keep is not None: hit &= keep
+        if np.count_nonzero(hit) <= limit: continue
+        # The change happened after tile a and no later than tile b; pad for tile timing slop
+        w0, w1 = max(start_t, ta - min_skip), min(end_t, tb + min_skip)
+        if windows and w0 <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], w1))
+        else:
+            windows.append((w0, w1))
+    # Nothing after the last tile was seen at all
+    if tiles and tiles[-1][0] + min_skip < end_t:
+        w0 = max(start_t, tiles[-1][0] - min_skip)
+        if windows and w0 <= windows[-1][1]: w0 = windows.pop()[0]
+        windows.append((w0, end_t))
+    return windows, len(tiles)
+
+
+def scan_storyboard(stream_link, start_t, end_t, sensitivity=35, strictness=1.0, min_skip=2, max_skip=10,
+                    roi=None, storyboard=None, on_progress=None, **opts):
+    def walk(check, mask):
+        windows, _ = storyboard_windows(storyboard, start_t, end_t, sensitivity, strictness, min_skip, roi, mask)
+        if on_progress: on_progress(0.1, start_t)
+        span = max(1e-6, sum(w1 - w0 for w0, w1 in windows))
+        done = 0.0
+        # Samples stay on the full scan's grid (min_skip steps from start_t, resuming at the first one
+        # past the latest max_skip hold, which also carries across window edges), so a window finds
+        # the capture it would
+        def on_grid(t):
+            return start_t + float(np.ceil((t - start_t) / min_skip - 1e-6)) * min_skip
+
+        nxt = on_grid(start_t + max_skip)
+        for w0, w1 in windows:
+            t = on_grid(max(w0, nxt))
+            while t <= w1:
+                if on_progress: on_progress(min(1.0, 0.1 + 0.9 * (done + t - w0) / span), t)
+                hit = check(t)
+                if hit is None: break
+                if hit:
+                    t = nxt = on_grid(t + max_skip)
+                else:
+                    t += min_skip
+                    nxt = max(nxt, t)
+            done += w1 - w0
+
+    return scan_candidates(stream_link, start_t, end_t, walk if storyboard else None, sensitivity=sensitivity,
+                           strictness=strictness, min_skip=min_skip, max_skip=max_skip, roi=roi,
+                           on_progress=on_progress, **opts)
+
+
+# --- PACKET-SIZE ENGINE ---
+# A slide change in a screencast encode shows up as an inter frame several times bigger than its
+# neighbours, and that is readable from the demuxer alone (ffmpeg -c copy, nothing is decoded).
+# Spikes are confirmed by decoding just that frame. A change that lands on a keyframe, or is smeared
+# over many frames (fades, scrolling, grain), leaves no spike, but keyframes of unchanged content come
+# out the same size to within a few bytes, so a keyframe whose size moved (or one off the encoder's
+# regular cadence, i.e. a scene cut) is a candidate too. When keyframe sizes jitter anyway (webcam,
+# shake) every keyframe is checked, which is still a GOP-stride seek scan. Grain-dominated encodes,
+# where inter frames are nearly as big as keyframes and keyframes jitter too, hide slide changes from
+# both signals and get a plain scan instead.
+PACKET_RATIO = 3.0 # inter frame size vs the local (geometric) mean that counts as a spike
+PACKET_WINDOW = 5 # seconds either side for that local mean
+PACKET_KEY_TOL = 0.001 # relative keyframe size change that counts as new content
+PACKET_NOISE = 0.3 # median inter / keyframe size above which the encoder is spending its bits on noise
+CRC_RE = re.compile(r"^\d+,\s*(-?\d+|NOPTS),\s*(-?\d+|NOPTS),\s*-?\d+,\s*(\d+),\s*0x[0-9a-f]+(?:,\s*F=0x([0-9a-f]+))?")
+
+
+def packet_sizes(stream_link, start_t, end_t, on_progress=None):
+    # -> [(t, bytes, is_key)] of the first video stream in display order
+    cmd = [
+        FFMPEG_BIN, '-hide_banner', '-nostats', '-loglevel', 'error',
+        '-copyts', '-ss', str(start_t), '-to', str(end_t), '-i', stream_link,
+        '-map', '0:v:0', '-c', 'copy', '-f', 'framecrc', '-'
+    ]
+    span = max(1e-6, end_t - start_t)
+    tb, packets = None, []
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, errors='replace')
+    try:
+        for line in proc.stdout:
+            if line.startswith('#tb 0:'):
+                num, den = line.split(':')[1].split('/')
+                tb = int(num) / int(den)
+                continue
+            m = CRC_RE.match(line)
+            if not m or tb is None: continue
+            dts, pts, size, flags = m.groups()
+            ts = pts if pts != 'NOPTS' else dts
+            if ts == 'NOPTS': continue
+            t = int(ts) * tb
+            # framecrc only prints flags that differ from a plain keyframe
+            packets.append((t, int(size), flags is None or bool(int(flags, 16) & 1)))
+            if on_progress and len(packets) % 500 == 0:
+                on_progress(min(max((t - start_t) / span, 0.0), 1.0), t)
+    finally:
+        rc = proc.wait()
+    if rc != 0 and not packets:
+        raise IOError(f"ffmpeg packet pass failed (exit {rc})")
+    return sorted(packets)
+
+
+def packet_candidates(packets, start_t, end_t, ratio=PACKET_RATIO, window=PACKET_WINDOW, key_tol=PACKET_KEY_TOL):
+    # -> sorted candidate times inside [start_t, end_t], or None if packet sizes can't show changes here
+    t = np.array([p[0] for p in packets])
+    size = np.array([max(p[1], 1) for p in packets], dtype=np.float64)
+    key = np.array([p[2] for p in packets])
+    inter = ~key
+    tk, sk = t[key], size[key]
+    rel = np.abs(np.diff(sk)) / sk[:-1]
+    keys_quiet = len(rel) > 0 and np.median(rel) <= key_tol
+    if not keys_quiet and inter.any() and key.any() and np.median(size[inter]) >= PACKET_NOISE * np.median(sk):
+        return None
+    cands = []
+
+    if np.count_nonzero(inter) > 2:
+        ti, ls = t[inter], np.log(size[inter])
+        # Running sums give every packet the mean of its +-window neighbours (itself excluded) in O(n)
+        fps = len(ti) / max(ti[-1] - ti[0], 1e-3)
+        w = max(1, int(window * fps))
+        csum = np.concatenate([[0.0], np.cumsum(ls)])
+        i = np.arange(len(ls))
+        lo, hi = np.maximum(0, i - w), np.minimum(len(ls), i + w + 1)
+        base = (csum[hi] - csum[lo] - ls) / np.maximum(hi - lo - 1, 1)
+        cands += ti[ls - base >= np.log(ratio)].tolist()
+
+    if len(tk) > 1:
+        moved = rel > key_tol if keys_quiet else np.ones(len(rel), bool)
+        if len(tk) > 2:
+            gaps = np.diff(tk)
+            moved |= gaps < 0.9 * np.median(gaps)
+        cands += tk[1:][moved].tolist()
+
+    return sorted(set(x for x in cands if start_t <= x <= end_t))
+
+
+def scan_packets(stream_link, start_t, end_t, on_progress=None, **opts):
+    pass_progress = (lambda p, t: on_progress(0.3 * p, t)) if on_progress else None
+    packets = packet_sizes(stream_link, start_t, end_t, on_progress=pass_progress)
+    checks = packet_candidates(packets, start_t, end_t) if packets else None
+
+    def walk(check, mask):
+        for n, t in enumerate(checks):
+            if on_progress: on_progress(0.3 + 0.7 * n / len(checks), t)
+            check(t)
+
+    # Nothing demuxable (some live / odd containers) or a grain-dominated encode: plain scan
+    return scan_candidates(stream_link, start_t, end_t, walk if checks is not None else None,
+                           on_progress=on_progress, **opts)
+
+
+# --- PROGRESSIVE ENGINE ---
+# Anytime order: the window is first covered at a coarse stride, then gaps are bisected busiest-first
+# (the gap whose two end samples differ most), and gaps that look static come last. Every sample is
+# kept as an index signature, so the slide list at any moment is a replay over what has been seen;
+# a time/sample budget (or should_stop) only decides how fine that gets. Full frames are decoded
+# once, for the captures. Samples sit on the fixed scan's min_skip grid: changed gaps are refined
+# down to neighbouring grid samples and static ones stop at max_skip, the stretch a fixed scan
+# also skips after a capture, so an unlimited budget replays to the fixed scan's captures.
+PROGRESSIVE_COVER = 32 # samples spread over the window before any refinement
+# A gap only counts as static when its ends differ by well under the threshold: ends just under it
+# (a webcam in the ROI) can hide samples that cross it against the last capture
+PROGRESSIVE_CALM = 0.25
+
+
+def scan_progressive(stream_link, start_t, end_t, sensitivity=35, strictness=1.0, min_skip=2, max_skip=10,
+                     roi=None, mask=None, auto_mask=False, budget_s=None, budget_samples=None, encode=None,
+                     index_key=None, should_stop=None, on_progress=None, on_capture=None, **_):
+    cap = cv2.VideoCapture(stream_link, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        raise IOError("STREAM HANDSHAKE FAILED")
+    t_start = time.time()
+    span = max(1e-6, end_t - start_t)
+    samples = {} # grid index -> signature
+    index = None
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        if mask is None and auto_mask:
+            mask = find_motion_mask(cap, fps, start_t, end_t, sensitivity, roi=roi, stride=min_skip)
+        keep = cv2.resize(mask, (SIG_W, SIG_H), interpolation=cv2.INTER_NEAREST) > 0 if mask is not None else None
+        limit = (np.count_nonzero(keep) if keep is not None else SIG_W * SIG_H) * strictness / 100
+        if index_key:
+            index = IndexWriter(index_key, start_t, end_t, min_skip, fps, {'roi': roi, 'progressive': True})
+        # Grid index k is frame origin + k * step, as in scan(); gaps are measured in grid steps
+        origin, step = int(start_t * fps), max(1, int(fps * min_skip))
+        static = max(1, int(fps * max_skip) // step)
+        cover = max(static, int(span / PROGRESSIVE_COVER / min_skip))
+
+        def sample(k):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, origin + k * step)
+            ret, frame = cap.read()
+            if not ret: return None
+            gray = prep_gray(frame, roi)
+            samples[k] = signature(gray)
+            if index: index.add((origin + k * step) / fps, gray)
+            return samples[k]
+
+        def busy(a, b):
+            # Changed pixels between two samples, in units of the capture threshold
+            hit = cv2.absdiff(samples[a], samples[b]) > sensitivity
+            if keep is not None: hit &= keep
+            return np.count_nonzero(hit) / max(1.0, limit)
+
+        def push(a, b):
+            # Gap order: still uncovered (coarser than `cover`), then busiest, then longest static
+            nonlocal settled
+            gap, score = b - a, busy(a, b)
+            if gap <= 1 or (score <= PROGRESSIVE_CALM and gap <= static):
+                settled += gap * step / fps
+                return
+            heapq.heappush(heap, (0 if gap > cover else 1 if score > 1 else 2, -score if score > 1 else -gap, a, b))
+
+        def spent():
+            # Fraction of the budget used so far (0 without one)
+            used = (time.time() - t_start) / budget_s if budget_s else 0.0
+            if budget_samples: used = max(used, len(samples) / budget_samples)
+            return used
+
+        settled = 0.0
+        heap = []
+        if int(end_t * fps) <= origin:
+            # Empty window: no grid sample to take, so no captures (as in scan())
+            if index: index.close(mask)
+            if on_progress: on_progress(1.0, end_t)
+            return []
+        if sample(0) is None: raise IOError("STREAM HANDSHAKE FAILED")
+        # The last grid sample before end_t; back off until one decodes
+        last = (int(end_t * fps) - origin - 1) // step
+        while last > 0 and sample(last) is None:
+            last -= 1
+        if last > 0: push(0, last)
+
+        while heap:
+            used = spent()
+            if used >= 1 or (should_stop and should_stop()): break
+            _, _, a, b = heapq.heappop(heap)
+            m = (a + b) // 2
+            if sample(m) is None:
+                settled += (b - a) * step / fps
+                continue
+            push(a, m)
+            push(m, b)
+            if on_progress: on_progress(min(max(settled / span, used), 1.0) * 0.95, (origin + m * step) / fps)
+
+        ks = sorted(samples)
+        times = np.asarray([(origin + k * step) / fps for k in ks])
+        picked = replay({'sigs': np.stack([samples[k] for k in ks]), 'times': times, 'fps': fps, 'mask': mask},
+                        sensitivity, strictness, min_skip, max_skip)
+        if index: index.close(mask)
+    except BaseException:
+        if index: index.abort()
+        raise
+    finally:
+        cap.release()
+
+    captures = capture_at(stream_link, picked, encode=encode, on_capture=on_capture)
+    if on_progress: on_progress(1.0, end_t)
+    return captures
+
+
+# --- LIVE TAILING ---
+# Live HLS/DASH can't be seeked and never ends. A reader thread stays on the live edge with cheap
+# grab() calls and only retrieves one frame per sample interval into a tiny queue; when analysis
+# falls behind, the oldest queued frame is dropped rather than letting latency build up.
+
+def _live_reader(stream_link, frames, stop, sample_every, retries=3):
+    cap = None
+    failures = 0
+    t_origin = time.time()
+    next_t = 0.0
+    last_t = 0.0
+    offset = None # re-bases stream time after a reconnect so timestamps keep increasing
+    try:
+        while not stop.is_set():
+            if cap is None:
+                cap = cv2.VideoCapture(stream_link, cv2.CAP_FFMPEG)
+                if not cap.isOpened():
+                    failures += 1
+                    if failures > retries: break
+                    cap = None
+                    time.sleep(min(5, 2 ** failures))
+                    continue
+                offset = None
+            if not cap.grab():
+                # Segment hiccup or end of broadcast: reopen a few times, then give up
+                cap.release()
+                cap = None
+                failures += 1
+                if failures > retries: break
+                continue
+            failures = 0
+            pos = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            if pos <= 0: pos = time.time() - t_origin
+            if offset is None: offset = last_t - pos if last_t else 0.0
+            t = last_t = pos + offset
+            if t < next_t: continue
+            next_t = t + sample_every
+            ret, frame = cap.retrieve()
+            if not ret: continue
+            try:
+                frames.put_nowait((t, frame))
+            except queue.Full:
+                try: frames.get_nowait()
+                except queue.Empty: pass
+                frames.put_nowait((t, frame))
+    finally:
+        if cap is not None: cap.release()
+        frames.put(None) # end-of-stream marker
+
+
+def scan_live(stream_link, start_t=0, end_t=None, sensitivity=35, strictness=1.0, min_skip=2, max_skip=10,
+              roi=None, mask=None, detector="ABSDIFF", encode=None, max_duration=3600, backlog=2,
+              should_stop=None, on_progress=None, on_capture=None, **_):
+    det = make_detector(detector, sensitivity, strictness, mask)
+    frames = queue.Queue(maxsize=max(1, backlog))
+    stop = threading.Event()
+    # A local file "ends" for real; only network streams are worth reconnecting to
+    retries = 0 if is_local_source(stream_link) else 3
+    reader = threading.Thread(target=_live_reader, args=(stream_link, frames, stop, min_skip, retries), daemon=True)
+    enc = EncodePool(on_done=on_capture, **(encode or {}))
+    t_start = time.time()
+    last = None
+    last_cap = -max_skip
+    try:
+        reader.start()
+        while time.time() - t_start < max_duration and not (should_stop and should_stop()):
+            try:
+                item = frames.get(timeout=1.0)
+            except queue.Empty:
+                enc.poll()
+                continue
+            if item is None: break
+            t, frame = item
+            if on_progress: on_progress(min(1.0, (time.time() - t_start) / max_duration), t)
+            sig, score = det.measure(prep_gray(frame, roi), last)
+            # max_skip still rate-limits captures so a noisy broadcast can't flood the deck
+            if det.changed(score) and t - last_cap >= max_skip:
+                last, last_cap = sig, t
+                enc.submit(t, frame)
+            enc.poll()
+        captures = enc.close()
+    except BaseException:
+        enc.abort()
+        raise
+    finally:
+        stop.set()
+        # Unblock a reader waiting on a full queue, then let it exit
+        try: frames.get_nowait()
+        except queue.Empty: pass
+        reader.join(timeout=5)
+
+    if on_progress: on_progress(1.0, time.time() - t_start)
+    return captures
+
+
+ENGINES = {
+    "OPENCV_DIFF": scan,
+    "FFMPEG_SCENE": scan_ffmpeg,
+    "STORYBOARD": scan_storyboard,
+    "PROGRESSIVE": scan_progressive,
+    "PACKET_SIZE": scan_packets,
+}
+
+
+# --- SCHEDULING ---
+# One cap for every scan in this process (wizard, playlist workers, ...), so a big playlist
+# can't starve the box. Override with SCAN_CONCURRENCY.
+SCAN_SLOTS = threading.BoundedSemaphore(int(os.environ.get('SCAN_CONCURRENCY', '4')))
+
+
+def library_scan(stream_link, src, meta, key, run, encode=None, on_capture=None, on_progress=None, end_t=None):
+    # A known video (same fingerprint, same settings) is answered from the slide library; anything
+    # else is scanned by run() and its slides stored -> (captures, {'video', 'reused'} or None)
+    lib = open_library()
+    video, known = lib.recall(stream_link, src, meta, key)
+    if known is not None:
+        for t, b in known:
+            if on_capture: on_capture(t, b)
+        if on_progress: on_progress(1.0, end_t)
+        return known, {'video': video, 'reused': True}
+    captures = run()
+    if video is None: return captures, None
+    return lib.remember(video, key, captures, encode), {'video': video, 'reused': False}
+
+
+def scan_source(src, fmt_sel, cookies=None, start_t=0, end_t=None, engine="OPENCV_DIFF", meta=None,
+                auto_calibrate=False, library=False, **opts):
+    if meta is None:
+        meta, err = get_video_info(src, cookies=cookies)
+        if not meta: raise IOError(f"TARGET LOCK FAILED: {err}")
+    if end_t is None:
+        # Unknown length (rare): run until the stream stops returning frames
+        end_t = meta.get('duration') or 24 * 3600
+    stream_link = resolve_stream(src, fmt_sel, cookies=cookies)
+    if not stream_link: raise IOError("STREAM RESOLUTION FAILED")
+    if engine == "STORYBOARD": opts.setdefault('storyboard', storyboard_format(meta))
+
+    def run():
+        nonlocal meta
+        if auto_calibrate:
+            cal = calibrate(stream_link, start_t, end_t, min_skip=opts.get('min_skip', 2), roi=opts.get('roi'),
+                            auto_mask=opts.get('auto_mask', False), sensitivity=opts.get('sensitivity', 35),
+                            strictness=opts.get('strictness', 1.0))
+            opts.update(sensitivity=cal['sensitivity'], strictness=cal['strictness'])
+            meta = dict(meta, calibration=cal)
+        return ENGINES[engine](stream_link, start_t, end_t, **opts)
+
+    with SCAN_SLOTS:
+        if not library:
+            captures = run()
+            return meta, captures
+        key = library_key(engine, start_t, end_t, meta.get('duration'), dict(opts, auto_calibrate=auto_calibrate))
+        captures, used = library_scan(stream_link, src, meta, key, run, opts.get('encode'), opts.get('on_capture'),
+                                      opts.get('on_progress'), end_t)
+        return (dict(meta, library=used) if used else meta), captures
+
+
+def scan_playlist(entries, fmt_sel, cookies=None, workers=2, on_update=None, poll=0.5, **opts):
+    # Each entry gets a status dict that workers update in place; on_update sees the whole list
+    # on the caller's thread every `poll` seconds (Streamlit can't be called from the workers).
+    status = [{
+        'title': e.get('title') or e['url'],
+        'url': e['url'],
+        'state': 'QUEUED',
+        'progress': 0.0,
+        'meta': None,
+        'captures': [],
+        'error': None,
+        'elapsed': None,
+    } for e in entries]
+
+    def run(job):
+        def on_progress(p, t):
+            job['state'] = 'SCANNING'
+            job['progress'] = p
+
+        job['state'] = 'RESOLVING'
+        t0 = time.time()
+        try:
+            job['meta'], job['captures'] = scan_source(job['url'], fmt_sel, cookies=cookies, on_progress=on_progress, **opts)
+            job['state'] = 'DONE'
+        except Exception as e:
+            job['error'] = str(e)
+            job['state'] = 'FAILED'
+        job['elapsed'] = time.time() - t0
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="playlist") as pool:
+        futs = [pool.submit(run, job) for job in status]
+        while True:
+            done, pending = wait(futs, timeout=poll)
+            if on_update: on_update(status)
+            if not pending: break
+    return status
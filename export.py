@@ -0,0 +1,163 @@
+import html
+import io
+import json
+import os
+import tempfile
+import zipfile
+
+# --- EXPORTS ---
+# Stdlib only at import time (PIL is loaded inside create_pdf), so the UI can import this without
+# pulling in cv2/PIL. The ZIP is produced as a stream of chunks (iter_zip), never held whole in memory.
+
+CODECS = {
+    "JPEG": (".jpg", "image/jpeg"),
+    "WEBP": (".webp", "image/webp"),
+    "PNG": (".png", "image/png"),
+}
+
+
+def fmt(s):
+    m, s = divmod(s, 60)
+    h, m = divmod(m, 60)
+    return f"{int(h):02}:{int(m):02}:{int(s):02}"
+
+
+def slide_link(url, t):
+    # Deep link into the lecture at t; only meaningful for web sources
+    if not url or not url.startswith(('http://', 'https://')): return None
+    return f"{url}{'&' if '?' in url else '?'}t={int(t)}s"
+
+
+def build_manifest(times, buffers, meta=None, codec="JPEG"):
+    meta = meta or {}
+    url = meta.get('webpage_url') or meta.get('original_url')
+    ext = CODECS.get(codec, CODECS["JPEG"])[0]
+    slides = []
+    for i, (t, b) in enumerate(zip(times, buffers)):
+        slides.append({
+            'index': i,
+            'time': round(float(t), 3),
+            'timestamp': fmt(t),
+            'file': f"slides/slide_{i:03d}_{fmt(t).replace(':', '-')}{ext}",
+            'link': slide_link(url, t),
+            'bytes': len(b),
+        })
+    manifest = {
+        'title': meta.get('title') or "Lecture",
+        'source': url,
+        'duration': meta.get('duration'),
+        'codec': codec,
+        'slides': slides,
+    }
+    # Thresholds measured by engine.calibrate, when the scan asked for them
+    if meta.get('calibration'): manifest['calibration'] = meta['calibration']
+    return manifest
+
+
+def render_markdown(manifest):
+    lines = [f"# {manifest['title']}", ""]
+    if manifest.get('source'): lines += [f"Source: <{manifest['source']}>", ""]
+    for s in manifest['slides']:
+        stamp = f"[{s['timestamp']}]({s['link']})" if s['link'] else s['timestamp']
+        lines += [f"## Slide {s['index'] + 1:03d} — {stamp}", "", f"![Slide {s['index'] + 1}]({s['file']})", ""]
+    return "\n".join(lines)
+
+
+def render_html(manifest):
+    esc = html.escape
+    cards = []
+    for s in manifest['slides']:
+        stamp = esc(s['timestamp'])
+        if s['link']: stamp = f'<a href="{esc(s["link"])}" target="_blank">{stamp}</a>'
+        cards.append(
+            f'<figure><a href="{esc(s["file"])}"><img src="{esc(s["file"])}" loading="lazy"></a>'
+            f'<figcaption>#{s["index"] + 1:03d} &middot; {stamp}</figcaption></figure>'
+        )
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{esc(manifest['title'])}</title>
+<style>
+body {{ font-family: Inter, sans-serif; background: #0b0d11; color: #f8fafc; margin: 2rem; }}
+a {{ color: #818cf8; }}
+.grid {{ display: grid; grid-template-columns: repeat(auto-fill, minmax(20rem, 1fr)); gap: 1rem; }}
+figure {{ margin: 0; background: #161b22; border: 1px solid #334155; border-radius: 0.75rem; padding: 0.5rem; }}
+img {{ width: 100%; border-radius: 0.375rem; }}
+figcaption {{ font-family: 'JetBrains Mono', monospace; font-size: 0.85rem; padding-top: 0.4rem; }}
+</style></head><body>
+<h1>{esc(manifest['title'])}</h1>
+<div class="grid">
+{chr(10).join(cards)}
+</div>
+</body></html>
+"""
+
+
+class _ChunkSink:
+    # Write-only, non-seekable target for ZipFile; iter_zip drains it after every entry
+    def __init__(self):
+        self.chunks = []
+        self.pos = 0
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        self.pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self.pos
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        out, self.chunks = self.chunks, []
+        return out
+
+
+def iter_zip(times, buffers, meta=None, codec="JPEG"):
+    manifest = build_manifest(times, buffers, meta, codec)
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w") as zf:
+        for s, b in zip(manifest['slides'], buffers):
+            # Images are already compressed; store them as-is
+            zf.writestr(s['file'], bytes(b), compress_type=zipfile.ZIP_STORED)
+            yield from sink.drain()
+        zf.writestr("manifest.json", json.dumps(manifest, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+        zf.writestr("index.md", render_markdown(manifest), compress_type=zipfile.ZIP_DEFLATED)
+        zf.writestr("index.html", render_html(manifest), compress_type=zipfile.ZIP_DEFLATED)
+        yield from sink.drain()
+    yield from sink.drain()
+
+
+def section_card(title, size):
+    # Divider page in front of each lecture of a playlist PDF
+    from PIL import Image, ImageDraw, ImageFont
+    card = Image.new("RGB", size, (11, 13, 17))
+    draw = ImageDraw.Draw(card)
+    try:
+        font = ImageFont.load_default(size=max(16, size[1] // 14))
+    except TypeError:
+        font = ImageFont.load_default()
+    draw.rectangle([0, size[1] // 2 - 4, size[0], size[1] // 2 - 2], fill=(99, 102, 241))
+    draw.text((size[0] // 12, size[1] // 2 + size[1] // 20), title[:80], fill=(248, 250, 252), font=font)
+    return card
+
+
+def create_pdf(buffers, sections=None, path=None):
+    # sections: [(title, buffers), ...] for a playlist PDF with one divider page per lecture
+    if not buffers and not sections: return None
+    from PIL import Image
+    path = path or os.path.join(tempfile.gettempdir(), "lecture_export.pdf")
+    imgs = []
+    for title, bufs in (sections or [(None, buffers)]):
+        start = len(imgs)
+        for b in bufs:
+            try:
+                imgs.append(Image.open(io.BytesIO(bytes(b))).convert("RGB"))
+            except Exception:
+                continue
+        if title and len(imgs) > start:
+            imgs.insert(start, section_card(title, imgs[start].size))
+    if imgs:
+        imgs[0].save(path, "PDF", resolution=100.0, save_all=True, append_images=imgs[1:])
+        return path
+    return None
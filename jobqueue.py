@@ -0,0 +1,309 @@
+import argparse
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from export import build_manifest
+
+# --- SHARED JOB QUEUE ---
+# Durable scan jobs for separate worker processes (one or many hosts): front-ends submit, workers
+# lease. A lease is a deadline kept alive by heartbeats; a worker that dies stops heartbeating, the
+# lease runs out and the next worker to ask picks the job up again, up to MAX_ATTEMPTS times.
+# Finished slides are published to a result store every front-end can read.
+#
+#   JOB_QUEUE=sqlite:///shared/jobs.db   RESULT_STORE=/shared/results
+#   python jobqueue.py --workers 2       (on every scan host)
+#
+# SQLite needs working file locks across hosts (local disk, or a network FS that honours them);
+# it stays in rollback-journal mode because WAL's shared memory doesn't cross hosts. Other backends
+# plug in through QUEUES / STORES with the same methods.
+
+LEASE_TTL = float(os.environ.get('JOB_LEASE_TTL', '60'))
+MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+JOB_FIELDS = ('id', 'source', 'state', 'progress', 'position', 'slides', 'error', 'created', 'started',
+              'finished', 'title', 'attempts', 'worker')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    options TEXT NOT NULL,
+    cookies TEXT,
+    state TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    position REAL,
+    slides INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    title TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (state, created);
+"""
+
+
+class LeaseLost(Exception):
+    # Raised inside a scan whose lease was taken over; the other worker owns the job now
+    pass
+
+
+class SQLiteQueue:
+    def __init__(self, path, lease_ttl=LEASE_TTL, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.lease_ttl = lease_ttl
+        self.max_attempts = max_attempts
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.connect() as db:
+            db.executescript(SCHEMA)
+
+    def connect(self):
+        # One short-lived connection per call: safe from any thread, and nothing held between calls
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return _Closing(db)
+
+    def submit(self, source, options, cookies=None):
+        job_id = uuid.uuid4().hex[:12]
+        with self.connect() as db:
+            db.execute("INSERT INTO jobs (id, source, options, cookies, state, created) VALUES (?, ?, ?, ?, 'QUEUED', ?)",
+                       (job_id, source, json.dumps(options), cookies, time.time()))
+        return job_id
+
+    def lease(self, worker):
+        # -> job dict (with options) now owned by `worker`, or None. Expired leases count as queued;
+        # BEGIN IMMEDIATE takes the write lock up front so two workers can't claim the same row.
+        now = time.time()
+        with self.connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = db.execute(
+                        "SELECT * FROM jobs WHERE state = 'QUEUED' OR (state = 'SCANNING' AND lease_until < ?) "
+                        "ORDER BY created LIMIT 1", (now,)).fetchone()
+                    if row is None: break
+                    if row['attempts'] >= self.max_attempts:
+                        db.execute("UPDATE jobs SET state = 'FAILED', error = ?, finished = ?, worker = NULL WHERE id = ?",
+                                   (f"abandoned after {row['attempts']} attempts", now, row['id']))
+                        continue
+                    db.execute(
+                        "UPDATE jobs SET state = 'SCANNING', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                        "started = COALESCE(started, ?), progress = 0, position = NULL, slides = 0 WHERE id = ?",
+                        (worker, now + self.lease_ttl, now, row['id']))
+                    db.execute("COMMIT")
+                    job = dict(row, state='SCANNING', worker=worker, attempts=row['attempts'] + 1)
+                    job['options'] = json.loads(row['options'])
+                    return job
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return None
+
+    def heartbeat(self, job_id, worker, progress=None, position=None, slides=None):
+        # Extends the lease; False means it was lost (expired and re-leased) and the scan should stop
+        with self.connect() as db:
+            cur = db.execute(
+                "UPDATE jobs SET lease_until = ?, progress = COALESCE(?, progress), position = COALESCE(?, position), "
+                "slides = COALESCE(?, slides) WHERE id = ? AND worker = ? AND state = 'SCANNING'",
+                (time.time() + self.lease_ttl, progress, position, slides, job_id, worker))
+            return cur.rowcount == 1
+
+    def complete(self, job_id, worker, slides, title=None):
+        with self.connect() as db:
+            cur = db.execute(
+                "UPDATE jobs SET state = 'DONE', progress = 1, slides = ?, title = ?, finished = ?, lease_until = NULL "
+                "WHERE id = ? AND worker = ? AND state = 'SCANNING'", (slides, title, time.time(), job_id, worker))
+            return cur.rowcount == 1
+
+    def fail(self, job_id, worker, error):
+        with self.connect() as db:
+            cur = db.execute(
+                "UPDATE jobs SET state = 'FAILED', error = ?, finished = ?, lease_until = NULL "
+                "WHERE id = ? AND worker = ? AND state = 'SCANNING'", (error, time.time(), job_id, worker))
+            return cur.rowcount == 1
+
+    def get(self, job_id):
+        with self.connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return {k: row[k] for k in JOB_FIELDS} if row else None
+
+    def list(self, limit=500):
+        with self.connect() as db:
+            rows = db.execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+        return [{k: r[k] for k in JOB_FIELDS} for r in rows]
+
+
+class _Closing:
+    # sqlite3's own context manager commits but never closes
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self.db
+
+    def __exit__(self, *exc):
+        self.db.close()
+
+
+# --- RESULT STORE ---
+# One directory per finished job: the encoded slides under the names the ZIP/manifest use, plus
+# manifest.json and the source metadata. Published with a rename, so readers never see half a job.
+
+class DirResultStore:
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def put(self, job_id, meta, captures, codec="JPEG"):
+        times = [t for t, _ in captures]
+        bufs = [b for _, b in captures]
+        manifest = build_manifest(times, bufs, meta, codec)
+        tmp = os.path.join(self.root, f".{job_id}.{uuid.uuid4().hex[:6]}")
+        os.makedirs(os.path.join(tmp, "slides"))
+        for s, b in zip(manifest['slides'], bufs):
+            with open(os.path.join(tmp, s['file']), "wb") as f:
+                f.write(bytes(b))
+        with open(os.path.join(tmp, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        keep = ('title', 'webpage_url', 'original_url', 'duration', 'calibration')
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({k: meta.get(k) for k in keep if meta}, f)
+        final = os.path.join(self.root, job_id)
+        # A retried job may publish twice; the later copy wins
+        if os.path.isdir(final): shutil.rmtree(final, ignore_errors=True)
+        os.replace(tmp, final)
+
+    def get(self, job_id):
+        # -> (meta, times, buffers, codec) or None
+        base = os.path.join(self.root, job_id)
+        if not os.path.isfile(os.path.join(base, "manifest.json")): return None
+        with open(os.path.join(base, "manifest.json")) as f:
+            manifest = json.load(f)
+        with open(os.path.join(base, "meta.json")) as f:
+            meta = json.load(f)
+        bufs = []
+        for s in manifest['slides']:
+            with open(os.path.join(base, s['file']), "rb") as f:
+                bufs.append(f.read())
+        return meta, [s['time'] for s in manifest['slides']], bufs, manifest.get('codec', "JPEG")
+
+
+QUEUES = {'sqlite': SQLiteQueue}
+STORES = {'file': DirResultStore}
+
+
+def open_queue(url=None):
+    # "sqlite:///abs/path.db" or "sqlite:relative.db"; default is the JOB_QUEUE env var
+    url = url or os.environ.get('JOB_QUEUE')
+    if not url: return None
+    scheme, _, rest = url.partition(':')
+    if scheme not in QUEUES: raise ValueError(f"unknown queue backend '{scheme}'")
+    return QUEUES[scheme](rest[2:] if rest.startswith('//') else rest)
+
+
+def open_store(url=None):
+    # "file:///abs/dir" or a plain directory; default is the RESULT_STORE env var
+    url = url or os.environ.get('RESULT_STORE')
+    if not url: return None
+    scheme, _, rest = url.partition(':') if '://' in url else ('file', '', url)
+    if scheme not in STORES: raise ValueError(f"unknown result store '{scheme}'")
+    return STORES[scheme](rest[2:] if rest.startswith('//') else rest)
+
+
+# --- WORKER ---
+
+def scan_kwargs(o):
+    # Job options (see api.OPTION_TYPES) -> engine.scan_source keyword arguments
+    kw = dict(
+        start_t=o.get('start', 0), end_t=o.get('end'),
+        engine=o.get('engine', "OPENCV_DIFF"), detector=o.get('detector', "CASCADE"),
+        sensitivity=o.get('sensitivity', 35), strictness=o.get('strictness', 1.0),
+        min_skip=o.get('min_skip', 2), max_skip=o.get('max_skip', 10), roi=o.get('roi'),
+        auto_mask=o.get('auto_mask', True), settle=o.get('settle', 0), keep_final=o.get('keep_final', False),
+        adaptive=o.get('adaptive', False), decoder=o.get('decoder', "OPENCV"),
+        encode={'codec': o.get('codec', "JPEG"), 'quality': o.get('quality', 95), 'max_side': o.get('max_side')},
+    )
+    # Only the PROGRESSIVE engine takes budgets (api.parse_options enforces that)
+    kw.update({k: o[k] for k in ('budget_s', 'budget_samples') if k in o})
+    # Measure Pixel Delta / strictness on the video first; they replace the values above
+    if o.get('auto_calibrate'): kw['auto_calibrate'] = True
+    # Answer known videos from the shared slide library (SLIDE_LIBRARY) and store new slides there
+    if o.get('library'): kw['library'] = True
+    return kw
+
+
+def work(queue, store, job, worker):
+    import engine
+    state = {'progress': 0.0, 'position': None, 'slides': 0, 'lost': False}
+    done = threading.Event()
+
+    def beat():
+        # Frequent enough to keep progress fresh for front-ends, and well inside the lease
+        while not done.wait(min(queue.lease_ttl / 3, 5.0)):
+            if not queue.heartbeat(job['id'], worker, state['progress'], state['position'], state['slides']):
+                state['lost'] = True
+                return
+
+    def on_progress(p, t):
+        if state['lost']: raise LeaseLost(job['id'])
+        state['progress'], state['position'] = round(p, 4), round(t, 2)
+
+    def on_capture(t, b):
+        state['slides'] += 1
+
+    beater = threading.Thread(target=beat, name=f"lease-{job['id']}", daemon=True)
+    beater.start()
+    # The job carries cookies.txt contents; yt_dlp gets a private copy on this host
+    cookies = engine.cookie_file(job['cookies']) if job.get('cookies') else None
+    try:
+        o = job['options']
+        meta, captures = engine.scan_source(
+            job['source'], o.get('quality_format', "bestvideo/best"), cookies=cookies,
+            on_progress=on_progress, on_capture=on_capture, **scan_kwargs(o))
+        if state['lost']: return
+        store.put(job['id'], meta, captures, o.get('codec', "JPEG"))
+        queue.complete(job['id'], worker, len(captures), meta.get('title'))
+    except LeaseLost:
+        pass
+    except Exception as e:
+        queue.fail(job['id'], worker, str(e))
+    finally:
+        done.set()
+        if cookies: os.remove(cookies)
+
+
+def run_worker(queue, store, workers=1, poll=2.0, name=None, stop=None):
+    # Keeps up to `workers` scans leased; each also takes an engine.SCAN_SLOTS slot inside scan_source
+    name = name or f"{socket.gethostname()}:{os.getpid()}"
+    stop = stop or threading.Event()
+    running = set()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="queue-worker") as pool:
+        while not stop.is_set():
+            running = {f for f in running if not f.done()}
+            job = queue.lease(name) if len(running) < workers else None
+            if job:
+                running.add(pool.submit(work, queue, store, job, name))
+            else:
+                stop.wait(poll)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Scan worker: lease jobs from the shared queue")
+    ap.add_argument("--queue", default=os.environ.get('JOB_QUEUE'), help="e.g. sqlite:///shared/jobs.db")
+    ap.add_argument("--store", default=os.environ.get('RESULT_STORE'), help="shared result directory")
+    ap.add_argument("--workers", type=int, default=int(os.environ.get('QUEUE_WORKERS', '1')))
+    ap.add_argument("--poll", type=float, default=2.0)
+    args = ap.parse_args()
+    if not args.queue or not args.store: ap.error("--queue and --store (or JOB_QUEUE / RESULT_STORE) are required")
+    print(f"Worker on {args.queue} -> {args.store} ({args.workers} slots)")
+    run_worker(open_queue(args.queue), open_store(args.store), workers=args.workers, poll=args.poll)
@@ -0,0 +1,314 @@
+import collections
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from contextlib import closing
+import cv2
+import numpy as np
+from export import CODECS
+from sigindex import signature
+
+# --- SLIDE LIBRARY ---
+# Persistent memory across videos. Each scanned video leaves a fingerprint (perceptual hashes of a
+# few frames at fixed fractions of its length) and, per scan setting, the list of slides it found.
+# A re-upload of the same lecture matches the fingerprint and gets those slides back without a
+# scan. Slides are stored once per encode profile: a capture that matches a known slide (decks
+# reused across sections and years, a lecture revisiting a slide) shares that slide's file.
+#
+#   SLIDE_LIBRARY=/shared/library   (SQLite + slide files; same file-lock caveat as JOB_QUEUE)
+#
+# Like the signature index it is a cache: videos unused for LIBRARY_TTL go first, then the least
+# recently used until the slide files fit in LIBRARY_MAX_MB; slides no scan refers to go with them.
+
+LIBRARY_DIR = os.environ.get('SLIDE_LIBRARY') or os.path.join(tempfile.gettempdir(), "slide_snatcher_library")
+LIBRARY_VERSION = 2 # 2: last use per video and file size per slide, for eviction
+FINGERPRINT_FRAMES = 12
+FINGERPRINT_RADIUS = 4 # bits (of 64) two frames may differ by and still count as the same picture
+FINGERPRINT_AGREE = 0.8 # share of fingerprint frames that must agree
+DURATION_TOL = 1.0 # seconds (or 0.5% of the length, if larger) a re-upload may differ by
+HASH_BANDS = 4 # 16-bit bands; any hash within 3 bits shares one exactly (the lookup index)
+SLIDE_RADIUS = HASH_BANDS - 1 # pHash bits a slide may differ by before the pixel check (all the bands can find)
+SLIDE_DELTA, SLIDE_STRICTNESS = 35, 0.25 # the pixel check: a tighter take on the scan's own test
+LIBRARY_MAX_MB = float(os.environ.get('SLIDE_LIBRARY_MAX_MB', '2048'))
+LIBRARY_TTL = float(os.environ.get('SLIDE_LIBRARY_TTL_H', '720')) * 3600
+ORPHAN_GRACE = 3600 # seconds a slide may go unreferenced: remember() stores slides before their scan
+# Options that change how a scan runs but not which slides it finds
+SCAN_KEY_SKIP = ('on_progress', 'on_capture', 'should_stop', 'index_key', 'decoder', 'prefetch', 'storyboard')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    title TEXT,
+    duration REAL NOT NULL,
+    fingerprint TEXT NOT NULL,
+    created REAL NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS videos_duration ON videos (duration);
+CREATE TABLE IF NOT EXISTS slides (
+    id INTEGER PRIMARY KEY,
+    profile TEXT NOT NULL,
+    phash INTEGER NOT NULL,
+    b0 INTEGER NOT NULL, b1 INTEGER NOT NULL, b2 INTEGER NOT NULL, b3 INTEGER NOT NULL,
+    sig BLOB NOT NULL,
+    pixels INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    file TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS slides_b0 ON slides (profile, b0);
+CREATE INDEX IF NOT EXISTS slides_b1 ON slides (profile, b1);
+CREATE INDEX IF NOT EXISTS slides_b2 ON slides (profile, b2);
+CREATE INDEX IF NOT EXISTS slides_b3 ON slides (profile, b3);
+CREATE TABLE IF NOT EXISTS scans (
+    video_id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    slides TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (video_id, key)
+);
+"""
+
+
+def phash(gray):
+    # 64-bit DCT hash: the low-frequency 8x8 corner of a 32x32 thumbnail against its median.
+    # Flat frames (black, fades) hash to 0 rather than to noise.
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    if small.std() < 2: return 0
+    low = cv2.dct(small)[:8, :8].ravel()
+    return int.from_bytes(np.packbits(low > np.median(low[1:])).tobytes(), "big")
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def bands(h):
+    return [(h >> (16 * i)) & 0xFFFF for i in range(HASH_BANDS)]
+
+
+def to_sql(h):
+    # SQLite integers are signed 64-bit
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+
+def from_sql(v):
+    return v + (1 << 64) if v < 0 else v
+
+
+def fingerprint(stream_link, duration, frames=FINGERPRINT_FRAMES):
+    # -> one pHash per frame at the middle of each 1/frames of the video, None where the seek fails
+    cap = cv2.VideoCapture(stream_link, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        raise IOError("STREAM HANDSHAKE FAILED")
+    hashes = []
+    try:
+        for i in range(frames):
+            cap.set(cv2.CAP_PROP_POS_MSEC, duration * (i + 0.5) / frames * 1000)
+            ret, frame = cap.read()
+            hashes.append(phash(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)) if ret else None)
+    finally:
+        cap.release()
+    return hashes
+
+
+def same_video(a, b):
+    pairs = [(x, y) for x, y in zip(a, b) if x is not None and y is not None]
+    if len(pairs) < len(a) / 2: return False
+    return sum(hamming(x, y) <= FINGERPRINT_RADIUS for x, y in pairs) >= FINGERPRINT_AGREE * len(pairs)
+
+
+def scan_key(engine, start_t, end_t, duration, opts):
+    # Scan settings that decide the slide list (unset options and defaults left at None drop out);
+    # a window running to the end is stored as open-ended so a slightly longer re-upload still matches
+    if end_t is not None and duration and end_t >= duration - DURATION_TOL: end_t = None
+    opts = {k: v for k, v in opts.items() if k not in SCAN_KEY_SKIP and v is not None and not callable(v)}
+    return json.dumps([engine, round(float(start_t or 0), 2), None if end_t is None else round(float(end_t), 2), opts],
+                      sort_keys=True)
+
+
+def encode_profile(encode):
+    e = encode or {}
+    return json.dumps([e.get('codec', "JPEG"), e.get('quality', 95), e.get('max_side')])
+
+
+class SlideLibrary:
+    def __init__(self, root=LIBRARY_DIR):
+        self.root = root
+        self.path = os.path.join(root, "library.db")
+        os.makedirs(os.path.join(root, "slides"), exist_ok=True)
+        with self.connect() as db:
+            # Like an index from an older layout, an older library is dropped and rebuilt by later scans
+            if db.execute("PRAGMA user_version").fetchone()[0] != LIBRARY_VERSION:
+                db.executescript("DROP TABLE IF EXISTS videos; DROP TABLE IF EXISTS slides; DROP TABLE IF EXISTS scans;")
+            db.executescript(SCHEMA)
+            db.execute(f"PRAGMA user_version = {LIBRARY_VERSION}")
+
+    def connect(self):
+        # Short-lived connections, like jobqueue.SQLiteQueue: safe from any thread or host
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return closing(db)
+
+    def match_video(self, fp, duration):
+        # -> id of a known video with this fingerprint, or None
+        tol = max(DURATION_TOL, duration * 0.005)
+        with self.connect() as db:
+            rows = db.execute("SELECT id, fingerprint FROM videos WHERE duration BETWEEN ? AND ? ORDER BY id",
+                              (duration - tol, duration + tol)).fetchall()
+        for r in rows:
+            if same_video(fp, json.loads(r['fingerprint'])): return r['id']
+        return None
+
+    def add_video(self, source, title, duration, fp):
+        now = time.time()
+        with self.connect() as db:
+            cur = db.execute("INSERT INTO videos (source, title, duration, fingerprint, created, used) VALUES (?, ?, ?, ?, ?, ?)",
+                             (source, title, duration, json.dumps(fp), now, now))
+            return cur.lastrowid
+
+    def recall(self, stream_link, source, meta, key):
+        # -> (video id, [(t, bytes)] or None). Fingerprints the stream; an unknown video is added.
+        duration = meta.get('duration')
+        if not duration: return None, None
+        fp = fingerprint(stream_link, duration)
+        if sum(h is not None for h in fp) < len(fp) / 2: return None, None
+        video = self.match_video(fp, duration)
+        if video is None:
+            return self.add_video(source, meta.get('title'), duration, fp), None
+        # Recognising a video counts as use, whether or not these settings were scanned before
+        with self.connect() as db:
+            db.execute("UPDATE videos SET used = ? WHERE id = ?", (time.time(), video))
+        return video, self.find_scan(video, key)
+
+    def find_scan(self, video, key):
+        with self.connect() as db:
+            row = db.execute("SELECT slides FROM scans WHERE video_id = ? AND key = ?", (video, key)).fetchone()
+            if row is None: return None
+            entries = json.loads(row['slides'])
+            files = dict(db.execute(
+                f"SELECT id, file FROM slides WHERE id IN ({','.join('?' * len(entries))})",
+                [s for _, s in entries]).fetchall()) if entries else {}
+        captures = []
+        for t, s in entries:
+            path = os.path.join(self.root, "slides", files.get(s, ""))
+            # A slide file removed by hand turns the whole entry back into a miss
+            if s not in files or not os.path.isfile(path): return None
+            with open(path, "rb") as f:
+                captures.append((t, f.read()))
+        return captures
+
+    def remember(self, video, key, captures, encode=None):
+        # Stores the scan's slides (sharing known ones) -> captures with the library's copy of each
+        if video is None: return captures
+        self.evict(keep=video)
+        profile = encode_profile(encode)
+        ext = CODECS.get((encode or {}).get('codec', "JPEG"), CODECS["JPEG"])[0]
+        entries, shared = [], []
+        for t, b in captures:
+            slide, data = self.add_slide(profile, ext, bytes(b))
+            entries.append([round(float(t), 3), slide])
+            shared.append((t, data))
+        with self.connect() as db:
+            db.execute("INSERT OR REPLACE INTO scans (video_id, key, slides, created) VALUES (?, ?, ?, ?)",
+                       (video, key, json.dumps(entries), time.time()))
+        return shared
+
+    def add_slide(self, profile, ext, data):
+        # -> (slide id, bytes to hand out). Candidates come from the band index, the nearest one
+        # within SLIDE_RADIUS must then pass a pixel check on the stored 160x90 signatures.
+        # Lookup and insert are one BEGIN IMMEDIATE transaction: two scans storing the same new
+        # slide at once end up sharing one row instead of adding two.
+        gray = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+        h, sig, pixels = phash(gray), signature(gray), gray.shape[0] * gray.shape[1]
+        q = " UNION ".join(f"SELECT * FROM slides WHERE profile = ? AND b{i} = ?" for i in range(HASH_BANDS))
+        args = [x for b in bands(h) for x in (profile, b)]
+        limit = sig.size * SLIDE_STRICTNESS / 100
+        old = None
+        with self.connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                best = None
+                for r in sorted(db.execute(q, args).fetchall(), key=lambda r: hamming(h, from_sql(r['phash']))):
+                    if hamming(h, from_sql(r['phash'])) > SLIDE_RADIUS: break
+                    known = np.frombuffer(r['sig'], np.uint8).reshape(sig.shape)
+                    if np.count_nonzero(cv2.absdiff(sig, known) > SLIDE_DELTA) <= limit:
+                        best = r
+                        break
+
+                path = os.path.join(self.root, "slides", best['file']) if best is not None else None
+                if best is not None and best['pixels'] >= pixels and os.path.isfile(path):
+                    with open(path, "rb") as f:
+                        shared = f.read()
+                    db.execute("COMMIT")
+                    return best['id'], shared
+                # New slide, or a sharper copy of a known one (which then replaces it everywhere)
+                name = uuid.uuid4().hex[:16] + ext
+                tmp = os.path.join(self.root, "slides", f".{name}")
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, os.path.join(self.root, "slides", name))
+                if best is None:
+                    slide = db.execute(
+                        "INSERT INTO slides (profile, phash, b0, b1, b2, b3, sig, pixels, bytes, file, created) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (profile, to_sql(h), *bands(h), sig.tobytes(), pixels, len(data), name, time.time())).lastrowid
+                else:
+                    db.execute("UPDATE slides SET phash = ?, b0 = ?, b1 = ?, b2 = ?, b3 = ?, sig = ?, pixels = ?, bytes = ?, "
+                               "file = ?, created = ? WHERE id = ?",
+                               (to_sql(h), *bands(h), sig.tobytes(), pixels, len(data), name, time.time(), best['id']))
+                    slide, old = best['id'], path
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        if old and os.path.isfile(old): os.remove(old)
+        return slide, data
+
+    def evict(self, keep=None):
+        # Drops videos unused for LIBRARY_TTL, then the least recently used while the slide files
+        # are over LIBRARY_MAX_MB, then every slide no remaining scan refers to
+        now = time.time()
+        folder = os.path.join(self.root, "slides")
+        with self.connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                slides = {r['id']: r for r in db.execute("SELECT id, bytes, file, created FROM slides")}
+                uses = {} # video -> slide ids its scans refer to
+                for r in db.execute("SELECT video_id, slides FROM scans"):
+                    uses.setdefault(r['video_id'], set()).update(s for _, s in json.loads(r['slides']))
+                refs = collections.Counter(s for ids in uses.values() for s in ids)
+                total = sum(slides[s]['bytes'] for s in refs if s in slides)
+                drop = []
+                for r in db.execute("SELECT id, used FROM videos ORDER BY used").fetchall():
+                    if r['id'] == keep: continue
+                    if now - r['used'] < LIBRARY_TTL and total <= LIBRARY_MAX_MB * 2 ** 20: break
+                    drop.append(r['id'])
+                    for s in uses.get(r['id'], ()):
+                        refs[s] -= 1
+                        if not refs[s] and s in slides: total -= slides[s]['bytes']
+                for video in drop:
+                    db.execute("DELETE FROM scans WHERE video_id = ?", (video,))
+                    db.execute("DELETE FROM videos WHERE id = ?", (video,))
+                gone = [s for s, r in slides.items() if not refs[s] and now - r['created'] > ORPHAN_GRACE]
+                for s in gone:
+                    db.execute("DELETE FROM slides WHERE id = ?", (s,))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        for s in gone:
+            try: os.remove(os.path.join(folder, slides[s]['file']))
+            except OSError: pass
+
+    def stats(self):
+        with self.connect() as db:
+            return {k: db.execute(f"SELECT COUNT(*) FROM {k}").fetchone()[0] for k in ('videos', 'slides', 'scans')}
+
+
+def open_library(root=None):
+    return SlideLibrary(root or LIBRARY_DIR)
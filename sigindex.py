@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+import cv2
+import numpy as np
+
+# --- SIGNATURE INDEX ---
+# A scan can leave behind one small copy of its detect signature per sample (160x90, uniform stride)
+# in a memory-mapped .npy, keyed by source + window + ROI + stride. Re-running detection with new
+# thresholds then only reads that file; full frames are decoded just for the new captures.
+# The directory is a cache (~40 MB per 90-minute lecture): indexes unused for INDEX_TTL go first,
+# then the least recently used until it fits in INDEX_MAX_MB.
+
+SIG_W, SIG_H = 160, 90
+INDEX_VERSION = 5 # 5: signatures downscaled with INTER_AREA (prep_gray)
+INDEX_DIR = os.environ.get('SIGNATURE_DIR') or os.path.join(tempfile.gettempdir(), "slide_snatcher_index")
+INDEX_MAX_MB = float(os.environ.get('SIGNATURE_MAX_MB', '1024'))
+INDEX_TTL = float(os.environ.get('SIGNATURE_TTL_H', '72')) * 3600
+
+
+def index_key(source, start_t, end_t, roi=None, stride=2):
+    raw = json.dumps([source, float(start_t), float(end_t), list(roi) if roi else None, float(stride)])
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def index_paths(key):
+    base = os.path.join(INDEX_DIR, key)
+    return base + ".npy", base + ".json", base + ".mask.npy"
+
+
+def signature(gray):
+    # scan's own ABSDIFF signature (21x21 blur at detect scale), then area-shrunk: the blur leaves
+    # nothing finer than the 4x shrink drops, so replay scores track the scan's. Blurring after the
+    # shrink instead averaged thin text strokes away first and scored text changes ~10% low.
+    return cv2.resize(cv2.GaussianBlur(gray, (21, 21), 0), (SIG_W, SIG_H), interpolation=cv2.INTER_AREA)
+
+
+def evict(keep=None):
+    groups = {} # key -> [bytes, last used, paths]
+    for name in os.listdir(INDEX_DIR):
+        path = os.path.join(INDEX_DIR, name)
+        try: st = os.stat(path)
+        except OSError: continue
+        g = groups.setdefault(name.split(".")[0], [0, 0.0, []])
+        g[0] += st.st_size
+        g[1] = max(g[1], st.st_mtime)
+        g[2].append(path)
+    total = sum(g[0] for g in groups.values())
+    now = time.time()
+    for key, (size, used, paths) in sorted(groups.items(), key=lambda kv: kv[1][1]):
+        if key == keep: continue
+        if now - used < INDEX_TTL and total <= INDEX_MAX_MB * 2 ** 20: break
+        for path in paths:
+            try: os.remove(path)
+            except OSError: pass
+        total -= size
+
+
+class IndexWriter:
+    def __init__(self, key, start_t, end_t, stride, fps, meta=None, capacity=None):
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        evict(keep=key)
+        self.key = key
+        self.paths = index_paths(key)
+        # Samples on the scan's frame grid for the window; add() grows the file if a walk takes more.
+        # The sidecar records how many were written.
+        step = max(1, int(fps * stride))
+        capacity = capacity or int(np.ceil((end_t - start_t) * fps / step)) + 2
+        self.sigs = np.lib.format.open_memmap(self.paths[0] + ".part", mode="w+", dtype=np.uint8, shape=(capacity, SIG_H, SIG_W))
+        self.times = []
+        self.info = dict(meta or {}, start=start_t, end=end_t, stride=stride, fps=fps)
+
+    def _grow(self):
+        n = len(self.sigs)
+        grown = np.lib.format.open_memmap(self.paths[0] + ".grow", mode="w+", dtype=np.uint8, shape=(2 * n, SIG_H, SIG_W))
+        grown[:n] = self.sigs
+        del self.sigs
+        os.replace(self.paths[0] + ".grow", self.paths[0] + ".part")
+        self.sigs = grown
+
+    def add(self, t, gray):
+        if len(self.times) >= len(self.sigs): self._grow()
+        self.sigs[len(self.times)] = signature(gray)
+        self.times.append(round(float(t), 3))
+
+    def close(self, mask=None):
+        # Adaptive scans add look-back samples out of order (and may revisit one); replays need
+        # them unique and in time order
+        times = np.asarray(self.times)
+        order = np.argsort(times, kind="stable")
+        order = order[np.r_[True, np.diff(times[order]) > 0]] if len(order) else order
+        if len(order) != len(times) or (np.diff(order) < 0).any():
+            self.sigs[:len(order)] = np.asarray(self.sigs[:len(times)])[order]
+            self.times = [self.times[i] for i in order]
+        self.sigs.flush()
+        del self.sigs
+        os.replace(self.paths[0] + ".part", self.paths[0])
+        if mask is not None:
+            np.save(self.paths[2], mask)
+        elif os.path.exists(self.paths[2]):
+            os.remove(self.paths[2])
+        with open(self.paths[1], "w") as f:
+            json.dump(dict(self.info, version=INDEX_VERSION, count=len(self.times), times=self.times), f)
+        return self.key
+
+    def abort(self):
+        del self.sigs
+        if os.path.exists(self.paths[0] + ".part"): os.remove(self.paths[0] + ".part")
+
+
+def open_index(key):
+    npy, side, mask_path = index_paths(key)
+    if not (os.path.exists(npy) and os.path.exists(side)): return None
+    with open(side) as f:
+        info = json.load(f)
+    # Indexes from an older layout are treated as missing and rebuilt by the next scan
+    if info.get('version') != INDEX_VERSION: return None
+    # Last use is what eviction goes by
+    os.utime(side)
+    sigs = np.load(npy, mmap_mode="r")[:info['count']]
+    mask = np.load(mask_path) if os.path.exists(mask_path) else None
+    return {'sigs': sigs, 'times': np.asarray(info['times']), 'fps': info['fps'], 'mask': mask, 'info': info}
+
+
+def replay(index, sensitivity=35, strictness=1.0, min_skip=2, max_skip=10, block=64):
+    # Same capture/hold walk as engine.scan, but over stored signatures, counted in frames as the scan
+    # does (int(fps * min_skip) is not min_skip seconds at 29.97 fps); strides snap forward to the
+    # next stored sample. Upcoming grid samples are scored against the current reference as one
+    # stacked absdiff/threshold/reduce, so Python runs per block or capture rather than per sample.
+    times = index['times']
+    n = len(times)
+    if not n: return []
+    fps = index['fps']
+    mask = index['mask']
+    if mask is not None:
+        mask = (cv2.resize(mask, (SIG_W, SIG_H), interpolation=cv2.INTER_NEAREST) > 0).astype(np.uint8)
+    area = np.count_nonzero(mask) if mask is not None else SIG_W * SIG_H
+    limit = area * strictness / 100
+
+    pos = np.arange(n)
+    frames = np.rint(np.asarray(times) * fps).astype(np.int64)
+    nxt_min = np.maximum(pos + 1, np.searchsorted(frames, frames + max(1, int(fps * min_skip))))
+    nxt_max = np.maximum(pos + 1, np.searchsorted(frames, frames + int(fps * max_skip)))
+    mask_tile = np.tile(mask, (block, 1)) if mask is not None else None
+
+    caps = [float(times[0])]
+    sigs = index['sigs']
+    ref_tile = np.tile(sigs[0], (block, 1))
+    i = int(nxt_max[0])
+    size = 4
+    while i < n:
+        # Blocks start small after a capture and double, so little is scored past the next change
+        size = min(block, size * 2)
+        grid = []
+        while i < n and len(grid) < size:
+            grid.append(i)
+            i = int(nxt_min[i])
+        rows = len(grid) * SIG_H
+        d = cv2.absdiff(sigs[grid].reshape(rows, SIG_W), ref_tile[:rows])
+        hit = cv2.threshold(d, sensitivity, 1, cv2.THRESH_BINARY)[1]
+        if mask_tile is not None: hit = cv2.bitwise_and(hit, mask_tile[:rows])
+        counts = cv2.reduce(hit.reshape(len(grid), -1), 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel()
+        over = np.flatnonzero(counts > limit)
+        if over.size:
+            k = grid[over[0]]
+            caps.append(float(times[k]))
+            ref_tile = np.tile(sigs[k], (block, 1))
+            i = int(nxt_max[k])
+            size = 4
+    return caps
@@ -0,0 +1,64 @@
+import os
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+# --- STORYBOARD PRE-SCAN ---
+# YouTube publishes "storyboards" (yt_dlp formats sb0..sb3): JPEG mosaics of small thumbnails taken
+# at a fixed interval over the whole video. A few dozen mosaic downloads cover a lecture, so change
+# detection on the tiles can point the scan at the handful of intervals worth decoding.
+# Fragment URLs may also be local paths (fixtures, pre-fetched mosaics).
+
+
+def storyboard_format(meta):
+    # Largest tiles first: sb0 is usually the densest/sharpest storyboard on offer
+    boards = [f for f in (meta or {}).get('formats') or []
+              if f.get('format_note') == 'storyboard' and f.get('fragments') and f.get('fps')]
+    if not boards: return None
+    return max(boards, key=lambda f: (f.get('width') or 0) * (f.get('height') or 0))
+
+
+def fetch(url, timeout=20):
+    # Raw JPEG bytes; mosaics are decoded one at a time as the tiles are consumed
+    if os.path.isfile(url):
+        with open(url, "rb") as f:
+            return f.read()
+    req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return resp.read()
+
+
+def split_tiles(mosaic, rows, cols, count=None):
+    # Row-major tiles; the last mosaic of a video is padded with blank cells, so stop at `count`
+    h, w = mosaic.shape[0] // rows, mosaic.shape[1] // cols
+    tiles = []
+    for r in range(rows):
+        for c in range(cols):
+            if count is not None and len(tiles) >= count: return tiles
+            tiles.append(mosaic[r * h:(r + 1) * h, c * w:(c + 1) * w])
+    return tiles
+
+
+def iter_tiles(board, start_t=0, end_t=None, workers=4):
+    # -> (t, tile) in time order for tiles inside [start_t, end_t]; only overlapping mosaics are fetched
+    rows, cols, fps = board['rows'], board['columns'], board['fps']
+    per = rows * cols
+    spans = []
+    first = 0
+    for frag in board['fragments']:
+        n = min(per, max(1, int(round(frag['duration'] * fps))))
+        t0, t1 = first / fps, (first + n - 1) / fps
+        if t1 >= start_t and (end_t is None or t0 <= end_t):
+            spans.append((frag['url'], first, n))
+        first += per
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="storyboard") as pool:
+        blobs = pool.map(lambda s: fetch(s[0]), spans)
+        for (url, first, n), blob in zip(spans, blobs):
+            mosaic = cv2.imdecode(np.frombuffer(blob, np.uint8), cv2.IMREAD_COLOR)
+            if mosaic is None: continue
+            for i, tile in enumerate(split_tiles(mosaic, rows, cols, n)):
+                t = (first + i) / fps
+                if t < start_t or (end_t is not None and t > end_t): continue
+                yield t, tile
@@ -0,0 +1,57 @@
+import os
+import shutil
+import sys
+import pytest
+
+# The app is flat modules next to app.py; tests import them the same way
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from videos import write_lecture
+
+# Fixture lectures: 240s, a slide every 30s -> these are the captures a correct scan returns
+SLIDE_TIMES = [0.0, 30.0, 60.0, 90.0, 120.0, 150.0, 180.0, 210.0]
+
+
+@pytest.fixture(scope="session")
+def fixture_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp("lectures")
+
+
+@pytest.fixture(scope="session")
+def lecture(fixture_dir):
+    return write_lecture(str(fixture_dir / "lecture.mp4"))
+
+
+@pytest.fixture(scope="session")
+def webcam_lecture(fixture_dir):
+    return write_lecture(str(fixture_dir / "webcam.mp4"), cam=True)
+
+
+@pytest.fixture(scope="session")
+def noisy_lecture(fixture_dir):
+    return write_lecture(str(fixture_dir / "noisy.mp4"), noise=10)
+
+
+@pytest.fixture(scope="session")
+def ntsc_lecture(fixture_dir):
+    # 29.97 fps: the min_skip grid (int(fps * min_skip) frames) is no longer whole seconds
+    return write_lecture(str(fixture_dir / "ntsc.mp4"), duration=120, fps=30000 / 1001, cam=True)
+
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which(os.environ.get('FFMPEG_BIN', 'ffmpeg')) is None, reason="needs the ffmpeg binary")
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    # Signature indexes (and the progressive engine's) go to a per-test directory
+    import sigindex
+    monkeypatch.setattr(sigindex, 'INDEX_DIR', str(tmp_path / "index"))
+    return sigindex.INDEX_DIR
+
+
+@pytest.fixture
+def library_dir(tmp_path, monkeypatch):
+    # The slide library goes to a per-test directory
+    import library
+    monkeypatch.setattr(library, 'LIBRARY_DIR', str(tmp_path / "library"))
+    return library.LIBRARY_DIR
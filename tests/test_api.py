@@ -0,0 +1,113 @@
+import io
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import zipfile
+import pytest
+import api
+from conftest import SLIDE_TIMES
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = api.serve("127.0.0.1", 0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def call(base, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base + path, data=data, method=method, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req) as r:
+            return r.status, r.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+@pytest.mark.parametrize("value, expected", [(True, True), (False, False), ("false", False), ("True", True), (0, False), (1, True)])
+def test_booleans_parse_strictly(value, expected):
+    assert api.parse_options({'source': "x", 'adaptive': value})['adaptive'] is expected
+
+
+@pytest.mark.parametrize("body", [
+    {'adaptive': "nope"}, {'adaptive': 2}, {'keep_final': None}, {'quality': 92.5}, {'quality': True},
+    {'sensitivity': "abc"}, {'sensitivity': [35]}, {'min_skip': "nan"}, {'engine': 5}, {'roi': 5}, {'roi': [0, 0, 1]},
+    {'roi': [0, 0, 1.5, 1]}, {'roi': [-0.1, 0, 1, 1]}, {'roi': [0.6, 0, 0.4, 1]}, {'roi': [0, 0.5, 1, 0.5]},
+    {'cookies': ["/root/.netrc"]}, {'cookies': 1},
+])
+def test_bad_option_types_are_rejected(server, body):
+    status, out = call(server, "POST", "/jobs", dict(body, source="/nowhere.mp4"))
+    assert status == 400, out
+    assert json.loads(out)['error']
+
+
+def test_source_must_be_a_string(server):
+    status, out = call(server, "POST", "/jobs", {'source': ["/nowhere.mp4"]})
+    assert status == 400 and json.loads(out)['error']
+
+
+def test_cookies_go_to_a_private_file_for_the_job(monkeypatch):
+    seen = {}
+
+    def scan_source(src, fmt_sel, cookies=None, **_):
+        seen['path'] = cookies
+        with open(cookies) as f: seen['text'] = f.read()
+        seen['mode'] = os.stat(cookies).st_mode & 0o777
+        return {'title': "t"}, []
+    monkeypatch.setattr(api.engine, 'scan_source', scan_source)
+    job = {'id': "c", 'source': "https://example.com/v", 'cookies': "# Netscape HTTP Cookie File\n", 'options': {},
+           'state': 'QUEUED', 'slides': 0}
+    api.run_job(job)
+    assert job['state'] == 'DONE'
+    assert seen['text'] == "# Netscape HTTP Cookie File\n" and seen['mode'] == 0o600
+    # Gone once the job ends
+    assert not os.path.exists(seen['path'])
+
+
+def test_event_stream_ends_when_the_job_is_pruned(server, monkeypatch):
+    monkeypatch.setitem(api.JOBS, "gone", {
+        'id': "gone", 'source': "x", 'state': 'SCANNING', 'progress': 0.5, 'position': 10.0, 'slides': 1,
+        'error': None, 'created': time.time(), 'started': time.time(), 'finished': None, 'title': None})
+    threading.Timer(0.3, api.JOBS.pop, ("gone",)).start()
+    status, out = call(server, "GET", "/jobs/gone/events")
+    events = [json.loads(line[len("data: "):]) for line in out.decode().splitlines() if line.startswith("data: ")]
+    assert status == 200
+    assert events[0]['state'] == 'SCANNING' and events[-1] == {'id': "gone", 'state': 'EXPIRED'}
+
+
+def test_finished_jobs_are_pruned(monkeypatch):
+    monkeypatch.setattr(api, 'JOBS', {})
+    monkeypatch.setattr(api, 'JOB_TTL', 100)
+    monkeypatch.setattr(api, 'JOB_KEEP', 2)
+    now = 1000.0
+    for i, finished in enumerate([None, 850.0, 950.0, 960.0, 970.0]):
+        api.JOBS[str(i)] = {'id': str(i), 'finished': finished}
+    api.prune(now)
+    # Running job kept, the expired one and the oldest over JOB_KEEP dropped
+    assert sorted(api.JOBS) == ["0", "3", "4"]
+
+
+def test_submit_status_zip(server, lecture):
+    status, out = call(server, "POST", "/jobs", {'source': lecture, 'adaptive': "false", 'codec': "JPEG"})
+    assert status == 202, out
+    job = json.loads(out)
+    deadline = time.time() + 300
+    while job['state'] not in ('DONE', 'FAILED') and time.time() < deadline:
+        time.sleep(0.5)
+        job = json.loads(call(server, "GET", f"/jobs/{job['id']}")[1])
+    assert job['state'] == 'DONE', job['error']
+    assert job['slides'] == len(SLIDE_TIMES)
+
+    status, out = call(server, "GET", f"/jobs/{job['id']}/result.zip")
+    assert status == 200
+    z = zipfile.ZipFile(io.BytesIO(out))
+    manifest = json.loads(z.read("manifest.json"))
+    slides = [n for n in z.namelist() if n.startswith("slides/")]
+    assert len(slides) == len(SLIDE_TIMES)
+    assert [round(s['time'], 1) for s in manifest['slides']] == SLIDE_TIMES
+    assert all(z.read(n)[:2] == b"\xff\xd8" for n in slides)
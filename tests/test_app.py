@@ -0,0 +1,109 @@
+import os
+import subprocess
+import sys
+import pytest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+pytest.importorskip("streamlit.testing.v1")
+
+
+def run_app(body):
+    # Each check gets a fresh interpreter: which modules a page view imports is the thing under test
+    code = f"import sys\nfrom streamlit.testing.v1 import AppTest\nat = AppTest.from_file({APP!r}, default_timeout=120)\n{body}"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=300)
+    assert out.returncode == 0, out.stderr
+    return out.stdout.strip().splitlines()[-1]
+
+
+def test_page_views_skip_heavy_imports():
+    # numpy / PIL come with streamlit itself; cv2, yt_dlp and the engine must wait for a scan
+    last = run_app(
+        "at.run()\n"
+        "for step in (1, 2, 3, 4, 5):\n"
+        "    at.session_state['setup_active'] = True\n"
+        "    at.session_state['setup_step'] = step\n"
+        "    at.run()\n"
+        "    assert not at.exception, at.exception\n"
+        "print(sorted(m for m in ('cv2', 'yt_dlp', 'engine', 'detectors', 'sigindex') if m in sys.modules))"
+    )
+    assert last == "[]"
+
+
+def test_css_is_minified():
+    last = run_app(
+        "at.run()\n"
+        "css = [m.value for m in at.markdown if m.value.startswith('<style>')]\n"
+        "print(len(css), len(css[0]), '/*' in css[0])"
+    )
+    _, size, comments = last.split()
+    with open(os.path.join(os.path.dirname(APP), "style.css"), encoding="utf-8") as f:
+        assert int(size) < len(f.read())
+    assert comments == "False"
+
+
+@pytest.fixture
+def app():
+    from streamlit.testing.v1 import AppTest
+    return AppTest.from_file(APP, default_timeout=120)
+
+
+def shown_images(at):
+    # st.image elements anywhere on the page
+    def walk(node):
+        children = getattr(node, 'children', None)
+        for child in (children.values() if isinstance(children, dict) else []):
+            yield child
+            yield from walk(child)
+    return sum(1 for n in walk(at._tree) if n.type == 'image')
+
+
+def test_gallery_is_paged(app):
+    cv2 = pytest.importorskip("cv2")
+    import numpy as np
+    bufs = [cv2.imencode(".jpg", np.full((90, 160, 3), 4 * i, np.uint8))[1].tobytes() for i in range(60)]
+    app.session_state['captured_images'] = bufs
+    app.session_state['captured_times'] = [float(i) for i in range(60)]
+    app.run()
+    assert not app.exception
+    assert any("(60 // 3 PAGES)" in m.value for m in app.markdown)
+    assert shown_images(app) == 24
+    app.number_input(key='gallery_page').set_value(3)
+    app.run()
+    assert shown_images(app) == 12
+
+
+def test_console_scans_the_keyed_window(app, lecture):
+    # The config panel and the console are separate fragments; the window reaches the scan through
+    # its session_state key, and a new result set bumps the revision cached exports are keyed by
+    app.session_state['setup_active'] = True
+    app.session_state['setup_step'] = 6
+    app.run()
+    app.text_input(key='wiz_url').input(lecture)
+    next(b for b in app.button if b.label == "ANALYZE SOURCE").click()
+    app.run()
+    app.slider(key='window').set_value((20, 45))
+    app.run()
+    rev = app.session_state['results_rev']
+    next(b for b in app.button if b.label == "INITIATE EXTRACTION SEQUENCE").click()
+    app.run()
+    assert not app.exception
+    assert app.session_state['captured_times'] == [20.0, 30.0]
+    assert app.session_state['results_rev'] > rev
+
+
+def test_library_is_opt_in_and_answers_a_rescan(app, lecture, library_dir):
+    app.session_state['setup_active'] = True
+    app.session_state['setup_step'] = 6
+    app.run()
+    assert app.session_state['library'] is False
+    app.text_input(key='wiz_url').input(lecture)
+    next(b for b in app.button if b.label == "ANALYZE SOURCE").click()
+    app.run()
+    app.slider(key='window').set_value((20, 45))
+    app.session_state['library'] = True
+    for engine in ("OPENCV_DIFF", "SLIDE_LIBRARY"):
+        next(b for b in app.button if b.label == "INITIATE EXTRACTION SEQUENCE").click()
+        app.run()
+        assert not app.exception
+        assert app.session_state['scan_stats']['engine'] == engine
+        assert app.session_state['captured_times'] == [20.0, 30.0]
@@ -0,0 +1,40 @@
+import pytest
+from conftest import SLIDE_TIMES
+from engine import calibrate, scan
+from videos import write_lecture
+
+
+@pytest.fixture(scope="module")
+def still_webcam(fixture_dir):
+    # One slide for the whole minute, a webcam moving in the corner: nothing to calibrate against
+    return write_lecture(str(fixture_dir / "still.mp4"), duration=60, interval=1000, cam=True)
+
+
+@pytest.mark.parametrize("fixture", ["lecture", "noisy_lecture"])
+def test_pairs_straddle_the_slide_changes(request, fixture):
+    cal = calibrate(request.getfixturevalue(fixture), 0, 240)
+    # 24 pairs ten seconds apart over eight slides: one pair per change
+    assert cal['separated'] and cal['pairs'] == 24 and cal['transitions'] == len(SLIDE_TIMES) - 1
+    assert cal['change_area'] > 2 * cal['noise_area']
+
+
+@pytest.mark.parametrize("max_skip", [2, 10])
+def test_calibrated_webcam_scan_finds_the_slides(webcam_lecture, max_skip):
+    cal = calibrate(webcam_lecture, 0, 240, auto_mask=True)
+    assert cal['separated']
+    captures = scan(webcam_lecture, 0, 240, sensitivity=cal['sensitivity'], strictness=cal['strictness'],
+                    max_skip=max_skip, auto_mask=True)
+    assert [round(t, 1) for t, _ in captures] == SLIDE_TIMES
+
+
+@pytest.mark.parametrize("auto_mask", [False, True])
+def test_no_slide_change_keeps_the_callers_settings(still_webcam, auto_mask):
+    cal = calibrate(still_webcam, 0, 60, auto_mask=auto_mask, sensitivity=40, strictness=2.5)
+    assert not cal['separated'] and cal['transitions'] == 0
+    assert (cal['sensitivity'], cal['strictness']) == (40, 2.5)
+
+
+def test_unclear_split_keeps_the_callers_settings(webcam_lecture):
+    # Unmasked, the webcam moves nearly as much of the frame as a slide change does
+    cal = calibrate(webcam_lecture, 0, 240, sensitivity=45, strictness=1.5)
+    assert not cal['separated'] and (cal['sensitivity'], cal['strictness']) == (45, 1.5)
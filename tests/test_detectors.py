@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from conftest import SLIDE_TIMES
+from detectors import DETECTORS, make_detector
+from engine import prep_gray, scan
+from videos import slide, webcam
+
+
+def times(captures):
+    return [round(t, 1) for t, _ in captures]
+
+
+@pytest.mark.parametrize("name", sorted(DETECTORS))
+def test_text_slide_change_is_detected(name):
+    # Consecutive text slides share title position and layout; only the words change
+    det = make_detector(name)
+    for k in range(7):
+        a, _ = det.measure(prep_gray(slide(k)))
+        _, score = det.measure(prep_gray(slide(k + 1)), a)
+        assert det.changed(score), (k, score, det.threshold)
+
+
+@pytest.mark.parametrize("name", sorted(DETECTORS))
+def test_noise_alone_is_not_a_change(name):
+    rng = np.random.default_rng(1)
+    det = make_detector(name)
+    base = slide(3)
+    noisy = [np.clip(base.astype(np.int16) + rng.normal(0, 10, base.shape), 0, 255).astype(np.uint8) for _ in range(2)]
+    a, _ = det.measure(prep_gray(noisy[0]))
+    _, score = det.measure(prep_gray(noisy[1]), a)
+    assert not det.changed(score), (score, det.threshold)
+
+
+@pytest.mark.parametrize("name", sorted(DETECTORS))
+def test_masked_webcam_is_not_a_change(name):
+    rng = np.random.default_rng(2)
+    det = make_detector(name)
+    mask = np.full((360, 640), 255, np.uint8)
+    mask[240:, 440:] = 0
+    det.set_mask(mask)
+    frames = []
+    for i in (0, 10):
+        f = slide(2)
+        webcam(f, i, rng)
+        frames.append(prep_gray(f))
+    a, _ = det.measure(frames[0])
+    _, score = det.measure(frames[1], a)
+    assert not det.changed(score), (score, det.threshold)
+
+
+@pytest.mark.parametrize("name", sorted(DETECTORS))
+def test_scan_finds_every_slide(lecture, name):
+    assert times(scan(lecture, 0, 240, detector=name)) == SLIDE_TIMES
+
+
+@pytest.mark.parametrize("name", sorted(DETECTORS))
+def test_scan_with_auto_mask_ignores_the_webcam(webcam_lecture, name):
+    assert times(scan(webcam_lecture, 0, 240, detector=name, auto_mask=True)) == SLIDE_TIMES
+
+
+@pytest.mark.parametrize("name", sorted(DETECTORS))
+def test_scan_ignores_sensor_noise(noisy_lecture, name):
+    assert times(scan(noisy_lecture, 0, 240, detector=name)) == SLIDE_TIMES
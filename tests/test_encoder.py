@@ -0,0 +1,64 @@
+import threading
+import cv2
+import numpy as np
+import pytest
+import encoder
+from encoder import EncodePool, encode_frame, encode_params
+
+
+def frame(k, w=320, h=180):
+    f = np.full((h, w, 3), 40, np.uint8)
+    cv2.putText(f, str(k), (20, h - 40), cv2.FONT_HERSHEY_SIMPLEX, 3, (255, 255, 255), 5)
+    return f
+
+
+@pytest.mark.parametrize("codec", ["JPEG", "WEBP", "PNG"])
+def test_encode_frame_decodes_back(codec):
+    f = frame(7)
+    img = cv2.imdecode(encode_frame(f, codec, 90), cv2.IMREAD_COLOR)
+    assert img.shape == f.shape
+    if codec == "PNG":
+        assert np.array_equal(img, f)
+    else:
+        assert np.abs(img.astype(int) - f).mean() < 4
+
+
+def test_png_quality_maps_to_zlib_effort():
+    assert encode_params("PNG", 100) == [cv2.IMWRITE_PNG_COMPRESSION, 0]
+    assert encode_params("PNG", 0) == [cv2.IMWRITE_PNG_COMPRESSION, 9]
+
+
+def test_max_side_downscales_keeping_the_aspect():
+    img = cv2.imdecode(encode_frame(frame(1, 1280, 720), max_side=640), cv2.IMREAD_COLOR)
+    assert img.shape[:2] == (360, 640)
+    # Smaller frames are left alone
+    img = cv2.imdecode(encode_frame(frame(1), max_side=640), cv2.IMREAD_COLOR)
+    assert img.shape[:2] == (180, 320)
+
+
+def test_results_come_back_in_submission_order(monkeypatch):
+    # Earlier frames finish last; delivery still follows the timestamps, on the caller's thread
+    slow = encoder.encode_frame
+
+    def encode(f, *a):
+        threading.Event().wait(0.05 * (5 - int(f[0, 0, 0]) // 40))
+        return slow(f, *a)
+    monkeypatch.setattr(encoder, 'encode_frame', encode)
+    seen = []
+    pool = EncodePool(workers=4, max_pending=3, on_done=lambda t, b: seen.append((t, threading.current_thread())))
+    for k in range(5):
+        f = frame(k)
+        f[0, 0] = 40 * k
+        pool.submit(float(k), f)
+        assert len(pool._inflight) <= 3
+    results = pool.close()
+    assert [t for t, _ in results] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert [t for t, _ in seen] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert all(th is threading.current_thread() for _, th in seen)
+
+
+def test_abort_drops_pending_frames():
+    pool = EncodePool()
+    pool.submit(0.0, frame(0))
+    pool.abort()
+    assert not pool._inflight
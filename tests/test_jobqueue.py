@@ -0,0 +1,85 @@
+import time
+import pytest
+from jobqueue import DirResultStore, SQLiteQueue, open_queue, open_store
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    return SQLiteQueue(str(tmp_path / "jobs.db"), lease_ttl=60, max_attempts=2)
+
+
+@pytest.fixture
+def short_leases(tmp_path):
+    # Workers that die: leases run out 0.2s after the last heartbeat
+    return SQLiteQueue(str(tmp_path / "short.db"), lease_ttl=0.2, max_attempts=2)
+
+
+def test_lease_complete(jobs):
+    job_id = jobs.submit("/lecture.mp4", {'sensitivity': 30}, "# Netscape HTTP Cookie File\n")
+    job = jobs.lease("w1")
+    assert job['id'] == job_id and job['options'] == {'sensitivity': 30}
+    assert job['cookies'] == "# Netscape HTTP Cookie File\n"
+    # Leased jobs aren't handed out twice
+    assert jobs.lease("w2") is None
+    assert jobs.heartbeat(job_id, "w1", 0.5, 12.0, 3)
+    assert jobs.get(job_id)['progress'] == 0.5
+    assert jobs.complete(job_id, "w1", 8, "Lecture 3")
+    done = jobs.get(job_id)
+    assert (done['state'], done['slides'], done['title'], done['attempts']) == ('DONE', 8, "Lecture 3", 1)
+    # Cookies stay out of status snapshots
+    assert 'cookies' not in done and [j['id'] for j in jobs.list()] == [job_id]
+
+
+def test_expired_lease_is_requeued(short_leases):
+    job_id = short_leases.submit("/lecture.mp4", {})
+    short_leases.lease("w1")
+    time.sleep(0.3)
+    # w1 stopped heartbeating; the job goes to the next worker, and w1 learns it lost it
+    job = short_leases.lease("w2")
+    assert job['id'] == job_id and job['attempts'] == 2 and job['worker'] == "w2"
+    assert not short_leases.heartbeat(job_id, "w1")
+    assert not short_leases.complete(job_id, "w1", 1)
+    assert short_leases.complete(job_id, "w2", 2)
+    assert short_leases.get(job_id)['slides'] == 2
+
+
+def test_job_fails_after_max_attempts(short_leases):
+    job_id = short_leases.submit("/lecture.mp4", {})
+    for worker in ("w1", "w2"):
+        assert short_leases.lease(worker)['id'] == job_id
+        time.sleep(0.3)
+    assert short_leases.lease("w3") is None
+    failed = short_leases.get(job_id)
+    assert failed['state'] == 'FAILED' and "2 attempts" in failed['error']
+
+
+def test_fail_records_the_error(jobs):
+    job_id = jobs.submit("/lecture.mp4", {})
+    jobs.lease("w1")
+    assert jobs.fail(job_id, "w1", "STREAM HANDSHAKE FAILED")
+    failed = jobs.get(job_id)
+    assert (failed['state'], failed['error']) == ('FAILED', "STREAM HANDSHAKE FAILED")
+    assert jobs.lease("w2") is None
+
+
+def test_store_round_trip(tmp_path):
+    store = DirResultStore(str(tmp_path / "results"))
+    assert store.get("nope") is None
+    meta = {'title': "Lecture 3", 'webpage_url': "https://example.com/v", 'duration': 240, 'formats': [1, 2]}
+    store.put("j1", meta, [(0.0, b"\xff\xd8one"), (30.0, b"\xff\xd8two")], "JPEG")
+    # A retry publishes again; the later copy wins
+    store.put("j1", meta, [(0.0, b"\xff\xd8one"), (30.0, b"\xff\xd8two"), (60.0, b"\xff\xd8three")], "JPEG")
+    got_meta, times, bufs, codec = store.get("j1")
+    assert times == [0.0, 30.0, 60.0] and bufs == [b"\xff\xd8one", b"\xff\xd8two", b"\xff\xd8three"]
+    assert codec == "JPEG" and got_meta['title'] == "Lecture 3" and 'formats' not in got_meta
+    assert sorted(p.name for p in (tmp_path / "results").iterdir()) == ["j1"]
+
+
+def test_backend_urls(tmp_path, monkeypatch):
+    monkeypatch.delenv('JOB_QUEUE', raising=False)
+    monkeypatch.delenv('RESULT_STORE', raising=False)
+    assert open_queue() is None and open_store() is None
+    assert open_queue(f"sqlite://{tmp_path}/q.db").path == f"{tmp_path}/q.db"
+    assert open_store(f"file://{tmp_path}/r").root == open_store(str(tmp_path / "r")).root == f"{tmp_path}/r"
+    with pytest.raises(ValueError):
+        open_queue("redis://localhost")
@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+import cv2
+import pytest
+import engine
+import library
+from conftest import SLIDE_TIMES
+from library import bands, encode_profile, open_library
+from videos import slide
+
+
+def jpeg(k, scale=1.0, quality=95):
+    f = slide(k)
+    if scale != 1.0: f = cv2.resize(f, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return cv2.imencode(".jpg", f, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def add(lib, data):
+    return lib.add_slide(encode_profile(None), ".jpg", data)
+
+
+def test_known_video_is_answered_from_the_library(library_dir, lecture):
+    meta, captures = engine.scan_source(lecture, None, library=True)
+    assert meta['library']['reused'] is False
+    assert [round(t, 1) for t, _ in captures] == SLIDE_TIMES
+    seen = []
+    meta, again = engine.scan_source(lecture, None, library=True, on_capture=lambda t, b: seen.append(t))
+    assert meta['library'] == {'video': 1, 'reused': True}
+    assert again == captures and seen == [t for t, _ in captures]
+    # Other settings are a new scan of the same video
+    meta, _ = engine.scan_source(lecture, None, library=True, sensitivity=45)
+    assert meta['library'] == {'video': 1, 'reused': False}
+    assert open_library().stats() == {'videos': 1, 'slides': len(SLIDE_TIMES), 'scans': 2}
+
+
+def test_recaptures_share_a_slide_and_the_sharper_copy_wins(library_dir):
+    lib = open_library()
+    small, data = add(lib, jpeg(3, scale=0.75))
+    assert add(lib, jpeg(3, scale=0.75, quality=80))[0] == small
+    # A larger capture of the same slide replaces the stored file for everyone
+    assert add(lib, jpeg(3)) == (small, jpeg(3))
+    assert add(lib, jpeg(3, scale=0.75))[1] == jpeg(3)
+    assert add(lib, jpeg(4))[0] != small
+    assert len(os.listdir(os.path.join(library_dir, "slides"))) == 2
+
+
+@pytest.mark.parametrize("flips, shared", [((0, 17, 34), True), ((0, 17, 34, 51), False)])
+def test_slide_radius_is_what_the_bands_can_find(library_dir, monkeypatch, flips, shared):
+    # Three flipped bits leave one 16-bit band intact; four can touch all of them
+    h = 0x0123456789ABCDEF
+    near = h
+    for bit in flips: near ^= 1 << bit
+    assert any(a == b for a, b in zip(bands(h), bands(near))) is shared
+    hashes = iter([h, near])
+    monkeypatch.setattr(library, 'phash', lambda gray: next(hashes))
+    lib = open_library()
+    first, _ = add(lib, jpeg(5))
+    assert (add(lib, jpeg(5))[0] == first) is shared
+
+
+def test_concurrent_scans_store_a_new_slide_once(library_dir):
+    lib = open_library()
+    data = jpeg(6)
+    ids = []
+    threads = [threading.Thread(target=lambda: ids.append(add(lib, data)[0])) for _ in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert len(set(ids)) == 1 and lib.stats()['slides'] == 1
+
+
+def test_eviction_drops_stale_then_least_recently_used(library_dir, monkeypatch):
+    lib = open_library()
+    videos = [lib.add_video(f"/v{n}.mp4", None, 240, [n] * 12) for n in range(3)]
+    for n, video in enumerate(videos):
+        lib.remember(video, "k", [(0.0, jpeg(n)), (30.0, jpeg(10))])
+    with lib.connect() as db:
+        for n, video in enumerate(videos):
+            db.execute("UPDATE videos SET used = ? WHERE id = ?", (1000 + n, video))
+
+    def kept():
+        with lib.connect() as db:
+            return [r[0] for r in db.execute("SELECT id FROM videos ORDER BY id")]
+
+    # Under the size cap only videos past the TTL go; the slide they shared stays
+    monkeypatch.setattr(library, 'ORPHAN_GRACE', -1)
+    monkeypatch.setattr(library, 'LIBRARY_TTL', time.time() - 1000.5)
+    lib.evict()
+    assert kept() == videos[1:]
+    assert lib.stats() == {'videos': 2, 'slides': 3, 'scans': 2}
+    assert len(os.listdir(os.path.join(library_dir, "slides"))) == 3
+    # Over it the least recently used go first, until the slide files fit
+    with lib.connect() as db:
+        total = db.execute("SELECT SUM(bytes) FROM slides").fetchone()[0]
+    monkeypatch.setattr(library, 'LIBRARY_TTL', float("inf"))
+    monkeypatch.setattr(library, 'LIBRARY_MAX_MB', (total - 1) / 2 ** 20)
+    lib.evict()
+    assert kept() == [videos[2]]
+    assert lib.find_scan(videos[2], "k") is not None and lib.stats()['slides'] == 2
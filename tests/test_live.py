@@ -0,0 +1,33 @@
+import queue
+import threading
+import time
+from conftest import SLIDE_TIMES
+from engine import _live_reader, scan_live
+
+
+def test_live_scan_of_a_local_file(lecture):
+    # A local file ends for real: no reconnects, the scan returns once the reader runs dry.
+    # Live timestamps come from the sampling clock, so they land within a sample of the change.
+    found = [t for t, _ in scan_live(lecture, min_skip=2, backlog=1000)]
+    assert len(found) == len(SLIDE_TIMES)
+    assert all(0 <= t - s < 2 for t, s in zip(found, SLIDE_TIMES))
+
+
+def test_reader_keeps_the_newest_samples(lecture):
+    # Nobody consumes: the backlog stays bounded and old samples are dropped, not the new ones
+    frames = queue.Queue(maxsize=2)
+    reader = threading.Thread(target=_live_reader, args=(lecture, frames, threading.Event(), 2, 0), daemon=True)
+    reader.start()
+    deadline = time.time() + 60
+    while time.time() < deadline and not (frames.full() and frames.queue[-1][0] > 240 - 2 * 2):
+        time.sleep(0.05)
+    # The end-of-stream marker waits for room, so the reader is parked on a full queue at the end
+    assert reader.is_alive()
+    newest = [frames.get()[0] for _ in range(2)]
+    assert newest[0] < newest[1] and newest[1] > 240 - 2 * 2
+    reader.join(timeout=5)
+    assert not reader.is_alive() and frames.get() is None
+
+
+def test_should_stop_ends_the_scan(lecture):
+    assert scan_live(lecture, should_stop=lambda: True) == []
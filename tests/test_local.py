@@ -0,0 +1,58 @@
+import gc
+import io
+import os
+import engine
+from conftest import SLIDE_TIMES
+
+
+class Upload(io.BytesIO):
+    # Shaped like streamlit's UploadedFile: a file-like object with a name and a per-upload file_id
+    def __init__(self, data, name, file_id):
+        super().__init__(data)
+        self.name = name
+        self.file_id = file_id
+
+
+def test_local_paths_skip_the_extractor(lecture):
+    assert engine.is_local_source(lecture)
+    assert not engine.is_local_source("https://www.youtube.com/watch?v=x")
+    assert not engine.is_local_source("")
+    meta, err = engine.get_video_info(lecture)
+    assert err is None and meta['is_local']
+    assert (meta['width'], meta['height'], meta['duration']) == (1280, 720, 240)
+    assert engine.quality_map(meta) == {engine.LOCAL_FORMAT: None}
+    assert engine.resolve_stream(lecture, None) == lecture
+
+
+def test_home_relative_paths(lecture, monkeypatch):
+    monkeypatch.setenv("HOME", os.path.dirname(lecture))
+    src = os.path.join("~", os.path.basename(lecture))
+    assert engine.is_local_source(src)
+    assert engine.resolve_stream(src, None) == lecture
+
+
+def test_missing_local_file():
+    meta, err = engine.probe_local("/nowhere/lecture.mp4")
+    assert meta is None and "cannot open" in err
+
+
+def test_scan_source_on_a_local_file(lecture):
+    meta, captures = engine.scan_source(lecture, None)
+    assert meta['title'] == os.path.basename(lecture)
+    assert [round(t, 1) for t, _ in captures] == SLIDE_TIMES
+
+
+def test_upload_spill_is_removed_with_its_owner(lecture):
+    with open(lecture, "rb") as f:
+        data = f.read()
+    spill = engine.SpilledUpload(Upload(data, "talk.mp4", "id-1"))
+    assert spill.path.endswith(".mp4") and os.path.getsize(spill.path) == len(data)
+    assert engine.probe_local(spill.path)[0]['duration'] == 240
+    spill.discard()
+    assert not os.path.exists(spill.path)
+
+    spill = engine.SpilledUpload(Upload(data, "talk", "id-2"))
+    path = spill.path
+    del spill
+    gc.collect()
+    assert not os.path.exists(path)
@@ -0,0 +1,65 @@
+import cv2
+import numpy as np
+import pytest
+from conftest import SLIDE_TIMES
+from engine import DETECT_H, DETECT_W, find_motion_mask, prep_gray, roi_box, scan
+
+
+def times(captures):
+    return [round(t, 1) for t, _ in captures]
+
+
+def motion_mask(path, roi=None):
+    cap = cv2.VideoCapture(path)
+    try:
+        return find_motion_mask(cap, cap.get(cv2.CAP_PROP_FPS), 0, 240, 35, roi=roi)
+    finally:
+        cap.release()
+
+
+def test_roi_box():
+    assert roi_box(None) == (0, 0, DETECT_W, DETECT_H)
+    assert roi_box((0.25, 0.5, 0.75, 1.0)) == (160, 180, 480, 360)
+    # A degenerate ROI still keeps one pixel
+    x0, y0, x1, y1 = roi_box((0.5, 0.5, 0.5, 0.5))
+    assert x1 - x0 == 1 and y1 - y0 == 1
+    # Out-of-range fractions are clamped to the frame
+    assert roi_box((-0.5, 0.0, 1.5, 1.0)) == (0, 0, DETECT_W, DETECT_H)
+    assert roi_box((1.0, 1.0, 1.0, 1.0)) == (DETECT_W - 1, DETECT_H - 1, DETECT_W, DETECT_H)
+
+
+def test_prep_gray_crops_to_the_roi():
+    frame = np.zeros((720, 1280, 3), np.uint8)
+    assert prep_gray(frame, (0.25, 0.5, 0.75, 1.0)).shape == (180, 320)
+
+
+def test_motion_mask_covers_the_webcam(webcam_lecture):
+    mask = motion_mask(webcam_lecture)
+    assert mask is not None and mask.shape == (DETECT_H, DETECT_W)
+    # Only the moving presenter inside the tile (x 940-1260, y 500-700 of 1280x720, so half that
+    # here) is excluded, grown by the dilation margin; the slide area stays in
+    ys, xs = np.nonzero(mask == 0)
+    assert len(xs) > 2000
+    assert xs.min() >= 470 - 16 and ys.min() >= 250 - 16 and xs.max() < DETECT_W and ys.max() < DETECT_H
+
+
+def test_static_lecture_needs_no_mask(lecture):
+    assert motion_mask(lecture) is None
+
+
+def test_roi_excluding_the_webcam(webcam_lecture):
+    # Cropping the overlay away by hand works as well as the automatic mask
+    assert times(scan(webcam_lecture, 0, 240, roi=(0.0, 0.0, 0.7, 1.0))) == SLIDE_TIMES
+
+
+def test_mask_on_an_roi_crop(webcam_lecture):
+    roi = (0.0, 0.2, 1.0, 1.0)
+    mask = motion_mask(webcam_lecture, roi)
+    assert mask.shape == (DETECT_H - roi_box(roi)[1], DETECT_W)
+    assert times(scan(webcam_lecture, 0, 240, roi=roi, mask=mask)) == SLIDE_TIMES
+
+
+@pytest.mark.parametrize("opts", [{}, {'auto_mask': True}])
+def test_unmasked_webcam_is_the_failure_the_mask_fixes(webcam_lecture, opts):
+    found = times(scan(webcam_lecture, 0, 240, **opts))
+    assert (found == SLIDE_TIMES) == bool(opts)
@@ -0,0 +1,175 @@
+import time
+import cv2
+import numpy as np
+import pytest
+from conftest import SLIDE_TIMES, needs_ffmpeg
+from engine import FrameReader, PipeReader, prep_gray, scan, scan_candidates, scan_ffmpeg, scan_packets, scan_progressive, scan_storyboard
+from videos import write_lecture, write_storyboard
+
+
+def times(captures):
+    return [round(t, 1) for t, _ in captures]
+
+
+# Capture parity: faster walks must find exactly what the plain fixed-stride scan finds. The
+# unmasked webcam lecture is the hard case: the webcam itself keeps tripping the detector, so
+# every capture depends on the max_skip hold that follows the one before it.
+CASES = [
+    ("lecture", {}),
+    ("noisy_lecture", {}),
+    ("webcam_lecture", {}),
+    ("webcam_lecture", {'auto_mask': True}),
+    ("webcam_lecture", {'max_skip': 4}),
+]
+
+
+@pytest.mark.parametrize("fixture, opts", CASES)
+def test_cascade_matches_absdiff(request, fixture, opts):
+    path = request.getfixturevalue(fixture)
+    assert times(scan(path, 0, 240, detector="CASCADE", **opts)) == times(scan(path, 0, 240, detector="ABSDIFF", **opts))
+
+
+@pytest.mark.parametrize("fixture, opts", CASES)
+def test_storyboard_matches_full_scan(request, tmp_path, fixture, opts):
+    path = request.getfixturevalue(fixture)
+    board = write_storyboard(path, str(tmp_path / "sb"))
+    assert times(scan_storyboard(path, 0, 240, storyboard=board, **opts)) == times(scan(path, 0, 240, **opts))
+
+
+@pytest.mark.parametrize("fixture, opts", CASES)
+def test_adaptive_matches_fixed_stride(request, fixture, opts):
+    path = request.getfixturevalue(fixture)
+    assert times(scan(path, 0, 240, adaptive=True, **opts)) == times(scan(path, 0, 240, **opts))
+
+
+@pytest.mark.parametrize("opts", [{}, {'auto_mask': True}])
+def test_adaptive_matches_fixed_stride_off_whole_seconds(ntsc_lecture, opts):
+    # At 29.97 fps neither strides nor holds are whole seconds; both walks stay on the frame grid
+    assert times(scan(ntsc_lecture, 0, 120, adaptive=True, **opts)) == times(scan(ntsc_lecture, 0, 120, **opts))
+
+
+@pytest.mark.parametrize("decoder", ["OPENCV", pytest.param("FFMPEG_PIPE", marks=needs_ffmpeg)])
+@pytest.mark.parametrize("opts", [{}, {'auto_mask': True}, {'max_skip': 5}])
+def test_adaptive_read_ahead_is_deterministic(ntsc_lecture, decoder, opts):
+    # Samples read ahead at an old stride must never stand in for the ones a new stride asks for
+    runs = [times(scan(ntsc_lecture, 0, 120, adaptive=True, decoder=decoder, prefetch=p, **opts)) for p in (0, 4, 4)]
+    assert runs[0] == runs[1] == runs[2]
+
+
+@pytest.mark.parametrize("reader", ["OPENCV", pytest.param("FFMPEG_PIPE", marks=needs_ffmpeg)])
+def test_stride_change_drops_samples_read_ahead(lecture, reader):
+    cap = cv2.VideoCapture(lecture)
+    if reader == "OPENCV":
+        r = FrameReader(cap, 0, 1200, 100, prefetch=4)
+    else:
+        r = PipeReader(lecture, cap.get(cv2.CAP_PROP_FPS), 0, 1200, 10, prefetch=4)
+        r.stride = 100
+    try:
+        walk = iter(r)
+        got = [next(walk)[0]]
+        # Let the reader run ahead at the wide stride, then shrink it and skip a little
+        time.sleep(1.0)
+        r.stride = 20
+        got.append(next(walk)[0])
+        r.skip_to(got[-1] + 50)
+        got += [next(walk)[0], next(walk)[0]]
+        assert got == [0, 20, 70, 90]
+    finally:
+        r.close()
+        cap.release()
+
+
+@pytest.mark.parametrize("fixture, opts", CASES)
+def test_progressive_without_budget_converges_to_full_scan(request, fixture, opts):
+    path = request.getfixturevalue(fixture)
+    assert times(scan_progressive(path, 0, 240, **opts)) == times(scan(path, 0, 240, **opts))
+
+
+@pytest.mark.parametrize("window", [(50, 50), (50, 40)])
+def test_progressive_empty_window_matches_full_scan(lecture, window):
+    assert scan_progressive(lecture, *window) == scan(lecture, *window) == []
+
+
+def test_progressive_budget_covers_the_window(lecture):
+    # A small budget still spans the whole lecture, just coarser
+    found = times(scan_progressive(lecture, 0, 240, budget_samples=40))
+    assert found[0] == 0.0 and found[-1] > 180
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("fixture, opts", [("lecture", {}), ("noisy_lecture", {}), ("webcam_lecture", {'auto_mask': True})])
+def test_packet_sizes_find_every_slide(request, fixture, opts):
+    path = request.getfixturevalue(fixture)
+    assert times(scan_packets(path, 0, 240, **opts)) == SLIDE_TIMES
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("max_skip", [6, 10])
+def test_packet_sizes_hold_for_max_skip(webcam_lecture, max_skip):
+    # Unmasked, the webcam makes nearly every candidate a change; captures still come max_skip apart
+    found = times(scan_packets(webcam_lecture, 0, 240, max_skip=max_skip))
+    assert np.diff(found).min() >= max_skip - 0.1
+
+
+@pytest.fixture(scope="module")
+def full_hd_lecture(fixture_dir):
+    # 1080p is a 3x downscale to the detect size, where scalers differ most
+    return write_lecture(str(fixture_dir / "full_hd.mp4"), duration=120, cam=True, size=(1920, 1080))
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("fixture", ["webcam_lecture", "full_hd_lecture"])
+@pytest.mark.parametrize("roi", [None, (0.1, 0.0, 0.9, 0.8)])
+def test_pipe_samples_match_prep_gray(request, fixture, roi):
+    path = request.getfixturevalue(fixture)
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    reader = PipeReader(path, fps, 0, int(60 * fps), int(10 * fps), roi=roi, prefetch=0)
+    try:
+        for pos, _, gray in reader:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
+            ok, frame = cap.read()
+            assert ok
+            d = cv2.absdiff(gray, prep_gray(frame, roi))
+            # YUV -> gray rounding differs by a level or two; the scaler itself must agree
+            assert d.mean() < 2 and d.max() <= 8, (pos, d.mean(), d.max())
+    finally:
+        reader.close()
+        cap.release()
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("fixture, opts", [("lecture", {}), ("webcam_lecture", {}), ("webcam_lecture", {'auto_mask': True}),
+                                           ("full_hd_lecture", {'auto_mask': True})])
+def test_pipe_decoder_matches_opencv(request, fixture, opts):
+    path = request.getfixturevalue(fixture)
+    end = 120 if fixture == "full_hd_lecture" else 240
+    assert times(scan(path, 0, end, decoder="FFMPEG_PIPE", **opts)) == times(scan(path, 0, end, **opts))
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("fixture, opts", [("lecture", {}), ("noisy_lecture", {}), ("webcam_lecture", {'auto_mask': True})])
+def test_scene_scores_find_every_slide(request, fixture, opts):
+    path = request.getfixturevalue(fixture)
+    assert times(scan_ffmpeg(path, 0, 240, **opts)) == SLIDE_TIMES
+
+
+@needs_ffmpeg
+def test_scene_candidates_are_confirmed_and_held(webcam_lecture):
+    # Unmasked, the webcam trips the detector on some candidates. Captures still come max_skip apart,
+    # and a slide that changes inside a hold is taken when the hold ends, as the fixed walk does
+    found = times(scan_ffmpeg(webcam_lecture, 0, 240, max_skip=10))
+    assert np.diff(found).min() >= 10 - 0.1
+    assert all(any(s <= t <= s + 10 for t in found) for s in SLIDE_TIMES)
+
+
+def test_candidates_inside_a_hold_are_checked_when_it_ends(lecture):
+    # The 30s change falls inside the hold after the opening capture; like the fixed walk, the
+    # candidate engines look again the moment the hold ends
+    def walk(check, mask):
+        for t in SLIDE_TIMES[1:]:
+            check(t)
+
+    expected = times(scan(lecture, 0, 240, max_skip=40))
+    assert times(scan_candidates(lecture, 0, 240, walk, max_skip=40)) == expected
+    assert expected[:3] == [0.0, 40.0, 80.0]
@@ -0,0 +1,36 @@
+import engine
+
+
+class FakeYDL:
+    # Stands in for yt_dlp.YoutubeDL: serves canned flat extractions by URL
+    def __init__(self, pages):
+        self.pages = pages
+
+    def extract_info(self, url, download=False):
+        if url not in self.pages: raise Exception("This channel does not have a shorts tab")
+        return self.pages[url]
+
+
+def video(vid):
+    return {'_type': 'url', 'ie_key': 'Youtube', 'id': vid, 'url': vid, 'title': vid, 'duration': 60}
+
+
+def test_plain_playlist():
+    info = {'entries': [video("a"), None, video("b")]}
+    assert [e['url'] for e in engine.flat_entries(FakeYDL({}), info)] == [
+        "https://www.youtube.com/watch?v=a", "https://www.youtube.com/watch?v=b"]
+
+
+def test_channel_tabs_are_expanded():
+    tab = lambda name: {'_type': 'url', 'ie_key': 'YoutubeTab', 'url': f"https://www.youtube.com/@c/{name}"}
+    pages = {
+        "https://www.youtube.com/@c/videos": {'entries': [video("a"), video("b")]},
+        "https://www.youtube.com/@c/streams": {'entries': [video("b"), video("c")]},
+    }
+    channel = {'_type': 'playlist', 'entries': [
+        tab("videos"), tab("shorts"), tab("streams"),
+        {'_type': 'playlist', 'entries': [video("d")]},
+    ]}
+    entries = engine.flat_entries(FakeYDL(pages), channel)
+    assert [e['url'][-1] for e in entries] == ["a", "b", "c", "d"]
+    assert all(e['duration'] == 60 for e in entries)
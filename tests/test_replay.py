@@ -0,0 +1,91 @@
+import os
+import time
+import numpy as np
+import pytest
+import sigindex
+from engine import DETECT_H, DETECT_W, scan
+from sigindex import IndexWriter, index_key, index_paths, open_index, replay
+
+SETTINGS = [
+    dict(sensitivity=35, strictness=1.0, min_skip=2, max_skip=10),
+    dict(sensitivity=25, strictness=0.5, min_skip=2, max_skip=6),
+    dict(sensitivity=45, strictness=1.5, min_skip=2, max_skip=20),
+]
+
+
+def times(captures):
+    return [round(t, 1) for t, _ in captures]
+
+
+def indexed(path, **opts):
+    key = index_key(path, 0, 240, None, 2)
+    return key, scan(path, 0, 240, index_key=key, **opts)
+
+
+@pytest.mark.parametrize("fixture", ["lecture", "noisy_lecture"])
+def test_replay_reproduces_the_scan(request, index_dir, fixture):
+    path = request.getfixturevalue(fixture)
+    key, captures = indexed(path)
+    assert [round(t, 1) for t in replay(open_index(key))] == times(captures)
+
+
+@pytest.mark.parametrize("opts", SETTINGS)
+def test_replay_at_new_thresholds_matches_a_fresh_scan(webcam_lecture, index_dir, opts):
+    # The index is written once at the defaults; every other setting must replay to what a scan
+    # at that setting finds with the same webcam mask (auto_mask would re-derive it per sensitivity)
+    key, _ = indexed(webcam_lecture, auto_mask=True)
+    index = open_index(key)
+    expected = times(scan(webcam_lecture, 0, 240, mask=index['mask'], **opts))
+    assert [round(t, 1) for t in replay(index, **opts)] == expected
+
+
+@pytest.mark.parametrize("max_skip", [5, 10])
+def test_index_does_not_change_the_walk(ntsc_lecture, index_dir, max_skip):
+    # Unmasked, the webcam trips the detector after every hold, so any drift between the indexed
+    # walk and the plain one shows up in every capture after it
+    key = index_key(ntsc_lecture, 0, 120, None, 2)
+    plain = scan(ntsc_lecture, 0, 120, max_skip=max_skip)
+    assert len(plain) > 120 / 30 + 1
+    assert times(scan(ntsc_lecture, 0, 120, max_skip=max_skip, index_key=key)) == times(plain)
+
+
+@pytest.mark.parametrize("max_skip", [5, 10])
+def test_replay_reproduces_the_scan_off_whole_seconds(ntsc_lecture, index_dir, max_skip):
+    key = index_key(ntsc_lecture, 0, 120, None, 2)
+    captures = scan(ntsc_lecture, 0, 120, max_skip=max_skip, auto_mask=True, index_key=key)
+    assert [round(t, 1) for t in replay(open_index(key), max_skip=max_skip)] == times(captures)
+
+
+def test_index_grows_past_its_capacity(index_dir):
+    writer = IndexWriter("grow", 0, 10, 2, 5, capacity=2)
+    for k in range(5):
+        writer.add(2 * k, np.full((DETECT_H, DETECT_W), 50 * k, np.uint8))
+    writer.close()
+    index = open_index("grow")
+    assert list(index['times']) == [0, 2, 4, 6, 8]
+    assert [int(s.mean()) for s in index['sigs']] == [0, 50, 100, 150, 200]
+
+
+def test_eviction_drops_stale_then_least_recently_used(index_dir, monkeypatch):
+    monkeypatch.setattr(sigindex, 'INDEX_TTL', float("inf"))
+    for n, key in enumerate(["old", "new", "used"]):
+        writer = IndexWriter(key, 0, 240, 2, 5)
+        writer.add(0, np.zeros((DETECT_H, DETECT_W), np.uint8))
+        writer.close()
+        for path in index_paths(key)[:2]:
+            os.utime(path, (1000 + n, 1000 + n))
+    # Opening counts as use
+    assert open_index("used") is not None
+
+    def kept():
+        return [k for k in ["old", "new", "used"] if os.path.exists(index_paths(k)[1])]
+
+    # Under the size cap, only indexes past the TTL go
+    monkeypatch.setattr(sigindex, 'INDEX_TTL', time.time() - 1000.5)
+    sigindex.evict()
+    assert kept() == ["new", "used"]
+    # Over it, the least recently used go first
+    size = sum(os.path.getsize(p) for p in index_paths("used")[:2])
+    monkeypatch.setattr(sigindex, 'INDEX_MAX_MB', 1.5 * size / 2 ** 20)
+    sigindex.evict()
+    assert kept() == ["used"]
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from conftest import SLIDE_TIMES
+from engine import TINY_H, TINY_W, scan, tiny_moved
+
+
+def times(captures):
+    return [round(t, 1) for t, _ in captures]
+
+
+def test_tiny_moved_needs_the_strictness_area():
+    a = np.zeros((TINY_H, TINY_W), np.uint8)
+    b = a.copy()
+    # A cursor: a couple of tiny pixels
+    b[10:12, 10:12] = 255
+    assert not tiny_moved(a, b, 35, strictness=1.0)
+    # A new slide body: a fifth of the picture
+    b[:9] = 255
+    assert tiny_moved(a, b, 35, strictness=1.0)
+    # Masked-out movement doesn't count, and the bar is a share of what the mask keeps
+    mask = np.ones((TINY_H, TINY_W), bool)
+    mask[:9] = False
+    assert not tiny_moved(a, b, 35, mask, strictness=1.0)
+
+
+@pytest.mark.parametrize("name,opts", [("lecture", {}), ("noisy_lecture", {}),
+                                       ("webcam_lecture", {'auto_mask': True})])
+def test_settle_finds_every_slide(request, name, opts):
+    # The fixture slides land in one frame, so the settled frame is the change itself;
+    # a speaker's sway or encoder noise must not keep the look-ahead waiting
+    assert times(scan(request.getfixturevalue(name), 0, 240, settle=1, **opts)) == SLIDE_TIMES
+
+
+def test_settle_keeps_the_hold(webcam_lecture):
+    # Unmasked, the webcam tile trips the detector all the time; captures still come max_skip apart
+    found = times(scan(webcam_lecture, 0, 240, settle=1, max_skip=10))
+    assert len(found) > len(SLIDE_TIMES)
+    assert all(round(b - a, 1) >= 10 for a, b in zip(found, found[1:]))
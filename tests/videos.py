@@ -0,0 +1,83 @@
+import os
+import cv2
+import numpy as np
+
+# --- TEST FIXTURES ---
+# Synthetic lectures, written on first use: dark text slides on white, as a screen recording would
+# show them. Slide k runs from k * interval; the webcam variant adds a presenter tile that moves
+# every frame (a head that sways plus sensor noise), i.e. the overlay motion the mask and the
+# max_skip hold exist for. noise adds per-frame sensor noise of that standard deviation.
+
+WORDS = ("gradient", "descent", "matrix", "vector", "kernel", "loss", "batch", "norm", "layer", "convex",
+         "bound", "sample", "model", "error", "proof", "lemma", "graph", "tree", "cache", "queue")
+
+
+def slide(k, w=1280, h=720):
+    rng = np.random.default_rng(k)
+    f = np.full((h, w, 3), 250, np.uint8)
+    cv2.putText(f, f"Lecture 3.{k}: {WORDS[k % len(WORDS)].title()} {WORDS[(k * 7 + 3) % len(WORDS)]}",
+                (60, 80), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (30, 30, 30), 2, cv2.LINE_AA)
+    for i in range(int(rng.integers(8, 11))):
+        line = " ".join(WORDS[j] for j in rng.integers(0, len(WORDS), int(rng.integers(3, 7))))
+        cv2.putText(f, f"- {line}", (90, 160 + 48 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (40, 40, 40), 1, cv2.LINE_AA)
+    return f
+
+
+def webcam(f, i, rng):
+    h, w = f.shape[:2]
+    x0, y0, cw, ch = w - 340, h - 220, 320, 200
+    tile = np.full((ch, cw, 3), 70, np.uint8)
+    cx = cw // 2 + int(60 * np.sin(i / 7)) + int(rng.integers(-6, 7))
+    cy = ch // 2 + int(12 * np.sin(i / 5))
+    cv2.ellipse(tile, (cx, ch), (95, 70), 0, 180, 360, (40, 40, 140), -1)
+    cv2.ellipse(tile, (cx, cy - 15), (40, 50), 0, 0, 360, (170, 190, 225), -1)
+    # A gesturing hand, in shot about half the time
+    if np.sin(i / 11) > 0:
+        cv2.circle(tile, (cx + 90 + int(30 * np.sin(i / 3)), cy + 30 + int(20 * np.cos(i / 4))), 22, (170, 190, 225), -1)
+    tile = np.clip(tile.astype(np.int16) + rng.normal(0, 6, tile.shape), 0, 255).astype(np.uint8)
+    f[y0:y0 + ch, x0:x0 + cw] = tile
+
+
+def write_lecture(path, duration=240, interval=30, fps=5, cam=False, noise=0, size=(1280, 720)):
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    rng = np.random.default_rng(7)
+    # A small bank of noise fields, drawn per frame: cheap, and no two neighbouring samples share one
+    bank = [rng.normal(0, noise, (size[1], size[0], 3)).astype(np.int16) for _ in range(8)] if noise else None
+    slides = {}
+    for i in range(int(duration * fps)):
+        k = int(i / fps // interval)
+        if k not in slides: slides = {k: slide(k, *size)}
+        f = slides[k].copy()
+        if cam: webcam(f, i, rng)
+        if noise: f = np.clip(f + bank[rng.integers(len(bank))], 0, 255).astype(np.uint8)
+        out.write(f)
+    out.release()
+    return path
+
+
+def write_storyboard(video, root, interval=5, rows=5, cols=5, tile=(160, 90)):
+    # YouTube-style storyboard for a local video: mosaics of rows x cols thumbnails, one every
+    # `interval` seconds. Returns the yt_dlp format dict (fragment URLs are local paths).
+    cap = cv2.VideoCapture(video)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+    tiles = []
+    for i in range(int(duration // interval) + 1):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(i * interval * fps))
+        ok, f = cap.read()
+        if not ok: break
+        tiles.append(cv2.resize(f, tile, interpolation=cv2.INTER_AREA))
+    cap.release()
+    os.makedirs(root, exist_ok=True)
+    tw, th = tile
+    per = rows * cols
+    fragments = []
+    for m in range(0, len(tiles), per):
+        mosaic = np.zeros((th * rows, tw * cols, 3), np.uint8)
+        for k, t in enumerate(tiles[m:m + per]):
+            mosaic[(k // cols) * th:(k // cols + 1) * th, (k % cols) * tw:(k % cols + 1) * tw] = t
+        path = os.path.join(root, f"M{m // per}.jpg")
+        cv2.imwrite(path, mosaic)
+        fragments.append({'url': path, 'duration': min(per, len(tiles) - m) * interval})
+    return {'format_id': "sb0", 'format_note': "storyboard", 'fragments': fragments, 'fps': 1 / interval,
+            'rows': rows, 'columns': cols, 'width': tw, 'height': th}